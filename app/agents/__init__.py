@@ -1,4 +1,5 @@
 from importlib import import_module
+from app.tools.tracing import span
 
 _REGISTRY = {
   "architect":   "app.agents.architect:run",
@@ -14,5 +15,9 @@ def dispatch_agent(name: str, task: dict) -> dict:
   if name not in _REGISTRY:
     return {"ok": False, "error": f"agent '{name}' não encontrado"}
   modpath, func = _REGISTRY[name].split(":")
-  mod = import_module(modpath)
-  return getattr(mod, func)(task)
+  with span("dispatch_agent", agent=name, correlation_id=(task or {}).get("correlation_id")) as sp:
+    mod = import_module(modpath)
+    res = getattr(mod, func)(task)
+    if isinstance(res, dict):
+      sp.set(ok=res.get("ok", res.get("status") == "ok"))
+    return res
@@ -0,0 +1,91 @@
+"""
+Perfil de importação dos agentes (startup do dispatch_agent).
+
+  python -m app.agents --import-profile                 # todos os agentes
+  python -m app.agents --import-profile qa_tester --top 20
+  python -m app.agents --import-profile --json
+
+Cada agente é importado num processo novo com `-X importtime` (cache de módulos frio,
+bytecode já compilado); só conta o que vem depois do `site`, isto é, o custo de
+`import app.agents` + o módulo do agente.
+"""
+import argparse, importlib.util, json, os, subprocess, sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from app.agents import _REGISTRY
+
+REPO = Path(__file__).resolve().parents[2]
+
+def _parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        head, cum_us, raw = line.split("|", 2)
+        rows.append({"module": raw.strip(), "depth": (len(raw) - len(raw.lstrip()) - 1) // 2,
+                     "self_us": int(head.split(":")[1]), "cumulative_us": int(cum_us)})
+    # só o que foi importado depois do site (o comando -c)
+    for i in range(len(rows) - 1, -1, -1):
+        if rows[i]["module"] == "site" and rows[i]["depth"] == 0:
+            return rows[i + 1:]
+    return rows
+
+def profile_agent(name: str) -> Dict[str, Any]:
+    modpath = _REGISTRY[name].split(":")[0]
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(REPO), os.environ.get("PYTHONPATH")]))}
+    code = f"import app.agents; import {modpath}"
+    subprocess.run([sys.executable, "-c", code], env=env, cwd=str(REPO), capture_output=True)  # compila .pyc
+    r = subprocess.run([sys.executable, "-X", "importtime", "-c", code], env=env, cwd=str(REPO),
+                       capture_output=True, text=True)
+    if r.returncode != 0:
+        return {"agent": name, "module": modpath, "error": r.stderr.strip().splitlines()[-1:]}
+    rows = _parse_importtime(r.stderr)
+    stdlib = getattr(sys, "stdlib_module_names", ())
+    third = sorted({top for top in (row["module"].split(".")[0] for row in rows)
+                    if top not in stdlib and top != "app" and not top.startswith("_") and importlib.util.find_spec(top)})
+    return {
+        "agent": name,
+        "module": modpath,
+        "total_ms": round(sum(row["cumulative_us"] for row in rows if row["depth"] == 0) / 1000, 2),
+        "modules": len(rows),
+        "third_party": third,
+        "rows": rows,
+    }
+
+def _print(results: List[Dict[str, Any]], top: int):
+    print(f"{'agente':<16}{'import ms':>10}{'módulos':>9}  terceiros")
+    for res in results:
+        if "error" in res:
+            print(f"{res['agent']:<16}{'erro':>10}  {res['error']}")
+            continue
+        print(f"{res['agent']:<16}{res['total_ms']:>10.1f}{res['modules']:>9}  {', '.join(res['third_party']) or '-'}")
+    for res in results:
+        if "error" in res or not top:
+            continue
+        print(f"\n{res['agent']} ({res['module']}) — top {top} por tempo próprio:")
+        for row in sorted(res["rows"], key=lambda x: -x["self_us"])[:top]:
+            print(f"  {row['self_us'] / 1000:>8.2f} ms  {row['cumulative_us'] / 1000:>8.2f} ms cum.  {row['module']}")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m app.agents")
+    ap.add_argument("--import-profile", action="store_true", help="tempo de import por agente (-X importtime)")
+    ap.add_argument("agents", nargs="*", help=f"agentes (padrão: todos): {', '.join(_REGISTRY)}")
+    ap.add_argument("--top", type=int, default=None, help="módulos mais caros por agente (padrão: 10 com um agente, 0 com vários)")
+    ap.add_argument("--json", action="store_true")
+    a = ap.parse_args(argv)
+    if not a.import_profile:
+        ap.print_help()
+        return 2
+    names = a.agents or list(_REGISTRY)
+    unknown = [n for n in names if n not in _REGISTRY]
+    if unknown:
+        ap.error(f"agente(s) desconhecido(s): {', '.join(unknown)}")
+    results = [profile_agent(n) for n in names]
+    if a.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        _print(results, a.top if a.top is not None else (10 if len(names) == 1 else 0))
+    return 0 if all("error" not in r for r in results) else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
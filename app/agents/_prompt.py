@@ -0,0 +1,222 @@
+"""
+Montagem de prompts com orçamento de tokens.
+
+O Ollama trunca em silêncio o que passa de `num_ctx` (e gera com o que sobrou); aqui o prompt é
+medido em tokens e cortado por prioridade antes de sair:
+
+  p = build_prompt(system, [Section("DOCS", docs_txt, priority=1),
+                            Section("WEB_SNAPSHOTS", items=pages, priority=2)],
+                   output=(512, 4096))
+  hybrid_ai_chat_with_offline(p.system, p.user, max_tokens=p.max_tokens)
+
+Tokenizer: `tiktoken` (cl100k_base, base do vocabulário do Llama 3) se instalado e com o BPE
+já no cache local (`TIKTOKEN_CACHE_DIR`; nunca baixa); senão uma estimativa por regex (palavras em pedaços de ~4 caracteres,
+pontuação por caractere), levemente pessimista. Contagens ficam em cache por texto e
+`count_tokens_many` mede listas de trechos de uma vez.
+Janela de contexto: o endpoint /v1 do Ollama não aceita `num_ctx` por requisição, então vale a do
+servidor. `AURIX_NUM_CTX` (ou `OLLAMA_CONTEXT_LENGTH`, se o servidor roda com o mesmo ambiente)
+deve repetir esse valor; sem nenhum dos dois, assume o padrão do Ollama (4096) e avisa uma vez.
+"""
+import os, re, threading
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+DEFAULT_NUM_CTX = 4096  # num_ctx padrão do Ollama sem OLLAMA_CONTEXT_LENGTH
+MESSAGE_OVERHEAD = 16  # tokens de template por mensagem (role, delimitadores)
+TRIM_MARK = "\n[...]"
+
+_TOKEN_RE = re.compile(r"\s?\w+|\s?[^\w\s]+|\s+", re.U)
+
+_warned = False
+
+def context_window(model: Optional[str] = None) -> int:
+    global _warned
+    raw = os.environ.get("AURIX_NUM_CTX") or os.environ.get("OLLAMA_CONTEXT_LENGTH")
+    try:
+        if raw:
+            return int(raw)
+    except ValueError:
+        pass
+    if not _warned:
+        _warned = True
+        print(f"⚠️ AURIX_NUM_CTX não definido: assumindo a janela padrão do Ollama ({DEFAULT_NUM_CTX} tokens)")
+    return DEFAULT_NUM_CTX
+
+# ---- tokenizer ----
+
+_BPE_URL = "https://openaipublic.blob.core.windows.net/encodings/cl100k_base.tiktoken"
+
+def _bpe_cached() -> bool:
+    """BPE do cl100k já no cache do tiktoken? Sem ele, get_encoding baixaria o arquivo (offline: trava)."""
+    import hashlib, tempfile
+    if "TIKTOKEN_CACHE_DIR" in os.environ:
+        cache = os.environ["TIKTOKEN_CACHE_DIR"]
+    else:
+        cache = os.environ.get("DATA_GYM_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "data-gym-cache")
+    return bool(cache) and os.path.isfile(os.path.join(cache, hashlib.sha1(_BPE_URL.encode()).hexdigest()))
+
+_enc = None
+_enc_lock = threading.Lock()
+_enc_loaded = False
+
+def _encoding():
+    global _enc, _enc_loaded
+    if not _enc_loaded:
+        with _enc_lock:
+            if not _enc_loaded:
+                if os.environ.get("AURIX_TOKENIZER", "").lower() != "regex" and _bpe_cached():
+                    try:
+                        import tiktoken
+                        _enc = tiktoken.get_encoding("cl100k_base")
+                    except Exception:
+                        _enc = None  # não instalado ou BPE corrompido: estimativa
+                _enc_loaded = True
+    return _enc
+
+def tokenizer_name() -> str:
+    return "tiktoken:cl100k_base" if _encoding() is not None else "regex"
+
+def _regex_pieces(text: str):
+    """(fim_no_texto, tokens) por pedaço — base da contagem e do corte na estimativa."""
+    for m in _TOKEN_RE.finditer(text):
+        s = m.group(0)
+        if s.isspace():
+            n = 1
+        elif s[-1].isalnum() or s[-1] == "_":
+            n = (len(s.lstrip()) + 3) // 4
+        else:
+            n = len(s.strip()) or 1
+        yield m.end(), n
+
+_counts: dict = {}        # texto -> tokens (limpo ao passar de _COUNTS_MAX)
+_COUNTS_MAX = 8192
+
+def _remember(text: str, n: int) -> int:
+    if len(_counts) >= _COUNTS_MAX:
+        _counts.clear()
+    _counts[text] = n
+    return n
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    n = _counts.get(text)
+    if n is None:
+        enc = _encoding()
+        n = _remember(text, len(enc.encode_ordinary(text)) if enc is not None else sum(n for _, n in _regex_pieces(text)))
+    return n
+
+def count_tokens_many(texts: Sequence[str]) -> List[int]:
+    """Conta vários trechos; os que não estão no cache vão num lote só para o tiktoken."""
+    enc = _encoding()
+    missing = [t for t in dict.fromkeys(texts) if t and t not in _counts]
+    if enc is not None and len(missing) > 1:
+        for t, ids in zip(missing, enc.encode_ordinary_batch(missing)):
+            _remember(t, len(ids))
+    return [count_tokens(t) for t in texts]
+
+def truncate_tokens(text: str, max_tokens: int, mark: str = TRIM_MARK) -> str:
+    """Corta `text` para caber em `max_tokens` (incluindo a marca de corte)."""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    keep = max(0, max_tokens - count_tokens(mark))
+    enc = _encoding()
+    if enc is not None:
+        return enc.decode(enc.encode_ordinary(text)[:keep]) + mark
+    used, end = 0, 0
+    for stop, n in _regex_pieces(text):
+        if used + n > keep:
+            break
+        used, end = used + n, stop
+    return text[:end] + mark
+
+# ---- orçamento ----
+
+class Section(NamedTuple):
+    """
+    Trecho do prompt do usuário. `priority` menor = recebe orçamento primeiro.
+    Com `items`, o orçamento da seção é dividido por igual entre eles (itens pequenos ficam
+    inteiros, os grandes são cortados) e cada um sai como `### título` + texto.
+    """
+    name: str
+    text: str = ""
+    priority: int = 1
+    max_tokens: Optional[int] = None
+    items: Sequence[Tuple[str, str]] = ()   # (título, texto)
+
+class Prompt(NamedTuple):
+    system: str
+    user: str
+    prompt_tokens: int
+    max_tokens: int
+    context: int
+    trimmed: dict                            # seção -> (tokens originais, tokens mantidos)
+
+def _render_items(items: List[Tuple[str, str]]) -> str:
+    return "\n\n".join(f"### {title}\n{text}" for title, text in items)
+
+def _fair_share(sizes: List[int], budget: int) -> List[int]:
+    """Divide `budget` entre itens: os que cabem na cota ficam inteiros, a sobra vai para os maiores."""
+    out = [0] * len(sizes)
+    left = sorted(range(len(sizes)), key=lambda i: sizes[i])
+    while left:
+        share = budget // len(left)
+        i = left[0]
+        if sizes[i] <= share:
+            out[i] = sizes[i]; budget -= sizes[i]; left.pop(0)
+        else:
+            for j in left:
+                out[j] = share
+            break
+    return out
+
+def build_prompt(system: str, sections: Sequence[Section], output: Tuple[int, int] = (512, 2048),
+                 context: Optional[int] = None) -> Prompt:
+    """
+    Distribui a janela entre system (inteiro), seções (por prioridade) e saída esperada
+    (`output` = (mínimo, desejado)). As seções recebem o que sobra depois do mínimo da saída;
+    o que elas não usarem volta para a saída, até o desejado.
+    """
+    ctx = context or context_window()
+    out_min, out_want = output
+    header = {s.name: count_tokens(f"{s.name}:\n") for s in sections}
+    avail = ctx - count_tokens(system) - 2 * MESSAGE_OVERHEAD - out_min
+    if avail < 0:
+        raise ValueError(f"system prompt não cabe na janela de {ctx} tokens")
+    parts, trimmed = {}, {}
+    for s in sorted(sections, key=lambda s: s.priority):
+        if s.items:
+            bodies = [f"### {t}\n" for t, _ in s.items]
+            sizes = count_tokens_many([txt for _, txt in s.items])
+            fixed = sum(count_tokens_many(bodies)) + 2 * len(s.items)
+            need = sum(sizes) + fixed
+        else:
+            need = count_tokens(s.text)
+        if not need:
+            continue
+        cap = min(need, s.max_tokens or need, avail - header[s.name])
+        if s.items:
+            shares = _fair_share(sizes, max(0, cap - fixed))
+            kept = [(t, truncate_tokens(txt, n)) for (t, txt), n in zip(s.items, shares) if n > 0]
+            text, cut = _render_items(kept), shares != sizes
+        else:
+            text = truncate_tokens(s.text, cap)
+            cut = text is not s.text
+        used = count_tokens(text)
+        if cut:
+            trimmed[s.name] = (need, used)
+        if not text:
+            continue
+        parts[s.name] = text
+        avail -= used + header[s.name]
+    order = [s.name for s in sections if s.name in parts]
+    user = "\n\n".join(f"{name}:\n{parts[name]}" for name in order)
+    prompt_tokens = count_tokens(system) + count_tokens(user) + 2 * MESSAGE_OVERHEAD
+    return Prompt(system, user, prompt_tokens, max(out_min, min(out_want, ctx - prompt_tokens)), ctx, trimmed)
+
+def fit_output(system: str, user: str, want: int, context: Optional[int] = None) -> Tuple[int, int]:
+    """(prompt_tokens, max_tokens que cabem na janela, até `want`); max_tokens <= 0 = prompt estourou."""
+    ctx = context or context_window()
+    prompt_tokens = count_tokens(system) + count_tokens(user) + 2 * MESSAGE_OVERHEAD
+    return prompt_tokens, min(want, ctx - prompt_tokens)
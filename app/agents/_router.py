@@ -0,0 +1,220 @@
+"""
+Modo corrida do sistema híbrido: Cursor AI e Ollama NITRO começam juntos, vale a primeira
+resposta que passa na validação e o resto é cancelado.
+
+  race_chat(system, user, max_tokens=None, schema=None)       # ou AURIX_LLM_RACE=1 no hybrid
+
+Cada backend acumula corridas, vitórias, respostas válidas e latência (EWMA) em
+`~/aurix/data/llm_router.json` (AURIX_LLM_ROUTER_FILE). Esses números viram os pesos do
+roteamento: o backend com maior taxa de vitória larga primeiro; quem quase nunca ganha
+(depois de MIN_RACES corridas) só larga se o líder passar da latência típica dele — um
+hedge em vez de gastar o Ollama/Cursor em toda chamada.
+
+Cancelamento: backends ainda não iniciados (na espera do hedge) não rodam; os que já estão
+numa chamada terminam em background, numa thread só da corrida, e a resposta é descartada (nem
+o cliente OpenAI nem o check de internet são interrompíveis no meio); a latência deles entra
+nas estatísticas quando chegam, e o arquivo é regravado.
+"""
+import os, time, threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from app.tools import codec
+from app.tools.metrics import LLM_RACES
+from app.tools.tracing import span
+from app.agents import _util
+
+MIN_RACES = 10      # antes disso todos largam juntos
+MIN_SHARE = 0.1     # taxa de vitória abaixo disso: larga atrasado (hedge)
+EWMA_ALPHA = 0.2
+
+def default_path() -> Path:
+    return Path(os.environ.get("AURIX_LLM_ROUTER_FILE") or Path.home() / "aurix" / "data" / "llm_router.json").expanduser()
+
+class RouterStats:
+    """Estatísticas por backend, persistidas em JSON; seguro entre threads."""
+    def __init__(self, path: Optional[os.PathLike] = None):
+        self.path = Path(path).expanduser() if path else default_path()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._stats: Dict[str, dict] = {}
+        try:
+            self._stats = codec.loads(self.path.read_bytes())
+        except Exception:
+            pass
+
+    def _row(self, name: str) -> dict:
+        return self._stats.setdefault(name, {"races": 0, "wins": 0, "valid": 0, "errors": 0, "ewma_s": None})
+
+    def weight(self, name: str) -> float:
+        """Taxa de vitória suavizada (Laplace): 0.5 sem histórico."""
+        r = self._stats.get(name) or {}
+        return (r.get("wins", 0) + 1) / (r.get("races", 0) + 2)
+
+    def plan(self, names: List[str]) -> List[Tuple[str, float]]:
+        """(backend, atraso de largada em s), do maior peso para o menor."""
+        with self._lock:
+            order = sorted(names, key=lambda n: -self.weight(n))
+            lead = self._stats.get(order[0]) or {}
+            out = [(order[0], 0.0)]
+            for n in order[1:]:
+                r = self._stats.get(n) or {}
+                late = r.get("races", 0) >= MIN_RACES and self.weight(n) < MIN_SHARE and lead.get("ewma_s")
+                out.append((n, float(lead["ewma_s"]) if late else 0.0))
+            return out
+
+    def record(self, name: str, latency_s: Optional[float], valid: bool, error: bool = False):
+        with self._lock:
+            r = self._row(name)
+            r["valid"] += int(valid)
+            r["errors"] += int(error)
+            if latency_s is not None and valid:
+                r["ewma_s"] = latency_s if r["ewma_s"] is None else (1 - EWMA_ALPHA) * r["ewma_s"] + EWMA_ALPHA * latency_s
+
+    def finish(self, started: List[str], winner: Optional[str]):
+        with self._lock:
+            for n in started:
+                r = self._row(n)
+                r["races"] += 1
+                r["wins"] += int(n == winner)
+        self.save()
+
+    def save(self):
+        # snapshot + escrita sob o mesmo lock: um snapshot velho nunca sobrescreve um mais novo
+        with self._save_lock:
+            with self._lock:
+                snap = codec.dumps(self._stats, pretty=True)
+            try:
+                _util.ensure_dir(self.path.parent)
+                _util.atomic_write(self.path, snap)
+            except OSError:
+                pass
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {n: {**r, "weight": round(self.weight(n), 3)} for n, r in self._stats.items()}
+
+_router: Optional[RouterStats] = None
+_router_lock = threading.Lock()
+
+def get_router() -> RouterStats:
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = RouterStats()
+        return _router
+
+# ---- backends (retornam o texto ou None se cancelados antes de chamar o modelo) ----
+
+def _cursor(system: str, user: str, max_tokens, schema, cancel: threading.Event) -> Optional[str]:
+    if not _util._check_internet():
+        raise ConnectionError("sem internet")
+    if cancel.is_set():
+        return None
+    return _util.cursor_ai_chat(system, user)
+
+def _ollama(system: str, user: str, max_tokens, schema, cancel: threading.Event) -> Optional[str]:
+    return _util.ollama_nitro_chat(system, user, max_tokens, schema)
+
+def _valid(name: str, text: str, system: str, user: str, schema) -> bool:
+    if name == "cursor":
+        return _util._validate_cursor_response(text, system, user)
+    if _util._is_offline(text):
+        return False
+    if schema:
+        try:
+            _util._parse_json(text)
+        except Exception:
+            return False
+    return True
+
+BACKENDS: Dict[str, Callable] = {"cursor": _cursor, "ollama": _ollama}
+
+def race_chat(system: str, user: str, max_tokens: Optional[int] = None, schema: Optional[dict] = None,
+              backends: Tuple[str, ...] = ("cursor", "ollama"), timeout_s: Optional[float] = None,
+              router: Optional[RouterStats] = None) -> str:
+    """
+    Primeira resposta válida entre os backends; nenhuma válida: a do Ollama (ou o template offline).
+    Cada corrida usa threads próprias (daemon): perdedores que não dá para interromper terminam
+    sozinhos sem ocupar um pool compartilhado e atrasar a largada das corridas seguintes.
+    """
+    import queue
+    router = router or get_router()
+    cancel = threading.Event()
+    started: List[str] = []
+    plan = router.plan(list(backends))
+    done: "queue.Queue[tuple]" = queue.Queue()
+    gate = threading.Lock()
+    decided = [False]  # sob `gate`: depois disso quem termina só alimenta as estatísticas
+
+    def _run(name: str, delay: float):
+        """Põe (nome, texto | None se cancelado, latência, exceção) na fila, ou trata como atrasado."""
+        if (delay and cancel.wait(delay)) or cancel.is_set():
+            out = (name, None, None, None)  # o líder já respondeu: nem larga
+        else:
+            started.append(name)
+            t0 = time.perf_counter()
+            try:
+                out = (name, BACKENDS[name](system, user, max_tokens, schema, cancel), time.perf_counter() - t0, None)
+            except Exception as e:
+                out = (name, None, time.perf_counter() - t0, e)
+        with gate:
+            if not decided[0]:
+                done.put(out)
+                return
+        _late(out)
+
+    def _account(name, text, latency, err) -> bool:
+        if err is not None:
+            print(f"⚠️ Corrida: {name} falhou: {err}")
+            router.record(name, None, False, error=True)
+            LLM_RACES.inc(backend=name, result="error")
+            return False
+        ok = _valid(name, text, system, user, schema)
+        router.record(name, latency, ok)
+        return ok
+
+    def _late(out):
+        # perdedor que terminou depois do vencedor: alimenta a latência e persiste de novo
+        name, text, latency, err = out
+        if text is not None or err is not None:
+            ok = _account(name, text, latency, err)
+            if err is None:
+                LLM_RACES.inc(backend=name, result="lost" if ok else "invalid")
+            router.save()
+
+    with span("llm.race", backends=",".join(n for n, _ in plan)) as sp:
+        t_start = time.monotonic()
+        for n, d in plan:
+            threading.Thread(target=_run, args=(n, d), daemon=True, name=f"llm-race-{n}").start()
+        winner, answers, pending = None, {}, len(plan)
+        while pending and winner is None:
+            left = None if timeout_s is None else max(0.0, timeout_s - (time.monotonic() - t_start))
+            try:
+                name, text, latency, err = done.get(timeout=left)
+            except queue.Empty:
+                break  # timeout
+            pending -= 1
+            if text is None and err is None:
+                continue
+            ok = _account(name, text, latency, err)
+            if err is not None:
+                continue
+            answers[name] = text
+            if ok:
+                winner = name
+                LLM_RACES.inc(backend=name, result="won")
+            else:
+                LLM_RACES.inc(backend=name, result="invalid")
+        cancel.set()
+        with gate:
+            decided[0] = True
+            late = []
+            while not done.empty():
+                late.append(done.get_nowait())  # terminaram junto com o vencedor
+        router.finish(list(started), winner)
+        for out in late:
+            _late(out)
+        sp.set(winner=winner or "none", started=len(started))
+    if winner:
+        return answers[winner]
+    return answers.get("ollama") or _util._offline_template_fallback(system, user)
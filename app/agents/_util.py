@@ -1,6 +1,9 @@
-import os, json, re, tempfile, fcntl, shutil, time
+import os, re, errno, tempfile, fcntl, shutil, time, hashlib, threading
 from pathlib import Path
-from typing import Iterable, Tuple
+from typing import Iterable, Tuple, Mapping
+from app.tools.tracing import span, traced
+from app.tools.metrics import CACHE_LOOKUPS, LLM_REQUESTS, LLM_LATENCY, LLM_STRUCTURED
+from app.tools import codec
 
 def ensure_dir(p: Path):
     p.mkdir(parents=True, exist_ok=True)
@@ -8,14 +11,101 @@ def ensure_dir(p: Path):
 def atomic_write(path: Path, content: str):
     path = path.expanduser().resolve()
     ensure_dir(path.parent)
-    tmp = Path(tempfile.mkstemp(prefix=".tmp_", dir=str(path.parent))[1])
-    with open(tmp, "w", encoding="utf-8") as f:
-        f.write(content)
-        f.flush(); os.fsync(f.fileno())
-    os.replace(tmp, path)
+    fd, tmp = tempfile.mkstemp(prefix=".tmp_", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+            f.flush(); os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try: os.unlink(tmp)
+        except OSError: pass
+        raise
+
+class DigestIndex:
+    """
+    Índice sidecar path -> (size, mtime_ns, sha256).
+    Se size e mtime_ns batem com o stat atual, o sha256 guardado é confiável
+    e a comparação não precisa ler o arquivo; caso contrário (edição externa)
+    o chamador volta a ler/hashear o conteúdo.
+    """
+    def __init__(self, path: Path):
+        self.path = Path(path).expanduser()
+        self._lock = threading.Lock()
+        self._dirty = False
+        try:
+            self._entries: dict[str, list] = codec.loads(self.path.read_bytes())
+        except Exception:
+            self._entries = {}
+
+    @staticmethod
+    def _key(path: Path) -> str:
+        return os.path.abspath(str(path))
+
+    def lookup(self, path: Path, st: os.stat_result) -> str | None:
+        with self._lock:
+            e = self._entries.get(self._key(path))
+        if e and e[0] == st.st_size and e[1] == st.st_mtime_ns:
+            return e[2]
+        return None
+
+    def record(self, path: Path, sha: str, st: os.stat_result | None = None):
+        try:
+            st = st or os.stat(path)
+        except OSError:
+            return
+        entry = [st.st_size, st.st_mtime_ns, sha]
+        with self._lock:
+            key = self._key(path)
+            if self._entries.get(key) != entry:
+                self._entries[key] = entry; self._dirty = True
+
+    def digest(self, path: Path) -> str | None:
+        """sha256 atual do arquivo (stat + dict quando possível, leitura caso contrário)."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        known = self.lookup(path, st)
+        CACHE_LOOKUPS.inc(cache="digest_index", result="hit" if known else "miss")
+        if known is None:
+            known = _sha256_file(path)
+            if known is not None: self.record(path, known, st)
+        return known
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = codec.dumps(self._entries)
+            self._dirty = False
+        atomic_write(self.path, data)
+
+    def __enter__(self):
+        return self
 
-def write_if_changed(path: Path, content: str) -> bool:
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+
+_digest_indexes: dict[str, DigestIndex] = {}
+
+def digest_index(path: Path | None = None) -> DigestIndex:
+    """Índice compartilhado por processo (default: ~/aurix/data/.digests.json)."""
+    path = Path(path or Path.home()/ "aurix"/ "data"/ ".digests.json").expanduser()
+    key = str(path)
+    if key not in _digest_indexes:
+        _digest_indexes[key] = DigestIndex(path)
+    return _digest_indexes[key]
+
+def write_if_changed(path: Path, content: str, index: DigestIndex | None = None) -> bool:
     path = path.expanduser()
+    if index is not None:
+        new = _sha256_bytes(content.encode("utf-8"))
+        if index.digest(path) == new:
+            return False
+        atomic_write(path, content)
+        index.record(path, new)
+        return True
     if path.exists():
         try:
             if path.read_text(encoding="utf-8") == content:
@@ -25,6 +115,152 @@ def write_if_changed(path: Path, content: str) -> bool:
     atomic_write(path, content)
     return True
 
+def _sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def _sha256_file(path: Path) -> str | None:
+    h = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    except OSError:
+        return None
+    return h.hexdigest()
+
+def _fsync_dir(d: Path):
+    try:
+        fd = os.open(str(d), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def _stage(path: Path, data: bytes) -> str:
+    fd, tmp = tempfile.mkstemp(prefix=".tmp_", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush(); os.fsync(f.fileno())
+    except BaseException:
+        try: os.unlink(tmp)
+        except OSError: pass
+        raise
+    return tmp
+
+def write_batch(files: Mapping[Path, str] | Iterable[Tuple[Path, str]], max_workers: int = 8,
+                index: DigestIndex | None = None) -> list[Path]:
+    """
+    Escrita transacional de vários arquivos.
+    1) compara por sha256 e descarta os inalterados
+    2) grava todos em temporários (em paralelo) com fsync
+    3) renomeia todos; se algum rename falhar, restaura o conjunto inteiro
+    4) fsync de cada diretório pai uma única vez
+    Com `index`, a comparação usa stat + DigestIndex e só lê arquivos editados externamente.
+    Retorna a lista de caminhos efetivamente alterados.
+    """
+    items = files.items() if isinstance(files, Mapping) else files
+    wanted: dict[Path, bytes] = {}
+    for p, content in items:
+        wanted[Path(p).expanduser().resolve()] = content.encode("utf-8")
+    if not wanted:
+        return []
+    with span("io.write_batch", files=len(wanted), bytes=sum(map(len, wanted.values()))) as sp:
+        changed = _write_batch(wanted, max_workers, index)
+        sp.set(changed=len(changed))
+    return changed
+
+def _write_batch(wanted: dict[Path, bytes], max_workers: int, index: DigestIndex | None) -> list[Path]:
+    workers = max(1, min(max_workers, len(wanted)))
+
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        paths = list(wanted)
+        current = list(ex.map(index.digest if index is not None else _sha256_file, paths))
+        new_digests = {p: _sha256_bytes(wanted[p]) for p in paths}
+        changed = [p for p, h in zip(paths, current) if h != new_digests[p]]
+        if not changed:
+            return []
+        for d in {p.parent for p in changed}:
+            ensure_dir(d)
+        futs = {p: ex.submit(_stage, p, wanted[p]) for p in changed}
+        staged: dict[Path, str] = {}
+        err = None
+        for p, fut in futs.items():
+            try:
+                staged[p] = fut.result()
+            except BaseException as e:
+                err = err or e
+    if err is not None:
+        for tmp in staged.values():
+            try: os.unlink(tmp)
+            except OSError: pass
+        raise err
+
+    # backups via hardlink (cópia só em FS sem link) para permitir rollback do conjunto; o lock por caminho
+    # serializa write_batch concorrentes no mesmo arquivo (link() falha se o alvo é trocado no meio)
+    locks = _path_locks(changed)
+    for lk in locks: lk.acquire()
+    try:
+        return _commit_batch(changed, staged, new_digests, index)
+    finally:
+        for lk in reversed(locks): lk.release()
+
+# locks em faixas (hash do caminho): memória fixa num processo de vida longa (daemon, workers);
+# caminhos na mesma faixa só se serializam à toa
+_PATH_STRIPES = 64
+_path_stripes = [threading.Lock() for _ in range(_PATH_STRIPES)]
+
+def _path_locks(paths: list[Path]) -> list[threading.Lock]:
+    # uma vez por faixa e sempre na mesma ordem: dois lotes nunca se travam mutuamente
+    return [_path_stripes[i] for i in sorted({hash(p) % _PATH_STRIPES for p in paths})]
+
+def _commit_batch(changed: list[Path], staged: dict[Path, str], new_digests: dict[Path, str],
+                  index: DigestIndex | None) -> list[Path]:
+    backups: dict[Path, str | None] = {}
+    done: list[Path] = []
+    try:
+        for p in changed:
+            bak = None
+            if p.exists():
+                # nome único por chamada: write_batch concorrentes no mesmo arquivo não dividem o backup
+                bak = str(p.parent / f".bak_{os.urandom(6).hex()}_{p.name}")
+                try:
+                    os.link(p, bak)
+                except OSError as e:
+                    if e.errno not in (errno.EPERM, errno.ENOTSUP, errno.EOPNOTSUPP, errno.EXDEV, errno.EMLINK):
+                        raise
+                    shutil.copy2(p, bak)  # FS sem hardlink (FUSE, SMB): backup por cópia
+            backups[p] = bak
+            os.replace(staged[p], p)
+            done.append(p)
+    except BaseException:
+        for p in reversed(done):
+            try:
+                if backups.get(p): os.replace(backups[p], p)
+                else: os.unlink(p)
+            except OSError:
+                pass
+        for p in changed:
+            for leftover in (staged[p], backups.get(p)):
+                if leftover and os.path.lexists(leftover):
+                    try: os.unlink(leftover)
+                    except OSError: pass
+        raise
+    for bak in backups.values():
+        if bak:
+            try: os.unlink(bak)
+            except OSError: pass
+    for d in {p.parent for p in changed}:
+        _fsync_dir(d)
+    if index is not None:
+        for p in changed: index.record(p, new_digests[p])
+    return changed
+
 def file_lock(lock_path: Path):
     class _Lock:
         def __enter__(self):
@@ -71,6 +307,12 @@ def _check_cursor_ai_available() -> bool:
     # TODO: Implementar verificação real da API do Cursor
     return True
 
+OFFLINE_MARK = "TEMPLATE OFFLINE"
+
+def _is_offline(text: str) -> bool:
+    """Resposta é o template offline (nenhum LLM respondeu)."""
+    return text.lstrip().startswith(OFFLINE_MARK)
+
 def _offline_template_fallback(system: str, user: str) -> str:
     """Fallback offline com templates locais"""
     return f"""
@@ -82,6 +324,7 @@ RESPONDA EM JSON VÁLIDO CONFORME O PROMPT ACIMA.
 Se não conseguir gerar JSON válido, retorne um esqueleto básico.
 """
 
+@traced("llm.cursor")
 def cursor_ai_chat(system: str, user: str) -> str:
     """
     Cursor AI - Principal (sem sobrecarga)
@@ -121,22 +364,62 @@ def _get_optimal_model_config() -> tuple[str, int]:
     else:
         return "llama3.1:8b", 256   # MINI NITRO mode
 
-def ollama_nitro_chat(system: str, user: str) -> str:
+def ollama_nitro_chat(system: str, user: str, max_tokens: int | None = None, schema: dict | None = None) -> str:
     """
     Ollama NITRO - Configuração automática baseada na memória disponível
     Funciona offline como reforço para Cursor AI
+    max_tokens: saída pedida pelo chamador (ex.: Prompt.max_tokens de _prompt.build_prompt);
+    fica limitada pela memória e pelo que sobra da janela de contexto depois do prompt.
+    schema: JSON Schema da resposta (decodificação restrita pelo `format` do Ollama).
     """
+    from app.agents._prompt import context_window, count_tokens, fit_output, truncate_tokens, MESSAGE_OVERHEAD
     # Detectar configuração ótima
-    model, max_tokens = _get_optimal_model_config()
+    model, mem_tokens = _get_optimal_model_config()
     memory_gb = _get_available_memory_gb()
+    ctx = context_window(model)
+    prompt_tokens, max_tokens = fit_output(system, user, min(max_tokens or mem_tokens, mem_tokens), ctx)
+    if max_tokens < 256:
+        # o Ollama cortaria o prompt em silêncio; corta aqui o fim do user e avisa
+        print(f"⚠️ NITRO: prompt de {prompt_tokens} tokens não cabe em {ctx}; cortando o conteúdo do usuário")
+        user = truncate_tokens(user, max(0, ctx - 256 - count_tokens(system) - 2 * MESSAGE_OVERHEAD))
+        prompt_tokens, max_tokens = fit_output(system, user, min(mem_tokens, 256), ctx)
     
-    print(f"⚡ NITRO: Memória disponível: {memory_gb:.1f}GB, Modelo: {model}, Tokens: {max_tokens}")
+    print(f"⚡ NITRO: Memória disponível: {memory_gb:.1f}GB, Modelo: {model}, Prompt: {prompt_tokens}/{ctx}, Tokens: {max_tokens}")
     
     base = os.environ.get("OLLAMA_BASE", "http://localhost:11434/v1")
     
+    with span("llm.ollama", model=model, max_tokens=max_tokens, prompt_tokens=prompt_tokens, prompt_chars=len(system) + len(user)) as sp:
+        t0 = time.perf_counter()
+        out, outcome = _ollama_nitro_request(base, model, max_tokens, system, user, schema)
+        LLM_LATENCY.observe(time.perf_counter() - t0, backend="ollama", model=model)
+        LLM_REQUESTS.inc(backend="ollama", model=model, outcome=outcome)
+        sp.set(response_chars=len(out), outcome=outcome)
+        return out
+
+_llm_clients: dict[str, object] = {}
+_llm_clients_lock = threading.Lock()
+
+def _llm_client(base: str):
+    """Cliente OpenAI-compatível por base URL, reaproveitado entre chamadas (pool HTTP quente)."""
+    with _llm_clients_lock:
+        client = _llm_clients.get(base)
+        if client is None:
+            from openai import OpenAI
+            client = _llm_clients[base] = OpenAI(base_url=base, api_key="ollama")
+        return client
+
+def _response_format(schema: dict | None) -> dict:
+    """`response_format` do endpoint /v1 do Ollama: vira o `format` (gramática do schema) do /api/chat."""
+    if not schema:
+        return {}
+    return {"response_format": {"type": "json_schema", "json_schema": {"name": schema.get("title") or "output", "schema": schema}}}
+
+def _ollama_nitro_request(base: str, model: str, max_tokens: int, system: str, user: str,
+                          schema: dict | None = None) -> tuple[str, str]:
+    """Retorna (texto, outcome) com outcome em ok | retry_ok | offline."""
+    fmt = _response_format(schema)
     try:
-        from openai import OpenAI
-        client = OpenAI(base_url=base, api_key="ollama")
+        client = _llm_client(base)
         
         # Configuração otimizada para NITRO
         r = client.chat.completions.create(
@@ -146,9 +429,10 @@ def ollama_nitro_chat(system: str, user: str) -> str:
             messages=[
                 {"role": "system", "content": f"NITRO MODE ({max_tokens}t): {system}"},
                 {"role": "user", "content": user}
-            ]
+            ],
+            **fmt
         )
-        return r.choices[0].message.content.strip()
+        return r.choices[0].message.content.strip(), "ok"
         
     except Exception as e:
         print(f"⚠️ Ollama NITRO falhou: {e}")
@@ -164,40 +448,56 @@ def ollama_nitro_chat(system: str, user: str) -> str:
                     messages=[
                         {"role": "system", "content": f"ULTRA NITRO: {system}"},
                         {"role": "user", "content": user}
-                    ]
+                    ],
+                    **fmt
                 )
-                return r.choices[0].message.content.strip()
+                return r.choices[0].message.content.strip(), "retry_ok"
             except:
                 pass
         
         # Fallback para template offline
-        return _offline_template_fallback(system, user)
+        return _offline_template_fallback(system, user), "offline"
 
-def hybrid_ai_chat_with_offline(system: str, user: str) -> str:
+@traced("llm.hybrid")
+def hybrid_ai_chat_with_offline(system: str, user: str, max_tokens: int | None = None, schema: dict | None = None,
+                                race: bool | None = None) -> str:
     """
     Sistema Híbrido Inteligente: Cursor AI + Ollama NITRO + Modo Offline
+    max_tokens: orçamento de saída (repassado ao Ollama NITRO)
+    schema: JSON Schema da resposta (ver structured_chat)
+    race: backends em paralelo, vale a primeira resposta válida (padrão: AURIX_LLM_RACE=1; ver _router)
     """
+    if race is None:
+        race = os.environ.get("AURIX_LLM_RACE", "").lower() in ("1", "true", "yes")
+    if race:
+        from app.agents._router import race_chat
+        return race_chat(system, user, max_tokens, schema)
     try:
         # 1. Verificar conectividade
         if not _check_internet():
             print("🌐 Sem internet - Ativando Ollama NITRO Offline...")
-            return ollama_nitro_chat(system, user)
+            return ollama_nitro_chat(system, user, max_tokens, schema)
         
         # 2. Tentar Cursor AI (online)
+        t0 = time.perf_counter()
         try:
             cursor_response = cursor_ai_chat(system, user)
-            if _validate_cursor_response(cursor_response, system, user):
+            valid = _validate_cursor_response(cursor_response, system, user)
+            LLM_LATENCY.observe(time.perf_counter() - t0, backend="cursor", model="cursor")
+            LLM_REQUESTS.inc(backend="cursor", model="cursor", outcome="ok" if valid else "invalid")
+            if valid:
                 return cursor_response
         except Exception as e:
+            LLM_REQUESTS.inc(backend="cursor", model="cursor", outcome="error")
             print(f"⚠️ Cursor AI falhou: {e}")
         
         # 3. Fallback para Ollama NITRO (local)
         print("🚀 Ativando Ollama NITRO local...")
-        return ollama_nitro_chat(system, user)
+        return ollama_nitro_chat(system, user, max_tokens, schema)
         
     except Exception as e:
         print(f"🔄 Fallback final para Ollama NITRO: {e}")
-        return ollama_nitro_chat(system, user)
+        return ollama_nitro_chat(system, user, max_tokens, schema)
 
 def _validate_cursor_response(response: str, system: str, user: str) -> bool:
     """
@@ -205,7 +505,7 @@ def _validate_cursor_response(response: str, system: str, user: str) -> bool:
     """
     # 1. JSON válido?
     try:
-        json.loads(response)
+        codec.loads(response)
     except:
         return False
     
@@ -244,10 +544,71 @@ def extract_json_tail(s: str) -> dict:
     m = re.search(r"\{.*\}\s*$", s, re.S)
     if not m:
         raise ValueError("LLM não retornou JSON")
-    return json.loads(m.group(0))
+    return codec.loads(m.group(0))
+
+# ==== SAÍDA ESTRUTURADA (schema por agente + validação pydantic + reparo) ====
+
+SCHEMA_MARK = "FORMATO DE SAÍDA (JSON Schema):"
+
+def schema_prompt(system: str, model_cls) -> str:
+    """Anexa o schema ao system prompt (idempotente): guia o Cursor e modelos sem `format`."""
+    if SCHEMA_MARK in system:
+        return system
+    schema = codec.dumps(model_cls.model_json_schema())
+    return f"{system}\n\n{SCHEMA_MARK}\n{schema}\nResponda somente com um objeto JSON válido conforme o schema, sem texto fora dele."
+
+def _parse_json(text: str):
+    """JSON puro, em bloco ``` ou no meio de texto (do primeiro '{' ao último '}')."""
+    t = text.strip()
+    if t.startswith("```"):
+        t = t.split("\n", 1)[-1].rsplit("```", 1)[0].strip()
+    try:
+        return codec.loads(t)
+    except Exception:
+        a, b = t.find("{"), t.rfind("}")
+        if a < 0 or b <= a:
+            raise ValueError("LLM não retornou JSON")
+        return codec.loads(t[a:b + 1])
+
+def _validation_errors(e: Exception) -> str:
+    errors = getattr(e, "errors", None)
+    if callable(errors):
+        return "\n".join(f"- {'.'.join(map(str, x.get('loc', ()))) or '(raiz)'}: {x.get('msg')}" for x in errors()[:20])
+    return f"- {e}"
+
+def structured_chat(system: str, user: str, model_cls, max_tokens: int | None = None, repairs: int = 2,
+                    race: bool | None = None):
+    """
+    Chamada LLM com saída validada por um modelo pydantic (app/models.py).
+    O schema vai no system prompt e no `format` do Ollama; resposta inválida gera até `repairs`
+    pedidos de correção curtos (só a saída anterior + os erros, sem reenviar o prompt inteiro).
+    Retorna a instância validada; esgotados os reparos, ValueError.
+    """
+    from app.agents._prompt import truncate_tokens
+    name = model_cls.__name__
+    schema = model_cls.model_json_schema()
+    system = schema_prompt(system, model_cls)
+    prompt = user
+    for attempt in range(repairs + 1):
+        out = hybrid_ai_chat_with_offline(system, prompt, max_tokens=max_tokens, schema=schema, race=race)
+        try:
+            obj = model_cls.model_validate(_parse_json(out))
+            LLM_STRUCTURED.inc(schema=name, outcome="repaired" if attempt else "ok")
+            return obj
+        except ValueError as e:  # JSON inválido ou pydantic.ValidationError
+            errs = _validation_errors(e)
+            if _is_offline(out):
+                # sem LLM: pedir reparo só repetiria o template pelo mesmo caminho offline
+                LLM_STRUCTURED.inc(schema=name, outcome="offline")
+                raise ValueError(f"LLM indisponível (template offline): sem {name} válido") from e
+            print(f"⚠️ Saída {name} inválida (tentativa {attempt + 1}/{repairs + 1}):\n{errs}")
+            prompt = (f"SAÍDA ANTERIOR (inválida):\n{truncate_tokens(out, 6000)}\n\nERROS:\n{errs}\n\n"
+                      "Devolva apenas o JSON corrigido, completo, conforme o schema.")
+    LLM_STRUCTURED.inc(schema=name, outcome="failed")
+    raise ValueError(f"LLM não retornou {name} válido após {repairs} reparos:\n{errs}")
 
 # MCP helpers
-def mcp_call(server: str, tool: str, params: dict, timeout_s: int = 30) -> dict:
+def mcp_call(server: str, tool: str, params: dict, timeout_s: float | None = None) -> dict:
     from app.mcp import get_mcp_client
     client = get_mcp_client()
     return client.call(server, tool, params, timeout_s=timeout_s)
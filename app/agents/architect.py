@@ -1,6 +1,8 @@
+import hashlib
 from pathlib import Path
-import json
-from app.agents._util import list_docs, find_urls, hybrid_ai_chat_with_offline, extract_json_tail, mcp_call, ensure_dir, write_if_changed
+from app.tools import codec
+from app.agents._prompt import Section, build_prompt, context_window, truncate_tokens
+from app.agents._util import list_docs, find_urls, structured_chat, schema_prompt, mcp_call, ensure_dir, write_if_changed, digest_index
 
 def _load_prompt() -> str:
     p = Path.home()/ "aurix-context"/ "agents"/ "architect.md"
@@ -28,9 +30,9 @@ def _gather_context() -> tuple[str, list[str]]:
 def _fetch_web(urls: list[str]) -> list[dict]:
     out=[]
     for u in urls[:10]:  # limite de 10 páginas
-        r = mcp_call("http","fetch",{"url": u}, timeout_s=20)
+        r = mcp_call("http","get",{"url": u})  # GET idempotente: timeout/retries/cache de servers.yaml
         if r.get("ok"):
-            text = (r["data"].get("text","") or "")[:150000]
+            text = (r["data"].get("text") or r["data"].get("content") or "")[:150000]
             out.append({"url":u,"text":text})
     return out
 
@@ -38,73 +40,147 @@ def _save_research(pages: list[dict]):
     root = Path.home()/ "aurix"/ "data"/ "research"
     ensure_dir(root)
     saved=[]
-    for i,p in enumerate(pages, start=1):
-        fp = root/ f"page_{i:02d}.json"
-        write_if_changed(fp, json.dumps(p, ensure_ascii=False, indent=2))
-        saved.append(str(fp))
+    with digest_index() as idx:
+        for i,p in enumerate(pages, start=1):
+            fp = root/ f"page_{i:02d}.json"
+            write_if_changed(fp, codec.dumps(p), index=idx)  # snapshot só lido por máquina: compacto
+            saved.append(str(fp))
     return saved
 
 def _write_tasks(tasks: list[dict]) -> list[str]:
     bl = Path.home()/ "aurix"/ "data"/ "backlog"
     ensure_dir(bl)
     written=[]
-    for t in tasks:
-        tid = t["id"]
-        fp = bl/ f"{tid}.json"
-        write_if_changed(fp, json.dumps(t, ensure_ascii=False, indent=2))
-        written.append(str(fp))
+    with digest_index() as idx:
+        for t in tasks:
+            tid = t["id"]
+            fp = bl/ f"{tid}.json"
+            write_if_changed(fp, codec.dumps(t, pretty=True), index=idx)
+            written.append(str(fp))
     return written
 
 def _write_plan(arch: dict) -> str:
     plan = Path.home()/ "aurix"/ "data"/ "architecture"/ "aurix.plan.json"
     ensure_dir(plan.parent)
-    write_if_changed(plan, json.dumps(arch, ensure_ascii=False, indent=2))
+    with digest_index() as idx:
+        write_if_changed(plan, codec.dumps(arch, pretty=True), index=idx)
     return str(plan)
 
-def _dispatch_followups(tasks: list[dict]) -> dict:
+def _ticket_path(tid: str) -> str:
+    return str((Path.home()/ "aurix"/ "data"/ "backlog"/ f"{tid}.json").expanduser())
+
+# ---- pipeline durável (app/tools/jobqueue) ----
+# gather -> research -> plan (LLM) -> dev:<ticket> ... -> qa -> package
+# Cada etapa é um job com entrada/saída no SQLite; um run interrompido retoma do último job concluído
+# (o plano do LLM e os tickets já construídos não são refeitos se as entradas não mudaram).
+
+def _sha(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+def _job_gather(ctx) -> dict:
+    docs_txt, urls = _gather_context()
+    urls = urls if ctx.input["scrape"] else []
+    research = ctx.submit("research", input={"urls": urls})
+    # plan lê a saída deste job: depende dele também (senão pode largar antes de gather estar `done`)
+    ctx.submit("plan", input={"prompt": ctx.input["prompt"], "docs": _sha(docs_txt), "urls": urls},
+               deps=[research, ctx.job["id"]], max_attempts=2)
+    return {"docs": docs_txt, "urls": urls}
+
+def _job_research(ctx) -> dict:
+    pages = _fetch_web(ctx.input["urls"])
+    saved = _save_research(pages)  # texto inteiro fica nos arquivos de pesquisa
+    # a saída do job vai para o SQLite e é relida pelo plan: nenhuma página passa da janela
+    cap = context_window()
+    return {"pages": [{**p, "text": truncate_tokens(p.get("text") or "", cap)} for p in pages], "saved": saved}
+
+def _job_plan(ctx) -> dict:
+    docs_txt = ctx.dep_output("gather")["docs"]
+    pages = ctx.dep_output("research")["pages"]
+    from app.models import ArchitectOut
+    # orçamento de tokens: system (+ schema) inteiro, docs primeiro (até 60% da janela), páginas divididas por igual, saída (1024..4096)
+    prompt = build_prompt(schema_prompt(_load_prompt(), ArchitectOut), [
+        Section("DOCS", docs_txt, priority=1, max_tokens=int(context_window() * 0.6)),
+        Section("WEB_SNAPSHOTS", items=[(p["url"], p["text"]) for p in pages], priority=2),
+    ], output=(1024, 4096))
+    if prompt.trimmed:
+        print(f"✂️  Prompt ajustado à janela de {prompt.context} tokens: " +
+              ", ".join(f"{k} {a}->{b}" for k, (a, b) in prompt.trimmed.items()))
+    print("🚀 Usando sistema híbrido Cursor AI + Ollama NITRO...")
+    data = structured_chat(prompt.system, prompt.user, ArchitectOut, max_tokens=prompt.max_tokens).model_dump()
+    tasks = data.get("tasks",[])
+    plan_path = _write_plan(data["architecture"])
+    tasks_written = _write_tasks(tasks)
+    # filhos: um job por ticket do dev_builder, QA depois de todos, packager por último
+    dev = [t for t in tasks if t.get("owner")=="dev_builder"]
+    dev_jobs = [ctx.submit("dev", t["id"], input={"ticket": t}, max_attempts=2) for t in dev]
+    ctx.queue.discard(ctx.run_id, "dev", keep=[t["id"] for t in dev])
+    tail = dev_jobs
+    if dev:
+        tail = [ctx.submit("qa", input={"tickets": dev}, deps=dev_jobs)]
+    else:
+        ctx.queue.discard(ctx.run_id, "qa")
+    if any(t.get("owner")=="packager" for t in tasks):
+        ctx.submit("package", input={"tasks": [t.get("id") for t in tasks]}, deps=tail)
+    else:
+        ctx.queue.discard(ctx.run_id, "package")
+    return {"plan": plan_path, "tasks": tasks_written}
+
+def _job_dev(ctx) -> dict:
     from app.agents import dispatch_agent
-    results={"dev":[],"qa":None,"packager":None}
-    # 1) Dev Builder
-    for t in tasks:
-        if t.get("owner")=="dev_builder":
-            path = str((Path.home()/ "aurix"/ "data"/ "backlog"/ f"{t['id']}.json").expanduser())
-            res = dispatch_agent("dev_builder", {"ticket_path": path})
-            results["dev"].append({"id": t["id"], "result": res})
-    # 2) QA
-    any_dev = any(x.get("result",{}).get("ok") for x in results["dev"])
-    if any_dev:
-        results["qa"] = dispatch_agent("qa_tester", {"paths":[str(Path.home()/ "aurix"/ "app")]})
-    # 3) Packager (se houver task correspondente)
-    need_pkg = any(t.get("owner")=="packager" for t in tasks)
-    if need_pkg:
-        results["packager"] = dispatch_agent("packager", {"entry":"app/main.py","name":"Aurix","onefile":True})
-    return results
+    tid = ctx.input["ticket"]["id"]
+    return {"id": tid, "result": dispatch_agent("dev_builder", {"ticket_path": _ticket_path(tid)})}
+
+def _job_qa(ctx):
+    from app.agents import dispatch_agent
+    dev = [ctx.dep_output("dev", t["id"]) or {} for t in ctx.input["tickets"]]
+    if not any(x.get("result",{}).get("ok") for x in dev):
+        return None
+    return dispatch_agent("qa_tester", {"paths":[str(Path.home()/ "aurix"/ "app")]})
+
+def _job_package(ctx):
+    from app.agents import dispatch_agent
+    return dispatch_agent("packager", {"entry":"app/main.py","name":"Aurix","onefile":True})
+
+HANDLERS = {"gather": _job_gather, "research": _job_research, "plan": _job_plan,
+            "dev": _job_dev, "qa": _job_qa, "package": _job_package}
 
 def run(task: dict) -> dict:
     """
-    task = {"scrape": true|false (default true)}
+    task = {
+      "scrape": true|false (default true),
+      "run_id": "architect",   # jobs em ~/aurix/data/jobs.sqlite (AURIX_JOBS_DB)
+      "workers": 1,            # >1: tickets em paralelo (tickets que geram os mesmos arquivos competem)
+      "fresh": false           # true: descarta um run interrompido e começa do zero
+    }
+    Um run interrompido (crash, Ctrl-C, ticket que falhou) é retomado na próxima chamada com o
+    mesmo run_id; um run já concluído recomeça do zero.
     """
+    from app.tools.jobqueue import JobQueue, run_jobs, job_id, DONE
     sys_prompt = _load_prompt()
-    docs_txt, urls = _gather_context()
-    pages = _fetch_web(urls) if task.get("scrape", True) else []
-    # Compose user content
-    user = "DOCS:\n" + docs_txt[:140000]
-    if pages:
-        user += "\n\nWEB_SNAPSHOTS:\n" + json.dumps([{"url":p["url"],"text":p["text"][:8000]} for p in pages], ensure_ascii=False)
-    # Ask AI for arch + tasks (usando sistema híbrido)
-    print("🚀 Usando sistema híbrido Cursor AI + Ollama NITRO...")
-    out = hybrid_ai_chat_with_offline(sys_prompt, user)
-    data = extract_json_tail(out)
-    # Persist
-    plan_path = _write_plan(data["architecture"])
-    saved_pages = _save_research(pages)
-    tasks_written = _write_tasks(data.get("tasks",[]))
-    # Trigger other agents
-    results = _dispatch_followups(data.get("tasks",[]))
+    q = JobQueue()
+    run_id = task.get("run_id") or "architect"
+    st = q.summary(run_id)
+    if task.get("fresh") or st["pending"] + st["running"] + st["failed"] == 0:
+        q.reset(run_id)
+    else:
+        print(f"↩️  Retomando run '{run_id}' ({st['done']} jobs concluídos)")
+        q.retry_failed(run_id)
+    q.submit(run_id, "gather", input={"scrape": bool(task.get("scrape", True)), "prompt": _sha(sys_prompt)}, rerun=True)
+    summary = run_jobs(q, run_id, HANDLERS, workers=int(task.get("workers", 1)))
+    plan = q.get(job_id(run_id, "plan"))
+    if not plan or plan["status"] != DONE:
+        raise RuntimeError(f"architect: etapa de plano falhou: {(plan or {}).get('error') or 'não executada'}")
+    research = q.output(job_id(run_id, "research")) or {}
+    results = {"dev": [j["output"] if j["status"] == DONE else {"id": j["key"], "result": {"ok": False, "error": j["error"]}}
+                       for j in q.jobs(run_id, "dev")],
+               "qa": q.output(job_id(run_id, "qa")), "packager": q.output(job_id(run_id, "package"))}
+    q.close()
     return {
-        "ok": True,
-        "plan": plan_path,
-        "research": saved_pages,
-        "tasks": tasks_written,
+        "ok": summary["failed"] == 0 and summary["pending"] == 0,
+        "run_id": run_id,
+        "jobs": summary,
+        "plan": plan["output"]["plan"],
+        "research": research.get("saved", []),
+        "tasks": plan["output"]["tasks"],
         "results": results
     }
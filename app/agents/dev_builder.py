@@ -1,6 +1,7 @@
 from pathlib import Path
 import json
-from app.agents._util import hybrid_ai_chat_with_offline, extract_json_tail, write_if_changed
+from app.agents._prompt import Section, build_prompt
+from app.agents._util import structured_chat, schema_prompt, write_batch
 
 def _sys() -> str:
     p = Path.home()/ "aurix-context"/ "agents"/ "dev_builder.md"
@@ -9,27 +10,31 @@ def _sys() -> str:
 def run(task: dict) -> dict:
     """
     task = {"ticket_path":"~/aurix/data/backlog/AURIX-0001.json"} ou {"spec":"texto","base_dir":"~/aurix"}
+    "race": true  -> Cursor e Ollama em paralelo, vale a primeira resposta válida (padrão: AURIX_LLM_RACE)
     """
     base = Path(task.get("base_dir","~/aurix")).expanduser()
     if task.get("ticket_path"):
-        t = Path(task["ticket_path"]).expanduser().read_text(encoding="utf-8")
-        user = "TICKET:\n" + t
+        section = Section("TICKET", Path(task["ticket_path"]).expanduser().read_text(encoding="utf-8"))
     else:
-        user = "SPEC:\n" + task.get("spec","")
+        section = Section("SPEC", task.get("spec",""))
+    from app.models import DevBuilderOut
+    # saída grande (conteúdo de arquivos): pelo menos 1024 tokens reservados
+    prompt = build_prompt(schema_prompt(_sys(), DevBuilderOut), [section], output=(1024, 4096))
     
-    # Usando sistema híbrido Cursor AI + Ollama NITRO
+    # Usando sistema híbrido Cursor AI + Ollama NITRO (saída validada: files[<=10] + notes)
     print("🚀 Dev Builder usando sistema híbrido...")
-    out = hybrid_ai_chat_with_offline(_sys(), user)
-    data = extract_json_tail(out)
-    files = data.get("files") or []
-    written=[]
-    for f in files[:10]:  # hard limit
-        dest = (base/ f["path"]).resolve()
+    data = structured_chat(prompt.system, prompt.user, DevBuilderOut, max_tokens=prompt.max_tokens, race=task.get("race"))
+    batch={}
+    for f in data.files:
+        dest = (base/ f.path).resolve()
         # impedir escrita fora do repo
         assert str(dest).startswith(str(base.resolve()))
-        changed = write_if_changed(dest, f.get("content",""))
-        if changed: written.append(str(dest))
-    notes = data.get("notes","")
-    (base/ "data"/ "logs"/ "dev_builder.notes.txt").parent.mkdir(parents=True, exist_ok=True)
-    (base/ "data"/ "logs"/ "dev_builder.notes.txt").write_text(notes, encoding="utf-8")
+        batch[dest] = f.content
+    notes = data.notes
+    # arquivos + notas em uma única transação (commit/rollback em conjunto); notas por ticket,
+    # para tickets em paralelo não sobrescreverem as notas uns dos outros
+    tid = Path(task["ticket_path"]).stem if task.get("ticket_path") else None
+    notes_path = (base/ "data"/ "logs"/ (f"dev_builder.{tid}.notes.txt" if tid else "dev_builder.notes.txt")).resolve()
+    changed = write_batch({**batch, notes_path: notes})
+    written = [str(p) for p in changed if p != notes_path]
     return {"ok": True, "written": written, "notes_len": len(notes)}
@@ -4,31 +4,45 @@ Agente: llm_architect
 Função: Projetar automações LLM seguras, observáveis e idempotentes a partir de um spec.
 Lê padrões em: context/llm_automation_standards.xml e context/llm_references.xml
 Saídas: plano, tickets e artefatos em docs_aurix/backlog/LLM-*
+
+Endereçado por conteúdo: o diretório `<slug>-<spec_hash>` guarda em PLAN.json os hashes das entradas
+(spec, standards, references). Se batem, `run` devolve o plano existente sem escrever nada; se mudaram,
+só os artefatos com conteúdo diferente são regravados (id/created_at do plano são preservados).
 """
 from __future__ import annotations
-import os, json, time, hashlib, uuid, re
+import os, json, time, hashlib, uuid, re, threading
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 import xml.etree.ElementTree as ET
+from app.agents._util import write_if_changed
 
 ROOT = Path(os.getenv("AURIX_WORKSPACE", "."))  # respeita workspace
 CTX  = ROOT / "context"
-DOCS = ROOT / "docs_aurix" / "backlog"
-DOCS.mkdir(parents=True, exist_ok=True)
+DOCS = ROOT / "docs_aurix" / "backlog"  # criado na primeira escrita, não no import
 
 STDS = CTX / "llm_automation_standards.xml"
 REFS = CTX / "llm_references.xml"
 
-def _load_xml(p: Path) -> ET.Element:
-    if not p.exists():
+_xml_cache: Dict[str, Tuple[Tuple[int, int], str, ET.Element]] = {}
+
+def _read_xml(p: Path) -> Tuple[str, ET.Element]:
+    """(sha256[:10], raiz) do arquivo; reparseia só quando size/mtime mudam."""
+    try:
+        st = p.stat()
+    except FileNotFoundError:
         raise FileNotFoundError(f"Missing XML: {p}")
-    return ET.fromstring(p.read_text(encoding="utf-8"))
+    key, stamp = str(p.resolve()), (st.st_size, st.st_mtime_ns)
+    hit = _xml_cache.get(key)
+    if hit and hit[0] == stamp:
+        return hit[1], hit[2]
+    raw = p.read_bytes()
+    digest = hashlib.sha256(raw).hexdigest()[:10]
+    root = ET.fromstring(raw.decode("utf-8"))
+    _xml_cache[key] = (stamp, digest, root)
+    return digest, root
 
-def _atomic_write(path: Path, data: str) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    tmp = path.with_suffix(path.suffix + ".tmp")
-    tmp.write_text(data, encoding="utf-8")
-    os.replace(tmp, path)
+def _load_xml(p: Path) -> ET.Element:
+    return _read_xml(p)[1]
 
 def _slug(s: str) -> str:
     s = s.lower()
@@ -41,6 +55,36 @@ def _hash(data: Any) -> str:
 def _now() -> str:
     return time.strftime("%Y-%m-%d %H:%M:%S")
 
+def _inputs(spec: Dict[str, Any]) -> Dict[str, str]:
+    """Hashes de tudo que determina o plano."""
+    return {"spec": _hash(spec), "standards": _read_xml(STDS)[0], "references": _read_xml(REFS)[0]}
+
+def _artifact_dir(goal: str, spec_hash: str) -> Path:
+    return DOCS / f"{_slug(goal)}-{spec_hash}"
+
+def _artifact_files(base: Path, plan: Dict[str, Any]) -> List[Path]:
+    files = [base / "PLAN.json", base / "TICKETS.md", base / "REFERENCES.txt"]
+    if Path(plan.get("project_docs_path", ".")) != Path("."):
+        files.append(Path(plan["project_docs_path"]) / "README.md")
+    return files
+
+def _read_plan(base: Path) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads((base / "PLAN.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+def cached_plan(spec: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Plano já gerado para exatamente estas entradas (e com todos os artefatos no disco), ou None."""
+    inputs = _inputs(spec)
+    base = _artifact_dir(spec.get("goal", "no-goal"), inputs["spec"])
+    plan = _read_plan(base)
+    if not plan or plan.get("meta", {}).get("inputs") != inputs:
+        return None
+    if not all(p.exists() for p in _artifact_files(base, plan)):
+        return None
+    return plan
+
 def plan_from_spec(spec: Dict[str, Any]) -> Dict[str, Any]:
     """
     spec exemplo:
@@ -55,6 +99,7 @@ def plan_from_spec(spec: Dict[str, Any]) -> Dict[str, Any]:
       "project_path": "./meu-projeto"  # NOVO: caminho do projeto
     }
     """
+    inputs = _inputs(spec)
     std = _load_xml(STDS)
     refs = _load_xml(REFS)
 
@@ -99,7 +144,7 @@ def plan_from_spec(spec: Dict[str, Any]) -> Dict[str, Any]:
        owner="llmArchitect")
 
     plan = {
-        "meta": {"created_at": _now(), "id": str(uuid.uuid4()), "spec_hash": _hash(spec)},
+        "meta": {"created_at": _now(), "id": str(uuid.uuid4()), "spec_hash": inputs["spec"], "inputs": inputs},
         "goal": goal,
         "framework": framework,
         "agents": agents,
@@ -113,22 +158,32 @@ def plan_from_spec(spec: Dict[str, Any]) -> Dict[str, Any]:
     return plan
 
 def write_artifacts(plan: Dict[str, Any]) -> Dict[str, Any]:
-    slug = _slug(plan.get("goal", "llm-automation"))
-    base = DOCS / f"{slug}-{plan['meta']['spec_hash']}"
+    """Grava só os artefatos cujo conteúdo mudou; `written` lista os regravados."""
+    base = _artifact_dir(plan.get("goal", "llm-automation"), plan["meta"]["spec_hash"])
     base.mkdir(parents=True, exist_ok=True)
+    written: List[str] = []
+    def _put(path: Path, data: str):
+        if write_if_changed(path, data):
+            written.append(str(path))
+
+    # mesmo diretório (mesmo spec): mantém a identidade do plano para não reescrever à toa
+    prev = _read_plan(base)
+    if prev and prev.get("meta", {}).get("id"):
+        plan["meta"]["id"] = prev["meta"]["id"]
+        plan["meta"]["created_at"] = prev["meta"].get("created_at", plan["meta"]["created_at"])
 
     # Plano
-    _atomic_write(base / "PLAN.json", json.dumps(plan, indent=2, ensure_ascii=False))
+    _put(base / "PLAN.json", json.dumps(plan, indent=2, ensure_ascii=False))
 
     # Tickets
     tickets_md = ["# Backlog — LLM Automation", ""]
     for t in plan["tickets"]:
         tickets_md += [f"## {t['id']} — {t['title']}", "", t["desc"], f"- owner: {t['owner']}", ""]
-    _atomic_write(base / "TICKETS.md", "\n".join(tickets_md))
+    _put(base / "TICKETS.md", "\n".join(tickets_md))
 
     # Fonte de verdade (copiando refs para o pacote)
     refs_copy = (base / "REFERENCES.txt")
-    _atomic_write(refs_copy, "\n".join(plan["sources"]))
+    _put(refs_copy, "\n".join(plan["sources"]))
 
     # NOVO: Criar estrutura de documentação do projeto
     project_docs_path = Path(plan.get("project_docs_path", "."))
@@ -161,33 +216,165 @@ def write_artifacts(plan: Dict[str, Any]) -> Dict[str, Any]:
 ---
 *Documentação gerada automaticamente pelo LLM Architect do framework Aurix*
 """
-        _atomic_write(project_docs_path / "README.md", project_readme)
+        _put(project_docs_path / "README.md", project_readme)
 
-    return {"artifact_dir": str(base), "project_docs_path": str(project_docs_path)}
+    return {"artifact_dir": str(base), "project_docs_path": str(project_docs_path), "written": written}
 
-def run(task: Dict[str, Any]) -> Dict[str, Any]:
+def run(task: Dict[str, Any], force: bool = False) -> Dict[str, Any]:
     """
     Entrada: task/spec para automação LLM (ver plan_from_spec docstring).
     Saída: plano, caminhos de artefatos e checklist para Manager/QA.
+    Entradas iguais às de um plano existente -> devolve o cache sem escrever (`cached: true`);
+    `force=True` regenera mesmo assim.
     """
-    plan = plan_from_spec(task or {})
+    spec = task or {}
+    plan = None if force else cached_plan(spec)
+    if plan is not None:
+        return {
+            "status": "ok",
+            "message": "LLM plan up to date (cached)",
+            "cached": True,
+            "goal": plan.get("goal"),
+            "plan_meta": plan["meta"],
+            "artifact_dir": str(_artifact_dir(spec.get("goal", "no-goal"), plan["meta"]["spec_hash"])),
+            "project_docs_path": plan.get("project_docs_path", "."),
+            "written": [],
+            "ticket_count": len(plan.get("tickets", [])),
+            "checklist": plan["checklist"]
+        }
+    plan = plan_from_spec(spec)
     artifacts = write_artifacts(plan)
     return {
         "status": "ok",
         "message": "LLM plan generated with artifacts",
+        "cached": False,
+        "goal": plan["goal"],
         "plan_meta": plan["meta"],
         "artifact_dir": artifacts["artifact_dir"],
         "project_docs_path": artifacts["project_docs_path"],
+        "written": artifacts["written"],
+        "ticket_count": len(plan["tickets"]),
         "checklist": plan["checklist"]
     }
 
-if __name__ == "__main__":
-    import sys, json as _json
-    spec = {}
-    if not sys.stdin.isatty():
+def _run_safe(spec: Any, force: bool) -> Dict[str, Any]:
+    if not isinstance(spec, dict):
+        return {"status": "error", "error": spec if isinstance(spec, str) else f"spec inválido: {type(spec).__name__}"}
+    try:
+        return run(spec, force=force)
+    except Exception as e:
+        return {"status": "error", "error": f"{type(e).__name__}: {e}", "goal": spec.get("goal")}
+
+def iter_run_many(specs: Iterable[Any], max_workers: int = 8, force: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    Gera um resultado por spec, na ordem de entrada, consumindo `specs` sob demanda
+    (no máximo 2*max_workers em voo). Specs idênticos no mesmo lote rodam uma vez só.
+    """
+    window = max(1, 2 * max_workers)
+    pending: List[Any] = []
+    inflight: Dict[str, Any] = {}
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-architect") as ex:
+        for spec in specs:
+            key = _hash(spec) if isinstance(spec, dict) else None
+            fut = inflight.get(key) if key else None
+            if fut is None:
+                fut = ex.submit(_run_safe, spec, force)
+                if key:
+                    inflight[key] = fut
+            pending.append(fut)
+            while len(pending) >= window or (pending and pending[0].done()):
+                yield pending.pop(0).result()
+            if len(inflight) > 4 * window:
+                inflight = {k: f for k, f in inflight.items() if not f.done()}
+        for fut in pending:
+            yield fut.result()
+
+_index_lock = threading.Lock()
+
+def update_index(results: Iterable[Dict[str, Any]]) -> Path:
+    """
+    Atualiza docs_aurix/backlog/INDEX.json: um item por diretório de plano
+    (dir, goal, spec_hash, inputs, tickets, created_at). Diretórios removidos saem do índice.
+    """
+    path = DOCS / "INDEX.json"
+    with _index_lock:
         try:
-            spec = _json.loads(sys.stdin.read() or "{}")
-        except Exception:
+            entries = {e["dir"]: e for e in json.loads(path.read_text(encoding="utf-8")).get("plans", [])}
+        except (OSError, ValueError, KeyError, TypeError):
+            entries = {}
+        for r in results:
+            if r.get("status") != "ok":
+                continue
+            meta = r["plan_meta"]
+            name = Path(r["artifact_dir"]).name
+            entries[name] = {"dir": name, "goal": r.get("goal"), "spec_hash": meta["spec_hash"],
+                             "inputs": meta.get("inputs"), "tickets": r.get("ticket_count"), "created_at": meta.get("created_at")}
+        plans = [entries[k] for k in sorted(entries) if (DOCS / k / "PLAN.json").exists()]
+        write_if_changed(path, json.dumps({"count": len(plans), "plans": plans}, indent=2, ensure_ascii=False))
+    return path
+
+def run_many(specs: Iterable[Dict[str, Any]], max_workers: int = 8, force: bool = False) -> Dict[str, Any]:
+    """
+    Planeja vários specs de uma vez: XMLs lidos uma vez (cache por mtime), planos em paralelo com
+    escrita limitada a `max_workers`, e INDEX.json com todos os diretórios de plano.
+    """
+    results = list(iter_run_many(specs, max_workers=max_workers, force=force))
+    index = update_index(results)
+    return {
+        "status": "ok" if all(r.get("status") == "ok" for r in results) else "partial",
+        "count": len(results),
+        "generated": len({r["artifact_dir"] for r in results if r.get("status") == "ok" and not r.get("cached")}),
+        "cached": sum(1 for r in results if r.get("cached")),
+        "errors": sum(1 for r in results if r.get("status") != "ok"),
+        "index": str(index),
+        "results": results,
+    }
+
+def _main(argv: Optional[List[str]] = None) -> int:
+    """
+    stdin: um spec JSON (pode ser multilinha) ou JSONL (um spec por linha).
+    stdout: uma linha JSON de resultado por spec, emitida à medida que fica pronta.
+    """
+    import sys, argparse
+    ap = argparse.ArgumentParser(description="llm_architect: spec(s) JSON/JSONL no stdin")
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--force", action="store_true", help="ignora o cache por hash")
+    a = ap.parse_args(argv)
+    if sys.stdin.isatty():
+        print(json.dumps(run({}, force=a.force), ensure_ascii=False))
+        return 0
+    first = ""
+    for first in sys.stdin:
+        if first.strip():
+            break
+    try:
+        head = json.loads(first or "{}")
+    except ValueError:
+        head = None
+    if head is None:  # JSON multilinha: um spec só
+        try:
+            spec = json.loads(first + sys.stdin.read())
+        except ValueError:
             spec = {}
-    out = run(spec)
-    print(json.dumps(out, ensure_ascii=False))
+        print(json.dumps(run(spec, force=a.force), ensure_ascii=False))
+        return 0
+
+    def _specs():
+        yield head
+        for line in sys.stdin:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    yield f"JSON inválido: {e}"
+    results = []
+    for r in iter_run_many(_specs(), max_workers=a.workers, force=a.force):
+        print(json.dumps(r, ensure_ascii=False), flush=True)
+        results.append({k: r[k] for k in ("status", "goal", "artifact_dir", "plan_meta", "ticket_count") if k in r})
+    if len(results) > 1:
+        update_index(results)
+    return 0 if all(r.get("status") == "ok" for r in results) else 1
+
+if __name__ == "__main__":
+    raise SystemExit(_main())
@@ -1,7 +1,7 @@
 from pathlib import Path
 import json
 
-from app.agents._util import ensure_dir, write_if_changed
+from app.agents._util import ensure_dir, write_if_changed, digest_index
 from app.agents import dispatch_agent
 
 def _sanitize_name(name: str) -> str:
@@ -26,7 +26,8 @@ def _merge_urls(urls_path: Path, new_urls: list[str]) -> list[str]:
         u = u.strip()
         if u and u not in seen:
             merged.append(u); seen.add(u)
-    write_if_changed(urls_path, "\n".join(merged) + ("\n" if merged else ""))
+    with digest_index() as idx:
+        write_if_changed(urls_path, "\n".join(merged) + ("\n" if merged else ""), index=idx)
     return merged
 
 def run(task: dict) -> dict:
@@ -36,7 +37,8 @@ def run(task: dict) -> dict:
       "add_urls": [ "https://doc.qt.io/...", "..."],          # opcional
       "start": true,                                          # default true
       "scrape": true,                                         # default true (para Architect)
-      "project_name": "nome_do_projeto"                       # opcional - para criar projeto separado
+      "project_name": "nome_do_projeto",                      # opcional - para criar projeto separado
+      "run_id": "architect", "fresh": false, "workers": 1      # opcional - pipeline durável do Architect
     }
     """
     base = Path.home() / "aurix"
@@ -46,18 +48,20 @@ def run(task: dict) -> dict:
 
     # 1) Registrar documentos
     registered = []
+    idx = digest_index()
     add_docs = task.get("add_docs") or []
     for item in add_docs[:50]:
         name = _sanitize_name(item.get("name", "doc"))
         content = item.get("content", "")
         dest = (docs_dir / name).resolve()
         assert str(dest).startswith(str(base.resolve()))  # segurança de path
-        changed = write_if_changed(dest, content)
+        changed = write_if_changed(dest, content, index=idx)
         if changed:
             registered.append(str(dest.relative_to(base)))
         else:
             # já existia igual; considera registrado sem duplicar
             registered.append(str(dest.relative_to(base)))
+    idx.flush()
 
     # 2) Mesclar URLs de pesquisa
     merged_urls = _merge_urls(urls_path, task.get("add_urls") or [])
@@ -91,7 +95,9 @@ def run(task: dict) -> dict:
     do_start = task.get("start", True)
     architect_result = None
     if do_start:
-        architect_result = dispatch_agent("architect", {"scrape": bool(task.get("scrape", True))})
+        arch_task = {"scrape": bool(task.get("scrape", True))}
+        arch_task.update({k: task[k] for k in ("run_id", "fresh", "workers") if k in task})
+        architect_result = dispatch_agent("architect", arch_task)
 
     return {
         "ok": True,
@@ -1,5 +1,6 @@
 import shutil, subprocess, sys
 from pathlib import Path
+from app.tools.tracing import span
 
 def run(task: dict) -> dict:
     """
@@ -13,7 +14,9 @@ def run(task: dict) -> dict:
         return {"ok": False, "error":"pyinstaller não instalado", "hint":"pip install pyinstaller"}
     cmd = ["pyinstaller", entry, "--name", name, "--clean"]
     if onefile: cmd.append("--onefile")
-    r = subprocess.run(cmd, cwd=str(root), text=True, capture_output=True)
+    with span("subprocess.pyinstaller", entry=entry, onefile=onefile) as sp:
+        r = subprocess.run(cmd, cwd=str(root), text=True, capture_output=True)
+        sp.set(returncode=r.returncode)
     if r.returncode != 0:
         return {"ok": False, "error":"falha no build", "log": (r.stdout+r.stderr)[-3000:]}
     dist = root/ "dist"
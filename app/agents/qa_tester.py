@@ -1,5 +1,6 @@
 import os, subprocess, sys
 from pathlib import Path
+from app.tools.tracing import span
 
 def run(task: dict) -> dict:
     """
@@ -7,16 +8,21 @@ def run(task: dict) -> dict:
     """
     paths = [Path(p).expanduser() for p in task.get("paths", ["~/aurix/app"])]
     issues=[]
-    for root in paths:
-        for d,_,fs in os.walk(root):
-            for f in fs:
-                if f.endswith(".py"):
-                    p=str(Path(d)/f)
-                    r = subprocess.run([sys.executable, "-m", "py_compile", p], capture_output=True, text=True)
-                    if r.returncode != 0:
-                        issues.append({"file":p, "msg":r.stderr.strip()[:500]})
+    with span("subprocess.py_compile") as sp:
+        n=0
+        for root in paths:
+            for d,_,fs in os.walk(root):
+                for f in fs:
+                    if f.endswith(".py"):
+                        p=str(Path(d)/f); n+=1
+                        r = subprocess.run([sys.executable, "-m", "py_compile", p], capture_output=True, text=True)
+                        if r.returncode != 0:
+                            issues.append({"file":p, "msg":r.stderr.strip()[:500]})
+        sp.set(files=n, issues=len(issues))
     if task.get("run_pytest", False):
-        r = subprocess.run([sys.executable, "-m", "pytest", "-q"], cwd=str(Path.home()/ "aurix"), capture_output=True, text=True)
+        with span("subprocess.pytest") as sp:
+            r = subprocess.run([sys.executable, "-m", "pytest", "-q"], cwd=str(Path.home()/ "aurix"), capture_output=True, text=True)
+            sp.set(returncode=r.returncode)
         if r.returncode != 0:
             issues.append({"file":"(pytest)", "msg": (r.stdout+r.stderr)[-2000:]})
     return {"ok": len(issues)==0, "summary": f"{len(issues)} issue(s)", "issues": issues}
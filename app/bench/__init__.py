@@ -0,0 +1,6 @@
+"""
+Benchmarks reprodutíveis do Aurix (servidores falsos locais, resultados em JSON).
+
+  python -m app.bench.run --quick
+  python -m app.bench.run --out novo.json --compare antigo.json
+"""
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Servidor MCP falso (stdio, JSON-RPC por linha) para benchmarks e testes.
+
+Tools:
+  echo  -> devolve os argumentos
+  blob  -> devolve {"data": "x" * size} (ou `size` bytes crus com binary=true)
+  sleep -> dorme `ms` milissegundos
+  crash -> encerra o processo sem responder (testes de supervisão)
+  noise -> escreve `lines` linhas no stderr antes de responder
+  flaky -> as primeiras `fail` chamadas (contadas no arquivo `path`) dormem `ms` ou, com ms=0, derrubam o processo
+
+Aceita batch JSON-RPC (array; membros em paralelo) e anuncia `aurix/batch` no initialize.
+
+Opções: --latency-ms N (latência fixa por tools/call), --name NOME, --no-batch
+"""
+import argparse, json, os, sys, time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mcp"))
+import blob_channel  # app/mcp/blob_channel.py (só stdlib)
+
+TOOLS = [
+    {"name": "echo", "description": "Ecoa os argumentos",
+     "inputSchema": {"type": "object", "properties": {}, "additionalProperties": True}},
+    {"name": "blob", "description": "Payload de tamanho configurável",
+     "inputSchema": {"type": "object", "properties": {"size": {"type": "integer"}, "binary": {"type": "boolean"}, "ms": {"type": "integer"}},
+                     "required": ["size"]}},
+    {"name": "sleep", "description": "Dorme ms milissegundos",
+     "inputSchema": {"type": "object", "properties": {"ms": {"type": "integer"}}, "required": ["ms"]}},
+    {"name": "crash", "description": "Encerra o processo",
+     "inputSchema": {"type": "object", "properties": {}}},
+    {"name": "flaky", "description": "Falha nas primeiras chamadas",
+     "inputSchema": {"type": "object", "required": ["path"],
+                     "properties": {"path": {"type": "string"}, "fail": {"type": "integer"}, "ms": {"type": "integer"}}}},
+    {"name": "noise", "description": "Escreve linhas no stderr",
+     "inputSchema": {"type": "object", "properties": {"lines": {"type": "integer"}}, "required": ["lines"]}},
+]
+
+def handle(req: dict, latency_s: float, name: str, channel: dict = None, batch: bool = True) -> dict:
+    method = req.get("method")
+    rid = req.get("id")
+    if method == "initialize":
+        caps = blob_channel.advertise({"tools": {}}, channel)
+        if batch:
+            caps.setdefault("experimental", {})["aurix/batch"] = {"version": 1}
+        return {"jsonrpc": "2.0", "id": rid, "result": {
+            "protocolVersion": "2024-11-05", "capabilities": caps,
+            "serverInfo": {"name": name, "version": "1.0.0"}}}
+    if method == "ping":
+        return {"jsonrpc": "2.0", "id": rid, "result": {}}
+    if method == "tools/list":
+        return {"jsonrpc": "2.0", "id": rid, "result": {"tools": TOOLS}}
+    if method in ("tools/call", "call_tool"):
+        params = req.get("params") or {}
+        tool, args = params.get("name"), params.get("arguments") or {}
+        if latency_s: time.sleep(latency_s)
+        if tool == "echo":
+            result = {"echo": args}
+        elif tool == "blob":
+            size = int(args.get("size", 0))
+            time.sleep(int(args.get("ms", 0)) / 1000)
+            result = b"x" * size if args.get("binary") else {"data": "x" * size}
+        elif tool == "crash":
+            os._exit(1)
+        elif tool == "flaky":
+            with open(args["path"], "a+") as f:  # contador compartilhado entre processos/réplicas
+                f.write("x"); f.seek(0); n = len(f.read())
+            if n <= int(args.get("fail", 1)):
+                if not args.get("ms"):
+                    os._exit(1)
+                time.sleep(int(args["ms"]) / 1000)
+            result = {"attempt": n}
+        elif tool == "noise":
+            n = int(args.get("lines", 0))
+            sys.stderr.write("".join(f"ruido {i}\n" for i in range(n))); sys.stderr.flush()
+            result = {"lines": n}
+        elif tool == "sleep":
+            time.sleep(int(args.get("ms", 0)) / 1000); result = {"slept_ms": args.get("ms", 0)}
+        else:
+            return {"jsonrpc": "2.0", "id": rid, "error": {"code": -32601, "message": f"tool '{tool}' não encontrada"}}
+        return {"jsonrpc": "2.0", "id": rid, "result": result}
+    return {"jsonrpc": "2.0", "id": rid, "error": {"code": -32601, "message": f"método '{method}' não suportado"}}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--name", default="aurix-fake-mcp")
+    ap.add_argument("--no-batch", action="store_true", help="não anuncia nem aceita batch")
+    a = ap.parse_args()
+    latency_s = a.latency_ms / 1000
+    sys.stdout.reconfigure(encoding="utf-8")
+    out = sys.stdout
+    channel = None
+    pool = ThreadPoolExecutor(max_workers=16)
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            req = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(req, list) and not a.no_batch:
+            resps = pool.map(lambda r: handle(r, latency_s, a.name, channel), req)
+            out.write("[" + ",".join(blob_channel.frame(r, channel) for r in resps) + "]\n")
+            out.flush()
+            continue
+        if not isinstance(req, dict):
+            continue
+        if req.get("method") == "initialize":
+            channel = blob_channel.accept(req.get("params"))
+        out.write(blob_channel.frame(handle(req, latency_s, a.name, channel, not a.no_batch), channel) + "\n")
+        out.flush()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Servidor OpenAI-compatível falso (estilo Ollama /v1) para benchmarks e testes.
+
+  srv = start(latency_ms=50)         # porta livre em 127.0.0.1
+  os.environ["OLLAMA_BASE"] = srv.base_url
+  ...
+  srv.shutdown()
+"""
+import json, time, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Resposta que satisfaz architect (architecture+tasks) e dev_builder (files+notes)
+DEFAULT_CONTENT = {
+    "architecture": {"overview": "bench", "modules": ["core"]},
+    "tasks": [{"id": "BENCH-0001", "title": "Gerar módulo", "owner": "dev_builder",
+               "desc": "módulo de benchmark", "acceptance": ["compila"]}],
+    "files": [{"path": "bench_out/generated.py", "content": "VALUE = 1\n"}],
+    "notes": "gerado pelo fake_ollama",
+}
+
+def start(port: int = 0, latency_ms: float = 0.0, content: dict | str | None = None, host: str = "127.0.0.1"):
+    body_text = content if isinstance(content, str) else json.dumps(content or DEFAULT_CONTENT)
+    stats = {"requests": 0}
+
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            n = int(self.headers.get("Content-Length") or 0)
+            req = json.loads(self.rfile.read(n) or b"{}")
+            stats["requests"] += 1
+            stats["last_request"] = req
+            if latency_ms: time.sleep(latency_ms / 1000)
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self.send_error(404); return
+            resp = {
+                "id": f"chatcmpl-{stats['requests']}", "object": "chat.completion", "created": int(time.time()),
+                "model": req.get("model", "fake"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": body_text}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            }
+            data = json.dumps(resp).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *a):
+            pass
+
+    srv = ThreadingHTTPServer((host, port), _Handler)
+    srv.daemon_threads = True
+    srv.base_url = f"http://{host}:{srv.server_address[1]}/v1"
+    srv.stats = stats
+    threading.Thread(target=srv.serve_forever, name="fake-ollama", daemon=True).start()
+    return srv
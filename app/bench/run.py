@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Suite de benchmarks do Aurix.
+
+  python -m app.bench.run                      # tudo, grava em ~/aurix/data/bench/
+  python -m app.bench.run --quick --only mcp,docs
+  python -m app.bench.run --out novo.json --compare antigo.json
+
+Benchmarks:
+  mcp       round-trip no servidor MCP falso (calls/s, p50/p99)
+  llm       overhead do roteamento híbrido vs. chamada direta ao Ollama falso
+  docs      list_docs em árvores sintéticas de tamanhos crescentes
+  pipeline  manager.run -> architect -> dev_builder -> qa com LLM falso (HOME temporário)
+  codec     encode/decode JSON (app/tools/codec.py vs. stdlib) em payloads realistas, MB/s
+  memory    aurix_memory: bytes gravados/tempo por save no log (app/memory) vs. snapshot + backup completo
+
+Tudo roda contra stand-ins locais (app/bench/fake_mcp_server.py, app/bench/fake_ollama.py);
+nenhum acesso externo além do que o próprio código roteia (ex.: checagem de internet).
+"""
+import argparse, json, os, platform, statistics, subprocess, sys, tempfile, time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+HERE = Path(__file__).resolve().parent
+REPO = HERE.parent.parent
+
+def _percentile(xs: List[float], q: float) -> float:
+    if not xs:
+        return 0.0
+    xs = sorted(xs)
+    k = (len(xs) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (k - lo)
+
+def summarize(samples_s: List[float]) -> Dict[str, float]:
+    ms = [s * 1000 for s in samples_s]
+    total = sum(samples_s)
+    return {
+        "n": len(ms),
+        "ops_per_s": round(len(ms) / total, 2) if total else 0.0,
+        "mean_ms": round(statistics.fmean(ms), 4) if ms else 0.0,
+        "p50_ms": round(_percentile(ms, 0.50), 4),
+        "p90_ms": round(_percentile(ms, 0.90), 4),
+        "p99_ms": round(_percentile(ms, 0.99), 4),
+        "max_ms": round(max(ms), 4) if ms else 0.0,
+    }
+
+def timeit(fn: Callable[[], Any], n: int, warmup: int = 3) -> List[float]:
+    for _ in range(warmup):
+        fn()
+    out = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t0)
+    return out
+
+@contextmanager
+def _env(**kv):
+    old = {k: os.environ.get(k) for k in kv}
+    os.environ.update({k: str(v) for k, v in kv.items()})
+    try:
+        yield
+    finally:
+        for k, v in old.items():
+            if v is None: os.environ.pop(k, None)
+            else: os.environ[k] = v
+
+def fake_servers_yaml(dirpath: Path, latency_ms: float = 0.0, name: str = "bench", server_args=(), **extra) -> Path:
+    """servers.yaml apontando para o servidor MCP falso."""
+    import yaml
+    cfg = {"command": [sys.executable, str(HERE / "fake_mcp_server.py"), "--latency-ms", str(latency_ms), *server_args]}
+    cfg.update(extra)
+    p = dirpath / "servers.yaml"
+    p.write_text(yaml.safe_dump({"servers": {name: cfg}}), encoding="utf-8")
+    return p
+
+# ==== benchmarks ====
+
+def bench_mcp(quick: bool) -> Dict[str, Any]:
+    from app.tools.mcp_tool import MCPClient
+    n = 200 if quick else 2000
+    res: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as d:
+        client = MCPClient(fake_servers_yaml(Path(d)), tools_cache=Path(d) / "tools.json")
+        t0 = time.perf_counter()
+        client.ensure_started("bench")
+        res["cold_start_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+        try:
+            cpu0 = time.process_time()
+            samples = timeit(lambda: client.call("bench", "echo", {"i": 1}, timeout_s=10), n)
+            cpu = time.process_time() - cpu0
+            res["echo"] = summarize(samples)
+            res["echo"]["cpu_us_per_call"] = round(cpu / n * 1e6, 2)
+            big = 256 * 1024
+            samples = timeit(lambda: client.call("bench", "blob", {"size": big}, timeout_s=10), max(10, n // 20))
+            res["blob_256k"] = summarize(samples)
+            # 50 echos: uma linha por chamada vs. um único batch JSON-RPC
+            calls = [("echo", {"i": i}) for i in range(50)]
+            seq = timeit(lambda: [client.call("bench", t, p, timeout_s=10) for t, p in calls], 5 if quick else 20, warmup=1)
+            bat = timeit(lambda: client.call_batch("bench", calls, timeout_s=10), 5 if quick else 20, warmup=1)
+            res["echo_x50_sequential"] = summarize(seq)
+            res["echo_x50_batch"] = summarize(bat)
+        finally:
+            client.close()
+        # 4 MiB: canal lateral (mmap) vs. inline no stdout
+        for label, blob in (("blob_4m_mmap", True), ("blob_4m_inline", False)):
+            client = MCPClient(fake_servers_yaml(Path(d), blob=blob), tools_cache=Path(d) / "tools.json")
+            try:
+                samples = timeit(lambda: client.call("bench", "blob", {"size": 4 * 1024 * 1024}, timeout_s=30), 5 if quick else 20, warmup=1)
+                res[label] = summarize(samples)
+            finally:
+                client.close()
+    return res
+
+def bench_llm(quick: bool) -> Dict[str, Any]:
+    from app.bench import fake_ollama
+    from app.agents import _util
+    n = 10 if quick else 50
+    srv = fake_ollama.start(latency_ms=0)
+    try:
+        with _env(OLLAMA_BASE=srv.base_url):
+            direct = timeit(lambda: _util.ollama_nitro_chat("sys", "user"), n, warmup=1)
+            hybrid = timeit(lambda: _util.hybrid_ai_chat_with_offline("sys", "user"), n, warmup=1)
+    finally:
+        srv.shutdown()
+    d, h = summarize(direct), summarize(hybrid)
+    return {
+        "direct_ollama": d,
+        "hybrid": h,
+        "routing_overhead_p50_ms": round(h["p50_ms"] - d["p50_ms"], 4),
+        "backend_requests": srv.stats["requests"],
+    }
+
+def _make_tree(root: Path, n_files: int, size: int = 2048):
+    body = ("lorem ipsum https://example.com/doc " * (size // 36 + 1))[:size]
+    for i in range(n_files):
+        sub = root / f"d{i % 16:02d}" / f"s{i % 7}"
+        sub.mkdir(parents=True, exist_ok=True)
+        ext = (".md", ".txt", ".mdx", ".py")[i % 4]
+        (sub / f"f{i:05d}{ext}").write_text(body, encoding="utf-8")
+
+def bench_docs(quick: bool) -> Dict[str, Any]:
+    from app.agents._util import list_docs
+    sizes = (10, 100, 1000) if quick else (10, 100, 1000, 10000)
+    out: Dict[str, Any] = {}
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as d:
+            root = Path(d)
+            _make_tree(root, size)
+            reps = 5 if size >= 1000 else 20
+            samples = timeit(lambda: list_docs(root, limit=size), reps, warmup=1)
+            out[f"files_{size}"] = summarize(samples)
+            out[f"files_{size}"]["default_limit_ms"] = round(statistics.fmean(timeit(lambda: list_docs(root), reps, warmup=1)) * 1000, 4)
+    return out
+
+def bench_pipeline(quick: bool) -> Dict[str, Any]:
+    from app.bench import fake_ollama
+    n = 2 if quick else 5
+    srv = fake_ollama.start(latency_ms=0)
+    try:
+        with tempfile.TemporaryDirectory() as home:
+            ctx = Path(home) / "aurix-context" / "agents"
+            ctx.mkdir(parents=True)
+            for agent in ("architect", "dev_builder"):
+                (ctx / f"{agent}.md").write_text(f"Você é o {agent}. Responda em JSON.", encoding="utf-8")
+            with _env(HOME=home, OLLAMA_BASE=srv.base_url):
+                from app.agents import dispatch_agent
+                task = {"add_docs": [{"name": "vision.md", "content": "Visão do produto de benchmark."}],
+                        "start": True, "scrape": False}
+                last: Dict[str, Any] = {}
+                def _run():
+                    last["res"] = dispatch_agent("manager", task)
+                samples = timeit(_run, n, warmup=1)
+                res = last.get("res") or {}
+                arch = res.get("architect_result") or {}
+                ok = bool(res.get("ok") and arch.get("ok"))
+    finally:
+        srv.shutdown()
+    out = summarize(samples)
+    out["ok"] = ok
+    out["llm_requests"] = srv.stats["requests"]
+    return out
+
+def _codec_payloads() -> Dict[str, Any]:
+    from app.bench.fake_mcp_server import TOOLS
+    page = {"url": "https://example.com/doc", "text": ("Documentação do produto — seção ção/ü. " * 4000)[:150000]}
+    tickets = [{"id": f"AURIX-{i:04d}", "title": f"Ticket {i}", "desc": "Implementar módulo " * 20,
+                "acceptance": [f"critério {j}" for j in range(5)], "priority": i % 3, "estimate_h": 2.5}
+               for i in range(200)]
+    return {
+        "rpc_small": {"jsonrpc": "2.0", "id": "0f8fad5b-d9cb-469f-a165-70867728950e", "result": {"echo": {"i": 1}}},
+        "rpc_tools_list": {"jsonrpc": "2.0", "id": 1, "result": {"tools": TOOLS * 25}},
+        "research_page": page,
+        "tickets": tickets,
+    }
+
+def bench_codec(quick: bool) -> Dict[str, Any]:
+    import json
+    from app.tools import codec
+    reps = 50 if quick else 500
+    out: Dict[str, Any] = {"backend": codec.BACKEND}
+    for name, obj in _codec_payloads().items():
+        text = json.dumps(obj, ensure_ascii=False)
+        raw = text.encode("utf-8")
+        mb = len(raw) / 1e6
+        row: Dict[str, Any] = {"bytes": len(raw)}
+        for label, fn in (("stdlib_dumps", lambda: json.dumps(obj, ensure_ascii=False)),
+                          ("codec_dumps", lambda: codec.dumpb(obj)),
+                          ("stdlib_loads", lambda: json.loads(raw)),
+                          ("codec_loads", lambda: codec.loads(raw))):
+            s = summarize(timeit(fn, reps))
+            row[f"{label}_mb_s"] = round(mb / (s["mean_ms"] / 1000), 1) if s["mean_ms"] else 0.0
+        line = raw + b"\n"
+        row["decode_response_us"] = round(statistics.fmean(timeit(lambda: codec.decode_response(line), reps)) * 1e6, 2)
+        out[name] = row
+    return out
+
+def _delegation(i: int) -> Dict[str, Any]:
+    agents = ("architect", "dev_builder", "qa_tester", "dev_ui", "manager")
+    return {"success": True, "data": {"result": f"ok {i}"},
+            "metadata": {"agent": agents[(i + 1) % 5], "executionTime": 12 + i % 7, "timestamp": 1757112000000 + i},
+            "delegation": {"fromAgent": agents[i % 5], "toAgent": agents[(i + 1) % 5],
+                           "startTime": 1757112000000 + i, "endTime": 1757112000012 + i, "retryCount": i % 2}}
+
+def bench_memory(quick: bool) -> Dict[str, Any]:
+    """N saves do histórico de delegações: formato TS (snapshot + backup inteiro por save) vs. log com deltas."""
+    from app.memory import MemoryStore
+    from app.tools import codec
+    n = 200 if quick else 1000
+    out: Dict[str, Any] = {"saves": n}
+    with tempfile.TemporaryDirectory() as d:
+        root = Path(d)
+        hist: List[Dict[str, Any]] = []
+        written, samples = 0, []
+        for i in range(n):
+            hist.append(_delegation(i))
+            t0 = time.perf_counter()
+            data = codec.dumps({"delegations": hist})
+            entry = codec.dumps({"id": f"p_{i}", "projectId": "p", "data": data, "timestamp": i, "version": 1,
+                                 "metadata": {"size": len(data), "compressed": True, "originalSize": len(data)}}, pretty=True)
+            (root / f"legacy_{i % 2}.json").write_text(entry, encoding="utf-8")  # snapshot + backup
+            written += 2 * len(entry.encode("utf-8"))
+            samples.append(time.perf_counter() - t0)
+        out["legacy"] = {**summarize(samples), "bytes_written": written, "bytes_kept": written // 2}
+        hist, samples = [], []
+        with MemoryStore(root / "log", keyframe_every=64) as store:
+            for i in range(n):
+                hist.append(_delegation(i))
+                t0 = time.perf_counter()
+                store.put("p", {"delegations": hist}, 1757112000000 + i)
+                samples.append(time.perf_counter() - t0)
+            st = store.stats()
+            out["log"] = {**summarize(samples), "bytes_written": st["bytes"], "bytes_kept": st["bytes"]}
+            q = timeit(lambda: store.query(agent="qa_tester", limit=10), 50)
+            out["log"]["query_agent_ms"] = summarize(q)["mean_ms"]
+            g = timeit(lambda: store.get("p", at=1757112000000 + n // 2), 10)
+            out["log"]["get_at_ms"] = summarize(g)["mean_ms"]
+    out["write_amplification_x"] = round(out["legacy"]["bytes_written"] / max(out["log"]["bytes_written"], 1), 1)
+    return out
+
+BENCHES: Dict[str, Callable[[bool], Dict[str, Any]]] = {
+    "mcp": bench_mcp,
+    "llm": bench_llm,
+    "docs": bench_docs,
+    "pipeline": bench_pipeline,
+    "codec": bench_codec,
+    "memory": bench_memory,
+}
+
+# ==== meta / comparação ====
+
+def _git_commit() -> str:
+    try:
+        r = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=str(REPO), capture_output=True, text=True, timeout=5)
+        return r.stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+def _flatten(d: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for k, v in d.items():
+        key = f"{prefix}.{k}" if prefix else k
+        if isinstance(v, dict):
+            out.update(_flatten(v, key))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[key] = float(v)
+    return out
+
+def compare(old: Dict[str, Any], new: Dict[str, Any]) -> List[str]:
+    a, b = _flatten(old.get("results", {})), _flatten(new.get("results", {}))
+    lines = [f"{'métrica':<50} {'antes':>12} {'depois':>12} {'delta':>9}"]
+    for k in sorted(set(a) & set(b)):
+        delta = ((b[k] - a[k]) / a[k] * 100) if a[k] else 0.0
+        lines.append(f"{k:<50} {a[k]:>12.3f} {b[k]:>12.3f} {delta:>8.1f}%")
+    return lines
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmarks do Aurix")
+    ap.add_argument("--only", default=",".join(BENCHES), help=f"subset: {','.join(BENCHES)}")
+    ap.add_argument("--quick", action="store_true", help="menos iterações (CI/smoke)")
+    ap.add_argument("--out", default="", help="arquivo JSON de saída")
+    ap.add_argument("--compare", default="", help="JSON de uma execução anterior para comparar")
+    a = ap.parse_args(argv)
+
+    commit = _git_commit()
+    report: Dict[str, Any] = {
+        "meta": {
+            "commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "quick": a.quick,
+        },
+        "results": {},
+    }
+    for name in [x.strip() for x in a.only.split(",") if x.strip()]:
+        fn = BENCHES.get(name)
+        if fn is None:
+            print(f"⚠️ benchmark desconhecido: {name}", file=sys.stderr); continue
+        print(f"⏱️  {name}...", file=sys.stderr)
+        t0 = time.perf_counter()
+        try:
+            report["results"][name] = fn(a.quick)
+        except Exception as e:
+            report["results"][name] = {"error": f"{type(e).__name__}: {e}"}
+        report["results"][name]["wall_s"] = round(time.perf_counter() - t0, 3)
+
+    out = Path(a.out).expanduser() if a.out else Path.home() / "aurix" / "data" / "bench" / f"{time.strftime('%Y%m%d-%H%M%S')}-{commit}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(json.dumps(report["results"], indent=2, ensure_ascii=False))
+    print(f"📄 resultados: {out}", file=sys.stderr)
+
+    if a.compare:
+        old = json.loads(Path(a.compare).expanduser().read_text(encoding="utf-8"))
+        print("\n".join(compare(old, report)))
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+"""
+Daemon residente do Aurix: mantém cliente MCP (processos quentes), caches e clientes LLM
+entre execuções e atende `dispatch_agent` / `mcp_action` por socket Unix.
+
+  python -m app.daemon serve                 # primeiro plano (Ctrl+C para parar)
+  python -m app.daemon agent qa_tester '{"paths": ["app"]}'
+  python -m app.daemon mcp fs-context readFile '{"path": "system_prompt.md"}'
+  python -m app.daemon ping | stats | stop
+"""
+from app.daemon.client import DaemonClient, DaemonError, daemon_available, default_socket
@@ -0,0 +1,73 @@
+"""
+CLI do daemon do Aurix.
+
+  python -m app.daemon serve [--no-warmup]
+  python -m app.daemon agent <nome> ['<task JSON>']
+  python -m app.daemon mcp <server> <tool> ['<params JSON>'] [--timeout 30]
+  python -m app.daemon ping | stats | stop
+
+`--sock` (ou AURIX_DAEMON_SOCK) escolhe o socket; padrão ~/aurix/data/run/aurixd.sock.
+"""
+import argparse, json, signal, sys
+from typing import List, Optional
+from app.daemon.client import DaemonClient, DaemonError, default_socket
+
+def _json_arg(s: str, what: str):
+    try:
+        return json.loads(s)
+    except ValueError as e:
+        print(f"{what} inválido (JSON): {e}", file=sys.stderr)
+        raise SystemExit(2)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m app.daemon")
+    ap.add_argument("--sock", default=None, help=f"socket Unix (padrão: {default_socket()})")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("serve", help="roda o daemon em primeiro plano")
+    p.add_argument("--no-warmup", action="store_true", help="não pré-importa agentes nem sobe servidores MCP")
+    p = sub.add_parser("agent", help="dispatch_agent no daemon")
+    p.add_argument("name"); p.add_argument("task", nargs="?", default="{}")
+    p = sub.add_parser("mcp", help="chamada MCP no daemon")
+    p.add_argument("server"); p.add_argument("tool"); p.add_argument("params", nargs="?", default="{}")
+    p.add_argument("--timeout", type=float, default=None)
+    for name in ("ping", "stats", "stop"):
+        sub.add_parser(name)
+    a = ap.parse_args(argv)
+
+    if a.cmd == "serve":
+        from app.daemon.server import AurixDaemon
+        d = AurixDaemon(a.sock, warmup=not a.no_warmup)
+        try:
+            d.bind()
+        except RuntimeError as e:
+            print(f"❌ {e}", file=sys.stderr)
+            return 1
+        signal.signal(signal.SIGTERM, lambda *_: d.stop())
+        print(f"🟢 aurixd ouvindo em {d.sock_path}", flush=True)
+        try:
+            d.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    try:
+        with DaemonClient(a.sock) as c:
+            if a.cmd == "agent":
+                res = c.dispatch_agent(a.name, _json_arg(a.task, "task"))
+            elif a.cmd == "mcp":
+                res = c.mcp_action(a.server, a.tool, _json_arg(a.params, "params"), a.timeout)
+            elif a.cmd == "stop":
+                res = c.shutdown()
+            else:
+                res = c.request(a.cmd)
+    except (FileNotFoundError, ConnectionRefusedError):
+        print(f"❌ daemon não está rodando ({a.sock or default_socket()}); inicie com: python -m app.daemon serve", file=sys.stderr)
+        return 3
+    except DaemonError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    print(json.dumps(res, ensure_ascii=False, indent=2, default=str))
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
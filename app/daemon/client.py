@@ -0,0 +1,100 @@
+"""
+Cliente do daemon do Aurix (socket Unix, uma linha JSON por mensagem).
+
+  requisição: {"id": 1, "method": "dispatch_agent", "params": {"name": "qa_tester", "task": {...}}}
+  resposta:   {"id": 1, "ok": true, "result": {...}}  |  {"id": 1, "ok": false, "error": "..."}
+
+Uma conexão pode levar várias requisições em sequência.
+"""
+import os, socket, itertools, threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+from app.tools import codec
+
+MAX_LINE = 64 * 1024 * 1024
+
+class DaemonError(RuntimeError):
+    """Daemon respondeu com erro (ou a conexão caiu no meio da requisição)."""
+
+def default_socket() -> Path:
+    return Path(os.environ.get("AURIX_DAEMON_SOCK") or Path.home() / "aurix" / "data" / "run" / "aurixd.sock").expanduser()
+
+class DaemonClient:
+    def __init__(self, sock_path: Optional[os.PathLike] = None, timeout_s: Optional[float] = None):
+        self.sock_path = Path(sock_path).expanduser() if sock_path else default_socket()
+        self.timeout_s = timeout_s
+        self._sock: Optional[socket.socket] = None
+        self._rfile = None
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._sock is None:
+            s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            s.settimeout(self.timeout_s)
+            try:
+                s.connect(str(self.sock_path))
+            except OSError:
+                s.close()
+                raise
+            self._sock, self._rfile = s, s.makefile("rb")
+
+    def close(self):
+        with self._lock:
+            if self._sock is not None:
+                try: self._rfile.close(); self._sock.close()
+                except OSError: pass
+                self._sock = self._rfile = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def request(self, method: str, **params) -> Any:
+        """Envia uma requisição e devolve `result`; erro do daemon vira DaemonError."""
+        with self._lock:
+            self._connect()
+            rid = next(self._ids)
+            try:
+                self._sock.sendall(codec.dumpb({"id": rid, "method": method, "params": params}) + b"\n")
+                line = self._rfile.readline(MAX_LINE)
+            except OSError as e:
+                self._sock.close(); self._sock = self._rfile = None
+                raise DaemonError(f"conexão com o daemon falhou: {e}") from e
+            if not line:
+                self._sock.close(); self._sock = self._rfile = None
+                raise DaemonError("daemon fechou a conexão")
+        resp = codec.loads(line)
+        if not resp.get("ok"):
+            raise DaemonError(resp.get("error") or "erro desconhecido")
+        return resp.get("result")
+
+    def ping(self) -> Dict[str, Any]:
+        return self.request("ping")
+
+    def stats(self) -> Dict[str, Any]:
+        return self.request("stats")
+
+    def dispatch_agent(self, name: str, task: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self.request("dispatch_agent", name=name, task=task or {})
+
+    def mcp_action(self, server: str, tool: str, params: Optional[Dict[str, Any]] = None,
+                   timeout_s: Optional[float] = None) -> Dict[str, Any]:
+        return self.request("mcp_action", server=server, tool=tool, params=params or {}, timeout_s=timeout_s)
+
+    def shutdown(self) -> Dict[str, Any]:
+        return self.request("shutdown")
+
+def daemon_available(sock_path: Optional[os.PathLike] = None) -> bool:
+    """True se há um daemon respondendo no socket."""
+    path = Path(sock_path).expanduser() if sock_path else default_socket()
+    if not path.exists():
+        return False
+    try:
+        with DaemonClient(path, timeout_s=2.0) as c:
+            c.ping()
+        return True
+    except (OSError, DaemonError, ValueError):
+        return False
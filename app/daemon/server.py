@@ -0,0 +1,173 @@
+"""
+Servidor do daemon do Aurix (ver app/daemon/__init__.py).
+
+Uma thread por conexão; o estado caro fica no processo: singleton do MCPClient (filhos
+já inicializados), módulos de agente importados, caches em memória e clientes LLM.
+O socket é criado com permissão 0600 num diretório 0700 (só o próprio usuário conecta).
+"""
+import os, time, socketserver, threading, traceback, importlib
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+from app.tools import codec, metrics
+from app.daemon.client import MAX_LINE, daemon_available, default_socket
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        daemon: "AurixDaemon" = self.server.aurix
+        while True:
+            try:
+                line = self.rfile.readline(MAX_LINE)
+            except OSError:
+                return
+            if not line:
+                return
+            if not line.strip():
+                continue
+            try:
+                self.wfile.write(daemon.handle_line(line) + b"\n")
+            except OSError:
+                return
+            if daemon.stop_requested:
+                daemon.stop()
+                return
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    block_on_close = False
+
+class AurixDaemon:
+    def __init__(self, sock_path: Optional[os.PathLike] = None, warmup: bool = True, mcp_client=None):
+        self.sock_path = Path(sock_path).expanduser() if sock_path else default_socket()
+        self.warmup = warmup
+        self._mcp = mcp_client
+        self._mcp_lock = threading.Lock()
+        self._server: Optional[_Server] = None
+        self._started = time.time()
+        self._served: Dict[str, int] = {}
+        self.stop_requested = False
+        self._methods: Dict[str, Callable[..., Any]] = {
+            "ping": self.ping,
+            "stats": self.stats,
+            "dispatch_agent": self.dispatch_agent,
+            "mcp_action": self.mcp_action,
+            "shutdown": self.shutdown,
+        }
+
+    # ---- métodos ----
+
+    def mcp(self):
+        with self._mcp_lock:
+            if self._mcp is None:
+                from app.mcp import get_mcp_client
+                self._mcp = get_mcp_client()
+            return self._mcp
+
+    def ping(self) -> Dict[str, Any]:
+        return {"pid": os.getpid(), "uptime_s": round(time.time() - self._started, 3)}
+
+    def stats(self) -> Dict[str, Any]:
+        import sys
+        return {**self.ping(), "socket": str(self.sock_path), "requests": dict(self._served),
+                "agents_loaded": sorted(m.rsplit(".", 1)[1] for m in sys.modules if m.startswith("app.agents.") and not m.endswith("_util")),
+                "mcp_client": self._mcp is not None}
+
+    def dispatch_agent(self, name: str, task: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        from app.agents import dispatch_agent
+        return dispatch_agent(name, task or {})
+
+    def mcp_action(self, server: str, tool: str, params: Optional[Dict[str, Any]] = None,
+                   timeout_s: Optional[float] = None) -> Dict[str, Any]:
+        return self.mcp().call(server, tool, params or {}, timeout_s=timeout_s)
+
+    def shutdown(self) -> Dict[str, Any]:
+        self.stop_requested = True  # o handler para o loop depois de enviar esta resposta
+        return {"stopping": True}
+
+    # ---- protocolo ----
+
+    def handle_line(self, line: bytes) -> bytes:
+        rid, method = None, "?"
+        t0 = time.perf_counter()
+        try:
+            req = codec.loads(line)
+            if not isinstance(req, dict):
+                raise ValueError("requisição deve ser um objeto JSON")
+            rid, method = req.get("id"), str(req.get("method"))
+            fn = self._methods.get(method)
+            if fn is None:
+                raise LookupError(f"método desconhecido: {method}")
+            params = req.get("params") or {}
+            if not isinstance(params, dict):
+                raise ValueError("params deve ser um objeto")
+            resp = {"id": rid, "ok": True, "result": fn(**params)}
+            outcome = "ok"
+        except Exception as e:
+            resp = {"id": rid, "ok": False, "error": f"{type(e).__name__}: {e}"}
+            if not isinstance(e, (ValueError, LookupError, TypeError)):
+                resp["traceback"] = traceback.format_exc(limit=8)
+            outcome = "error"
+        self._served[method] = self._served.get(method, 0) + 1
+        metrics.DAEMON_REQUESTS.inc(method=method, outcome=outcome)
+        metrics.DAEMON_LATENCY.observe(time.perf_counter() - t0, method=method)
+        return codec.dumpb(resp, default=str)
+
+    # ---- ciclo de vida ----
+
+    def _warm(self):
+        """Importa os agentes e sobe os servidores MCP em background."""
+        from app.agents import _REGISTRY
+        for spec in _REGISTRY.values():
+            try:
+                importlib.import_module(spec.split(":")[0])
+            except Exception as e:
+                print(f"⚠️ aurixd: import de {spec} falhou: {e}")
+        try:
+            self.mcp().warmup(wait=False)
+        except Exception as e:
+            print(f"⚠️ aurixd: warmup MCP falhou: {e}")
+
+    def bind(self):
+        if self.sock_path.exists():
+            if daemon_available(self.sock_path):
+                raise RuntimeError(f"já há um daemon em {self.sock_path}")
+            self.sock_path.unlink()  # socket órfão de um daemon que morreu
+        self.sock_path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+        old = os.umask(0o177)
+        try:
+            self._server = _Server(str(self.sock_path), _Handler)
+        finally:
+            os.umask(old)
+        self._server.aurix = self
+        self._started = time.time()
+
+    def serve_forever(self):
+        if self._server is None:
+            self.bind()
+        if self.warmup:
+            threading.Thread(target=self._warm, name="aurixd-warmup", daemon=True).start()
+        try:
+            self._server.serve_forever(poll_interval=0.5)
+        finally:
+            self.close()
+
+    def close(self):
+        if self._server is not None:
+            self._server.server_close()
+            self._server = None
+            try: self.sock_path.unlink()
+            except FileNotFoundError: pass
+        if self._mcp is not None:
+            try: self._mcp.close()
+            except Exception: pass
+
+    def stop(self):
+        """Para o loop de qualquer thread (inclusive handler de sinal na thread do serve_forever)."""
+        if self._server is not None:
+            threading.Thread(target=self._server.shutdown, name="aurixd-stop", daemon=True).start()
+
+    def start_in_thread(self) -> threading.Thread:
+        """Sobe o daemon numa thread (testes/embutido); pare com stop()."""
+        self.bind()
+        t = threading.Thread(target=self.serve_forever, name="aurixd", daemon=True)
+        t.start()
+        return t
@@ -1,5 +1,6 @@
+import os
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional
 from app.tools.mcp_tool import MCPClient
 
 _singleton = None
@@ -9,4 +10,19 @@ def get_mcp_client(servers_yaml: Optional[Path] = None) -> MCPClient:
     if _singleton is None:
         default = servers_yaml or Path.home() / "aurix" / "app" / "mcp" / "servers.yaml"
         _singleton = MCPClient(default)
+        # AURIX_MCP_WARMUP=1 -> pré-inicia os servidores em background
+        if os.environ.get("AURIX_MCP_WARMUP", "").lower() in ("1", "true", "yes", "on"):
+            _singleton.warmup(wait=False)
+        # AURIX_MCP_SUPERVISE=<segundos> -> ping de liveness + restart com backoff
+        supervise = os.environ.get("AURIX_MCP_SUPERVISE", "")
+        if supervise and supervise.lower() not in ("0", "false", "no", "off"):
+            try:
+                interval = float(supervise)
+            except ValueError:
+                interval = 15.0
+            _singleton.start_supervisor(interval_s=interval if interval > 1 else 15.0)
     return _singleton
+
+def warmup_mcp(names: Optional[List[str]] = None, wait: bool = False) -> Dict[str, str]:
+    """Pré-inicia servidores MCP em paralelo (spawn + handshake)."""
+    return get_mcp_client().warmup(names, wait=wait)
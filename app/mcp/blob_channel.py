@@ -0,0 +1,180 @@
+"""
+Canal lateral para resultados MCP grandes (handoff por arquivo mapeado em memória).
+
+Negociado no `initialize`:
+  cliente  -> params.capabilities.experimental["aurix/blob"] = {"version": 1, "minBytes": N, "dir": D}
+  servidor -> result.capabilities.experimental["aurix/blob"] = {"version": 1}
+
+Depois disso, resultados cujo JSON tem >= N bytes (e qualquer resultado binário) são
+gravados num arquivo em D (tmpfs `/dev/shm` quando disponível) e a resposta leva só o handle:
+  {"aurix/blob": {"path": ..., "size": ..., "encoding": "json" | "bytes"}}
+O cliente mapeia o arquivo (mmap), decodifica e remove. Sem a negociação nada muda.
+D é um diretório por processo servidor (`client_dir`): respostas descartadas levam o blob junto
+(`discard`) e o que sobrar sai com o diretório no stop/restart (`remove_dir`).
+
+Só stdlib (usa `orjson` se instalado): os servidores importam este módulo rodando como script.
+"""
+import atexit, base64, json, mmap, os, tempfile
+from typing import Any, Dict, Optional
+
+CAPABILITY = "aurix/blob"
+VERSION = 1
+PREFIX = "aurix-blob-"
+DEFAULT_MIN_BYTES = 512 * 1024
+
+try:
+    import orjson
+    def _dumps(obj: Any) -> str:
+        try:
+            return orjson.dumps(obj).decode("utf-8")
+        except TypeError:  # ints > 64 bits etc.
+            return json.dumps(obj)
+except ImportError:
+    _dumps = json.dumps
+
+def blob_dir() -> str:
+    d = os.environ.get("AURIX_BLOB_DIR")
+    if d:
+        return d
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm"
+    return tempfile.gettempdir()
+
+# ==== lado do cliente ====
+
+def client_capability(min_bytes: int = DEFAULT_MIN_BYTES, dirpath: Optional[str] = None) -> Dict[str, Any]:
+    return {"version": VERSION, "minBytes": int(min_bytes), "dir": dirpath or blob_dir()}
+
+def negotiated(init_result: Any) -> bool:
+    """True se o servidor aceitou o canal na resposta do initialize."""
+    try:
+        cap = init_result["capabilities"]["experimental"][CAPABILITY]
+        return int(cap.get("version", 0)) == VERSION
+    except (KeyError, TypeError, AttributeError, ValueError):
+        return False
+
+def is_handle(result: Any) -> bool:
+    return isinstance(result, dict) and len(result) == 1 and CAPABILITY in result
+
+def client_dir(parent: Optional[str] = None) -> str:
+    """Diretório próprio de um processo servidor (dentro de blob_dir()): some inteiro no stop/restart."""
+    return tempfile.mkdtemp(prefix="aurix-blobs-", dir=parent or blob_dir())
+
+def _checked(handle: Dict[str, Any], dirpath: str) -> str:
+    """Só aceita arquivos `aurix-blob-*` dentro do diretório que o próprio cliente anunciou."""
+    path = os.path.realpath(str(handle.get("path", "")))
+    if os.path.dirname(path) != os.path.realpath(dirpath) or not os.path.basename(path).startswith(PREFIX):
+        raise ValueError(f"handle de blob fora de {dirpath}: {path}")
+    return path
+
+def load(handle: Dict[str, Any], dirpath: str) -> Any:
+    """
+    Mapeia e consome um blob. O arquivo é removido logo após o mmap (o mapeamento
+    continua válido); `encoding: bytes` devolve um memoryview sobre o mapeamento, sem cópia.
+    """
+    path = _checked(handle, dirpath)
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+    finally:
+        try: os.unlink(path)
+        except OSError: pass
+    if handle.get("size") is not None and int(handle["size"]) != size:
+        raise ValueError(f"blob truncado: {size} de {handle['size']} bytes")
+    if handle.get("encoding") == "bytes":
+        return memoryview(mm) if mm is not None else memoryview(b"")
+    if mm is None:
+        raise ValueError("blob JSON vazio")
+    try:
+        try:
+            import orjson
+            with memoryview(mm) as mv:
+                return orjson.loads(mv)
+        except ImportError:
+            return json.loads(mm[:])
+    finally:
+        mm.close()
+
+def discard(result: Any, dirpath: str) -> bool:
+    """Remove o blob de uma resposta descartada (atrasada, perdedora do hedge); True se havia um."""
+    if not is_handle(result):
+        return False
+    try:
+        os.unlink(_checked(result[CAPABILITY], dirpath))
+    except (OSError, ValueError, TypeError, AttributeError):
+        return False
+    return True
+
+def remove_dir(dirpath: str):
+    """Apaga os blobs que sobraram num diretório de client_dir() e o próprio diretório."""
+    try:
+        with os.scandir(dirpath) as it:
+            for e in it:
+                if e.name.startswith(PREFIX):
+                    try: os.unlink(e.path)
+                    except OSError: pass
+        os.rmdir(dirpath)
+    except OSError:
+        pass
+
+# ==== lado do servidor ====
+
+_pending: set = set()
+
+def _cleanup():
+    for p in list(_pending):
+        try: os.unlink(p)
+        except OSError: pass
+
+atexit.register(_cleanup)
+
+def accept(init_params: Any) -> Optional[Dict[str, Any]]:
+    """Servidor: lê a oferta do cliente no initialize; None se não houver (ou versão diferente)."""
+    try:
+        offer = init_params["capabilities"]["experimental"][CAPABILITY]
+        if int(offer.get("version", 0)) != VERSION or not os.path.isdir(offer["dir"]):
+            return None
+        return {"minBytes": int(offer.get("minBytes", DEFAULT_MIN_BYTES)), "dir": offer["dir"]}
+    except (KeyError, TypeError, AttributeError, ValueError):
+        return None
+
+def advertise(capabilities: Dict[str, Any], channel: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if channel:
+        capabilities.setdefault("experimental", {})[CAPABILITY] = {"version": VERSION}
+    return capabilities
+
+def _offload(data: bytes, encoding: str, channel: Dict[str, Any]) -> Dict[str, Any]:
+    fd, path = tempfile.mkstemp(prefix=PREFIX, dir=channel["dir"])
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+    _pending.add(path)
+    if len(_pending) > 256:  # o cliente remove ao consumir; aqui só evita crescer sem limite
+        _pending.difference_update([p for p in list(_pending) if not os.path.exists(p)])
+    return {CAPABILITY: {"path": path, "size": len(data), "encoding": encoding}}
+
+def frame(resp: Dict[str, Any], channel: Optional[Dict[str, Any]]) -> str:
+    """
+    Serializa uma resposta JSON-RPC em uma linha. Com o canal negociado, resultados grandes
+    (ou binários) viram handle; o JSON do resultado é gerado uma única vez.
+    """
+    if "result" not in resp:
+        return _dumps(resp)
+    result = resp["result"]
+    if isinstance(result, (bytes, bytearray, memoryview)):
+        if channel:
+            result = _offload(bytes(result), "bytes", channel)
+        else:
+            result = {"encoding": "base64", "data": base64.b64encode(bytes(result)).decode("ascii")}
+        return _dumps({**resp, "result": result})
+    if not channel:
+        return _dumps(resp)
+    body = _dumps(result)
+    if len(body) >= channel["minBytes"]:
+        body = _dumps(_offload(body.encode("utf-8"), "json", channel))
+    head = _dumps({k: v for k, v in resp.items() if k != "result"})
+    return head[:-1] + (", " if len(head) > 2 else "") + '"result": ' + body + "}"
@@ -9,16 +9,21 @@ import sys
 import time
 import urllib.request
 import urllib.error
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional
+try:
+    from app.mcp import blob_channel
+except ImportError:  # rodando como script: app/mcp já está no sys.path
+    import blob_channel
 
-def http_fetch(url: str, method: str = "GET", headers: Dict[str, str] = None, data: str = None) -> Dict[str, Any]:
+def http_fetch(url: str, method: str = "GET", headers: Dict[str, str] = None, data: str = None, timeout: float = 30) -> Dict[str, Any]:
     """Faz uma requisição HTTP"""
     try:
         req = urllib.request.Request(url, method=method, headers=headers or {})
         if data:
             req.data = data.encode('utf-8')
         
-        with urllib.request.urlopen(req, timeout=30) as response:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
             content = response.read().decode('utf-8')
             return {
                 "status": response.status,
@@ -42,109 +47,115 @@ def http_fetch(url: str, method: str = "GET", headers: Dict[str, str] = None, da
             "error": str(e)
         }
 
+TOOLS = [
+    {
+        "name": "fetch",
+        "description": "Faz uma requisição HTTP",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "url": {"type": "string"},
+                "method": {"type": "string", "default": "GET"},
+                "headers": {"type": "object"},
+                "data": {"type": "string"},
+                "timeout_s": {"type": "number", "default": 30}
+            },
+            "required": ["url"]
+        }
+    },
+    {
+        "name": "get",
+        "description": "Faz uma requisição HTTP GET",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "url": {"type": "string"},
+                "timeout_s": {"type": "number", "default": 30}
+            },
+            "required": ["url"]
+        }
+    }
+]
+
+BATCH_WORKERS = 8  # membros de um batch JSON-RPC executados em paralelo
+
+def handle(request: Any, state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Processa uma requisição JSON-RPC; None para notificações (sem id)."""
+    if not isinstance(request, dict):
+        return {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "Invalid Request"}}
+    method = request.get("method")
+    rid = request.get("id")
+    try:
+        if method == "initialize":
+            state["channel"] = blob_channel.accept(request.get("params"))
+            capabilities = blob_channel.advertise({"tools": {}}, state["channel"])
+            capabilities.setdefault("experimental", {})["aurix/batch"] = {"version": 1}
+            result = {
+                "protocolVersion": "2024-11-05",
+                "capabilities": capabilities,
+                "serverInfo": {
+                    "name": "aurix-http-server",
+                    "version": "1.0.0"
+                }
+            }
+        elif method == "ping":
+            result = {}
+        elif method == "tools/list":
+            result = {"tools": TOOLS}
+        elif method == "tools/call":
+            tool_name = request.get("params", {}).get("name")
+            arguments = request.get("params", {}).get("arguments", {})
+            if tool_name == "fetch":
+                result = http_fetch(
+                    arguments.get("url"),
+                    arguments.get("method", "GET"),
+                    arguments.get("headers"),
+                    arguments.get("data"),
+                    float(arguments.get("timeout_s", 30))
+                )
+            elif tool_name == "get":
+                result = http_fetch(arguments.get("url"), "GET", timeout=float(arguments.get("timeout_s", 30)))
+            else:
+                result = {"error": f"Tool '{tool_name}' não encontrada"}
+        elif rid is None:
+            return None  # notificação desconhecida (ex.: notifications/initialized)
+        else:
+            return {"jsonrpc": "2.0", "id": rid, "error": {"code": -32601, "message": f"Método '{method}' não suportado"}}
+    except Exception as e:
+        return {"jsonrpc": "2.0", "id": rid, "error": {"code": -32603, "message": str(e)}}
+    if rid is None and method != "initialize":
+        return None
+    return {"jsonrpc": "2.0", "id": rid, "result": result}
+
 def main():
-    """Loop principal do servidor MCP HTTP"""
+    """Loop principal do servidor MCP HTTP (requisições isoladas ou batch JSON-RPC)"""
     print("HTTP MCP Server running on stdio", file=sys.stderr)
-    
-    while True:
+    sys.stdout.reconfigure(encoding="utf-8")  # respostas saem em UTF-8 cru (sem \uXXXX)
+    state: Dict[str, Any] = {"channel": None}  # canal de blobs, negociado no initialize
+    pool = ThreadPoolExecutor(max_workers=BATCH_WORKERS)
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
         try:
-            line = input()
-            if not line.strip():
-                continue
-                
-            try:
-                request = json.loads(line)
-            except json.JSONDecodeError:
+            request = json.loads(line)
+        except json.JSONDecodeError:
+            print(json.dumps({"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "Parse error"}}), flush=True)
+            continue
+
+        if isinstance(request, list):
+            if not request:
+                print(json.dumps({"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "Invalid Request"}}), flush=True)
                 continue
-                
-            if request.get("method") == "initialize":
-                response = {
-                    "jsonrpc": "2.0",
-                    "id": request.get("id"),
-                    "result": {
-                        "protocolVersion": "2024-11-05",
-                        "capabilities": {
-                            "tools": {}
-                        },
-                        "serverInfo": {
-                            "name": "aurix-http-server",
-                            "version": "1.0.0"
-                        }
-                    }
-                }
-                print(json.dumps(response))
-                
-            elif request.get("method") == "tools/list":
-                response = {
-                    "jsonrpc": "2.0",
-                    "id": request.get("id"),
-                    "result": {
-                        "tools": [
-                            {
-                                "name": "fetch",
-                                "description": "Faz uma requisição HTTP",
-                                "inputSchema": {
-                                    "type": "object",
-                                    "properties": {
-                                        "url": {"type": "string"},
-                                        "method": {"type": "string", "default": "GET"},
-                                        "headers": {"type": "object"},
-                                        "data": {"type": "string"}
-                                    },
-                                    "required": ["url"]
-                                }
-                            },
-                            {
-                                "name": "get",
-                                "description": "Faz uma requisição HTTP GET",
-                                "inputSchema": {
-                                    "type": "object",
-                                    "properties": {
-                                        "url": {"type": "string"}
-                                    },
-                                    "required": ["url"]
-                                }
-                            }
-                        ]
-                    }
-                }
-                print(json.dumps(response))
-                
-            elif request.get("method") == "tools/call":
-                tool_name = request.get("params", {}).get("name")
-                arguments = request.get("params", {}).get("arguments", {})
-                
-                if tool_name == "fetch":
-                    result = http_fetch(
-                        arguments.get("url"),
-                        arguments.get("method", "GET"),
-                        arguments.get("headers"),
-                        arguments.get("data")
-                    )
-                elif tool_name == "get":
-                    result = http_fetch(arguments.get("url"), "GET")
-                else:
-                    result = {"error": f"Tool '{tool_name}' não encontrada"}
-                
-                response = {
-                    "jsonrpc": "2.0",
-                    "id": request.get("id"),
-                    "result": result
-                }
-                print(json.dumps(response))
-                
-        except EOFError:
-            break
-        except Exception as e:
-            error_response = {
-                "jsonrpc": "2.0",
-                "id": request.get("id") if 'request' in locals() else None,
-                "error": {
-                    "code": -32603,
-                    "message": str(e)
-                }
-            }
-            print(json.dumps(error_response))
+            # batch: membros em paralelo, uma única linha (array) de resposta na ordem recebida
+            responses = [r for r in pool.map(lambda req: handle(req, state), request) if r is not None]
+            if responses:
+                print("[" + ",".join(blob_channel.frame(r, state["channel"]) for r in responses) + "]", flush=True)
+            continue
+
+        response = handle(request, state)
+        if response is not None:
+            print(blob_channel.frame(response, state["channel"]), flush=True)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,11 @@
+from pathlib import Path
+from typing import Optional
+from app.memory.store import MemoryStore, default_root, load_legacy_entry, iter_records
+
+_singleton = None
+
+def get_memory_store(root: Optional[Path] = None) -> MemoryStore:
+    global _singleton
+    if _singleton is None:
+        _singleton = MemoryStore(root)
+    return _singleton
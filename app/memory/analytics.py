@@ -0,0 +1,247 @@
+"""
+Analytics do histórico de delegações (aurix_memory) em SQLite.
+
+Ingestão incremental de duas fontes para uma tabela colunar `delegations`
+(projeto, from/to, agente, início/fim em epoch ms, duração, executionTime, retryCount, success):
+
+- arquivos do lado TS (`projects/*.json`, `backups/<projeto>/*.json`): cada arquivo é lido uma vez
+  (tabela `sources` guarda tamanho/mtime); snapshots repetem o histórico inteiro, então as linhas
+  são deduplicadas por (projeto, from, to, agente, início, fim), campos ausentes inclusive.
+- log do `MemoryStore` (`log/memory.log`): lido a partir do último offset; de registros delta só
+  entram os itens anexados (nada de reparsear o histórico). Compactação (inode novo) reinicia do zero.
+
+  python -m app.memory.analytics [--root DIR] [--since 2025-09-05T22:00:00Z] [--bucket 3600] [--json]
+"""
+import os, sqlite3, argparse
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from app.tools import codec
+from app.memory.store import FULL, DELTA, TOMB, default_root, iter_records, _to_ms, _iso
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS delegations (
+  project TEXT NOT NULL, from_agent TEXT, to_agent TEXT, agent TEXT,
+  start_ms INTEGER, end_ms INTEGER, duration_ms INTEGER, exec_ms REAL,
+  retries INTEGER NOT NULL DEFAULT 0, success INTEGER
+);
+-- UNIQUE comum trata NULLs como distintos: delegações sem fim/origem duplicariam a cada snapshot
+CREATE UNIQUE INDEX IF NOT EXISTS ux_deleg ON delegations (project, COALESCE(from_agent, ''),
+  COALESCE(to_agent, ''), COALESCE(agent, ''), COALESCE(start_ms, -1), COALESCE(end_ms, -1));
+CREATE INDEX IF NOT EXISTS ix_deleg_agent ON delegations (agent, start_ms);
+CREATE INDEX IF NOT EXISTS ix_deleg_start ON delegations (start_ms);
+CREATE TABLE IF NOT EXISTS sources (
+  path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, ino INTEGER, offset INTEGER NOT NULL DEFAULT 0
+);
+"""
+_SCHEMA_VERSION = 1
+
+def _opt_ms(v: Any) -> Optional[int]:
+    try:
+        return _to_ms(v) if v not in (None, "") else None
+    except (ValueError, TypeError):
+        return None
+
+def _row(project: str, item: Any) -> Optional[Tuple]:
+    if not isinstance(item, dict):
+        return None
+    dg = item.get("delegation") if isinstance(item.get("delegation"), dict) else {}
+    md = item.get("metadata") if isinstance(item.get("metadata"), dict) else {}
+    start, end = _opt_ms(dg.get("startTime")), _opt_ms(dg.get("endTime"))
+    if start is None and end is None:
+        return None
+    agent = md.get("agent") or dg.get("toAgent")
+    dur = end - start if start is not None and end is not None else None
+    success = item.get("success")
+    return (project, dg.get("fromAgent"), dg.get("toAgent"), agent, start, end, dur, md.get("executionTime"),
+            int(dg.get("retryCount") or 0), None if success is None else int(bool(success)))
+
+def _items_from_ops(ops: List[list]) -> Iterable[Any]:
+    """Delegações novas num delta do MemoryStore (append em data.delegations ou set de data/estado)."""
+    for op in ops:
+        kind, path = op[0], op[1]
+        if kind == "append" and path == ["data", "delegations"]:
+            yield from op[2]
+        elif kind == "set" and path in ([], ["data"], ["data", "delegations"]):
+            v = op[2]
+            for k in (["data", "delegations"] if not path else ["delegations"] if path == ["data"] else []):
+                v = v.get(k) if isinstance(v, dict) else None
+            if isinstance(v, list):
+                yield from v
+
+def _percentile(xs: List[float], q: float) -> Optional[float]:
+    if not xs:
+        return None
+    k = (len(xs) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(xs) - 1)
+    return round(xs[lo] + (xs[hi] - xs[lo]) * (k - lo), 3)
+
+class DelegationAnalytics:
+    def __init__(self, root: Optional[os.PathLike] = None, db_path: Optional[os.PathLike] = None):
+        self.root = Path(root).expanduser() if root else default_root()
+        self.db_path = Path(db_path).expanduser() if db_path else self.root / "log" / "delegations.sqlite"
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.db_path))
+        self.db.execute("PRAGMA journal_mode=WAL")
+        if self.db.execute("PRAGMA user_version").fetchone()[0] < _SCHEMA_VERSION:
+            # tabela derivada: versão antiga (com duplicatas) é descartada e reingerida do zero
+            self.db.executescript("DROP TABLE IF EXISTS delegations; DROP TABLE IF EXISTS sources;")
+        self.db.executescript(_SCHEMA)
+        self.db.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---- ingestão ----
+
+    def _insert(self, rows: Iterable[Optional[Tuple]]) -> int:
+        before = self.db.total_changes
+        self.db.executemany("INSERT OR IGNORE INTO delegations VALUES (?,?,?,?,?,?,?,?,?,?)", [r for r in rows if r])
+        return self.db.total_changes - before
+
+    def _source(self, path: Path) -> Optional[Tuple[int, int, int, int]]:
+        r = self.db.execute("SELECT size, mtime_ns, ino, offset FROM sources WHERE path = ?", (str(path),)).fetchone()
+        return tuple(r) if r else None
+
+    def _mark(self, path: Path, st: os.stat_result, offset: int = 0):
+        self.db.execute("INSERT OR REPLACE INTO sources VALUES (?,?,?,?,?)", (str(path), st.st_size, st.st_mtime_ns, st.st_ino, offset))
+
+    def _ingest_legacy(self) -> Tuple[int, int]:
+        files = list((self.root / "projects").glob("*.json"))
+        if (self.root / "backups").is_dir():
+            files += list((self.root / "backups").glob("*/*.json"))
+        seen = added = 0
+        for fp in files:
+            try:
+                st = fp.stat()
+            except FileNotFoundError:
+                continue
+            prev = self._source(fp)
+            if prev and prev[:2] == (st.st_size, st.st_mtime_ns):
+                continue
+            seen += 1
+            try:
+                entry = codec.loads(fp.read_bytes())
+                data = entry.get("data")
+                if isinstance(data, str):
+                    data = codec.loads(data)
+            except (OSError, ValueError):
+                continue  # arquivo sendo escrito pelo lado TS: tenta de novo na próxima ingestão
+            items = data.get("delegations") if isinstance(data, dict) else None
+            if isinstance(items, list):
+                project = entry.get("projectId") or (fp.parent.name if fp.parent.parent.name == "backups" else fp.stem)
+                added += self._insert(_row(project, it) for it in items)
+            self._mark(fp, st)
+        return seen, added
+
+    def _ingest_log(self) -> Tuple[int, int]:
+        path = self.root / "log" / "memory.log"
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return 0, 0
+        prev = self._source(path)
+        start = prev[3] if prev and prev[2] == st.st_ino and prev[3] <= st.st_size else 0
+        records = added = 0
+        end = start
+        for header, payload, end in iter_records(path, start):
+            records += 1
+            if header["k"] == TOMB:
+                continue
+            body = codec.loads(payload)
+            if header["k"] == FULL:
+                items = ((body.get("data") or {}).get("delegations") if isinstance(body, dict) and isinstance(body.get("data"), dict) else None) or []
+            elif header["k"] == DELTA:
+                items = _items_from_ops(body)
+            else:
+                continue
+            added += self._insert(_row(header["p"], it) for it in items)
+        self._mark(path, st, end)
+        return records, added
+
+    def ingest(self) -> Dict[str, int]:
+        """Lê só o que mudou desde a última chamada. Devolve contagens da rodada."""
+        with self.db:
+            files, from_files = self._ingest_legacy()
+            records, from_log = self._ingest_log()
+        return {"files": files, "log_records": records, "delegations": from_files + from_log, "total": self.count()}
+
+    # ---- consultas ----
+
+    def _where(self, since: Any, until: Any, project: Optional[str]) -> Tuple[str, list]:
+        conds, args = [], []
+        if since is not None:
+            conds.append("start_ms >= ?"); args.append(_to_ms(since))
+        if until is not None:
+            conds.append("start_ms <= ?"); args.append(_to_ms(until))
+        if project is not None:
+            conds.append("project = ?"); args.append(project)
+        return (" WHERE " + " AND ".join(conds)) if conds else "", args
+
+    def count(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM delegations").fetchone()[0]
+
+    def agent_stats(self, since: Any = None, until: Any = None, project: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Por agente executor: n, p50/p95/média da duração (ms), taxa de retry e de sucesso."""
+        where, args = self._where(since, until, project)
+        out: Dict[str, Dict[str, Any]] = {}
+        for agent, n, retried, retries, ok, known in self.db.execute(
+                "SELECT agent, COUNT(*), SUM(retries > 0), SUM(retries), SUM(success), COUNT(success)"
+                f" FROM delegations{where} GROUP BY agent ORDER BY agent", args):
+            out[agent] = {"count": n, "retry_rate": round(retried / n, 4), "retries": retries,
+                          "success_rate": round(ok / known, 4) if known else None}
+        cond = (where + " AND" if where else " WHERE") + " duration_ms IS NOT NULL"
+        durs: Dict[str, List[float]] = {}
+        for agent, dur in self.db.execute(f"SELECT agent, duration_ms FROM delegations{cond} ORDER BY agent, duration_ms", args):
+            durs.setdefault(agent, []).append(dur)
+        for agent, st in out.items():
+            xs = durs.get(agent, [])
+            st.update(p50_ms=_percentile(xs, 0.50), p95_ms=_percentile(xs, 0.95),
+                      mean_ms=round(sum(xs) / len(xs), 3) if xs else None)
+        return out
+
+    def handoffs(self, since: Any = None, until: Any = None, project: Optional[str] = None,
+                 bucket_s: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Contagem de handoffs from -> to; com `bucket_s`, uma linha por janela de tempo."""
+        where, args = self._where(since, until, project)
+        if bucket_s:
+            b = int(bucket_s * 1000)
+            sql = (f"SELECT (start_ms / {b}) * {b} AS bucket, from_agent, to_agent, COUNT(*) FROM delegations{where}"
+                   " GROUP BY bucket, from_agent, to_agent ORDER BY bucket, COUNT(*) DESC, from_agent, to_agent")
+            return [{"bucket": _iso(bk), "from": f, "to": t, "count": n} for bk, f, t, n in self.db.execute(sql, args)]
+        sql = (f"SELECT from_agent, to_agent, COUNT(*) FROM delegations{where}"
+               " GROUP BY from_agent, to_agent ORDER BY COUNT(*) DESC, from_agent, to_agent")
+        return [{"from": f, "to": t, "count": n} for f, t, n in self.db.execute(sql, args)]
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Analytics do histórico de delegações (aurix_memory)")
+    ap.add_argument("--root", help="diretório do aurix_memory (padrão: AURIX_MEMORY_DIR ou ~/aurix/aurix_memory)")
+    ap.add_argument("--db", help="arquivo SQLite (padrão: <root>/log/delegations.sqlite)")
+    ap.add_argument("--since"); ap.add_argument("--until"); ap.add_argument("--project")
+    ap.add_argument("--bucket", type=int, help="handoffs por janela de N segundos")
+    ap.add_argument("--json", action="store_true")
+    a = ap.parse_args(argv)
+    with DelegationAnalytics(a.root, a.db) as an:
+        ing = an.ingest()
+        stats = an.agent_stats(a.since, a.until, a.project)
+        hand = an.handoffs(a.since, a.until, a.project, a.bucket)
+    if a.json:
+        print(codec.dumps({"ingest": ing, "agents": stats, "handoffs": hand}, pretty=True))
+        return
+    print(f"ingestão: {ing['files']} arquivos, {ing['log_records']} registros do log, +{ing['delegations']} (total {ing['total']})\n")
+    print(f"{'agente':<20}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'retry':>8}{'sucesso':>9}")
+    for agent, st in stats.items():
+        fmt = lambda v, pct=False: "-" if v is None else (f"{v:.0%}" if pct else f"{v:g}")
+        print(f"{str(agent):<20}{st['count']:>6}{fmt(st['p50_ms']):>10}{fmt(st['p95_ms']):>10}"
+              f"{fmt(st['retry_rate'], True):>8}{fmt(st['success_rate'], True):>9}")
+    print("\nhandoffs:")
+    for h in hand:
+        print(f"  {h.get('bucket', '') + '  ' if 'bucket' in h else ''}{h['from']} -> {h['to']}: {h['count']}")
+
+if __name__ == "__main__":
+    main()
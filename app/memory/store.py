@@ -0,0 +1,493 @@
+"""
+Store do aurix_memory em log append-only com prefixo de tamanho.
+
+Layout em `<root>/log/memory.log`, um registro por save:
+
+  >IIH  payload_len, crc32(header+payload), header_len
+  header   JSON pequeno: {"p": projectId, "v": versão, "t": epoch ms, "k": full|delta|tomb, "a": [agentes]}
+  payload  JSON: estado completo (full) ou lista de operações (delta)
+
+- delta: diferença contra o estado anterior do projeto (`set`/`del` por caminho e `append` em
+  listas que só cresceram), então um save custa O(novos dados), não O(histórico).
+  A cada `keyframe_every` deltas (ou quando o delta fica grande) grava-se um `full`.
+- índice secundário em memória (projectId / agente / timestamp) reconstruído lendo só os headers;
+  consultas por índice nunca decodificam payloads.
+- cauda corrompida (escrita interrompida) é truncada na abertura.
+- compactação reescreve o log mantendo as últimas `max_versions` versões de cada projeto e
+  removendo projetos apagados; roda sozinha quando metade do arquivo é lixo.
+- `import_legacy()` converte `projects/*.json` + `backups/<projeto>/*.json` (formato do lado TS,
+  com `data` duplamente codificado) em deltas.
+"""
+import os, time, zlib, fcntl, struct, threading, datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from app.tools import codec
+
+_HDR = struct.Struct(">IIH")
+FULL, DELTA, TOMB = "full", "delta", "tomb"
+
+def default_root() -> Path:
+    return Path(os.environ.get("AURIX_MEMORY_DIR") or Path.home() / "aurix" / "aurix_memory").expanduser()
+
+def _to_ms(ts: Any) -> int:
+    """datetime | ISO-8601 | epoch (s ou ms) -> epoch ms."""
+    if ts is None:
+        return int(time.time() * 1000)
+    if isinstance(ts, datetime.datetime):
+        return int(ts.timestamp() * 1000)
+    if isinstance(ts, (int, float)):
+        return int(ts if ts > 1e11 else ts * 1000)
+    return int(datetime.datetime.fromisoformat(str(ts).replace("Z", "+00:00")).timestamp() * 1000)
+
+def _iso(ms: int) -> str:
+    return datetime.datetime.fromtimestamp(ms / 1000, datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+# ==== delta ====
+
+def diff(old: Any, new: Any, path: Tuple = ()) -> List[list]:
+    """Operações que levam `old` a `new`: ["set", path, v] | ["del", path] | ["append", path, itens]."""
+    if old == new:
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops: List[list] = [["del", list(path + (k,))] for k in old if k not in new]
+        for k, v in new.items():
+            if k in old:
+                ops += diff(old[k], v, path + (k,))
+            else:
+                ops.append(["set", list(path + (k,)), v])
+        return ops
+    if isinstance(old, list) and isinstance(new, list) and len(new) > len(old) and new[:len(old)] == old:
+        return [["append", list(path), new[len(old):]]]
+    return [["set", list(path), new]]
+
+def apply(state: Any, ops: List[list]) -> Any:
+    """Aplica operações de `diff` (muta e devolve `state`)."""
+    for op in ops:
+        kind, path = op[0], op[1]
+        if not path:
+            if kind == "set":
+                state = op[2]
+            elif kind == "append":
+                state.extend(op[2])
+            continue
+        parent = state
+        for k in path[:-1]:
+            parent = parent[k]
+        last = path[-1]
+        if kind == "set":
+            parent[last] = op[2]
+        elif kind == "del":
+            parent.pop(last, None)
+        elif kind == "append":
+            parent[last].extend(op[2])
+    return state
+
+def _agents_of(metadata: Optional[Dict[str, Any]], ops_or_state: Any) -> List[str]:
+    """Agentes citados no save: metadata.agent e itens novos com metadata.agent / delegation.{from,to}Agent."""
+    found = set()
+    if metadata and metadata.get("agent"):
+        found.add(str(metadata["agent"]))
+    items: List[Any] = []
+    if isinstance(ops_or_state, list):
+        for op in ops_or_state:
+            if op and op[0] == "append":
+                items += op[2]
+    elif isinstance(ops_or_state, dict):
+        for v in ops_or_state.values():
+            if isinstance(v, list):
+                items += v
+    for it in items:
+        if not isinstance(it, dict):
+            continue
+        md, dg = it.get("metadata"), it.get("delegation")
+        if isinstance(md, dict) and md.get("agent"):
+            found.add(str(md["agent"]))
+        if isinstance(dg, dict):
+            for k in ("fromAgent", "toAgent"):
+                if dg.get(k):
+                    found.add(str(dg[k]))
+    return sorted(found)
+
+# ==== store ====
+
+class IndexEntry(tuple):
+    """(offset, size, projectId, version, ts_ms, kind, agents) — só metadados, sem payload."""
+    __slots__ = ()
+    offset = property(lambda s: s[0]); size = property(lambda s: s[1]); project = property(lambda s: s[2])
+    version = property(lambda s: s[3]); ts = property(lambda s: s[4]); kind = property(lambda s: s[5])
+    agents = property(lambda s: s[6])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"projectId": self.project, "version": self.version, "timestamp": _iso(self.ts),
+                "kind": self.kind, "agents": list(self.agents)}
+
+class MemoryStore:
+    def __init__(self, root: Optional[os.PathLike] = None, keyframe_every: int = 64, max_versions: int = 1000,
+                 compact_min_bytes: int = 1 << 20):
+        self.root = Path(root).expanduser() if root else default_root()
+        self.path = self.root / "log" / "memory.log"
+        self.keyframe_every = keyframe_every
+        self.max_versions = max_versions
+        self.compact_min_bytes = compact_min_bytes
+        self._lock = threading.RLock()
+        self._fh = None
+        self._ino = None
+        self._end = 0
+        self._entries: List[IndexEntry] = []
+        self._by_project: Dict[str, List[int]] = {}   # projectId -> posições em _entries
+        self._by_agent: Dict[str, List[int]] = {}
+        self._latest: Dict[str, Any] = {}             # projectId -> último estado (cache p/ delta)
+        self._since_full: Dict[str, int] = {}
+        self._counted: Dict[str, int] = {}            # projectId -> versões antigas já somadas em _dead
+        self._dead = 0
+
+    # ---- arquivo / índice ----
+
+    def _open(self):
+        if self._fh is not None:
+            try:
+                st = os.stat(self.path)
+                if st.st_ino == self._ino:
+                    return
+            except FileNotFoundError:
+                pass
+            self._fh.close(); self._fh = None  # compactado por outro processo -> reabre
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = open(self.path, "a+b")
+        self._ino = os.fstat(self._fh.fileno()).st_ino
+        self._end = 0
+        self._entries.clear(); self._by_project.clear(); self._by_agent.clear()
+        self._latest.clear(); self._since_full.clear(); self._counted.clear(); self._dead = 0
+
+    def _lock_log(self) -> int:
+        """
+        flock exclusivo no log *atual*. Um compact() de outro processo pode trocar o arquivo entre
+        o _open e o lock: escrever no fd antigo perderia o registro (inode já desvinculado), então
+        reabre e tenta de novo.
+        """
+        while True:
+            self._open()
+            fd = self._fh.fileno()
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_ino == os.stat(self.path).st_ino:
+                    return fd
+            except FileNotFoundError:
+                pass
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            self._fh.close(); self._fh = None
+
+    def _scan(self, locked: bool = False):
+        """Lê headers novos (a partir de _end); trunca cauda inválida. `locked`: o chamador já tem o flock."""
+        fh = self._fh
+        size = os.fstat(fh.fileno()).st_size
+        pos = self._end
+        while pos + _HDR.size <= size:
+            fh.seek(pos)
+            plen, crc, hlen = _HDR.unpack(fh.read(_HDR.size))
+            total = _HDR.size + hlen + plen
+            if pos + total > size:
+                break
+            body = fh.read(hlen + plen)
+            if zlib.crc32(body) != crc:
+                break
+            h = codec.loads(body[:hlen])
+            self._index(IndexEntry((pos, total, h["p"], h["v"], h["t"], h["k"], tuple(h.get("a") or ()))))
+            pos += total
+        if pos < size:
+            # escrita interrompida: descarta o resto (sob flock, ninguém está escrevendo)
+            if not locked:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+            try:
+                if os.fstat(fh.fileno()).st_size == size:
+                    os.ftruncate(fh.fileno(), pos)  # pelo fd: o caminho pode já ser outro arquivo
+            finally:
+                if not locked:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+        self._end = pos
+
+    def _index(self, e: IndexEntry):
+        i = len(self._entries)
+        self._entries.append(e)
+        if e.kind == TOMB:
+            for j in self._by_project.pop(e.project, [])[self._counted.pop(e.project, 0):]:
+                self._dead += self._entries[j].size
+            self._dead += e.size
+            self._latest.pop(e.project, None); self._since_full.pop(e.project, None)
+            return
+        self._by_project.setdefault(e.project, []).append(i)
+        for a in e.agents:
+            self._by_agent.setdefault(a, []).append(i)
+        self._since_full[e.project] = 0 if e.kind == FULL else self._since_full.get(e.project, 0) + 1
+        self._latest.pop(e.project, None)  # estado em cache pode estar velho (outro processo)
+
+    def refresh(self):
+        with self._lock:
+            self._open()
+            self._scan()
+
+    def _read(self, e: IndexEntry) -> Any:
+        self._fh.seek(e.offset)
+        plen, _, hlen = _HDR.unpack(self._fh.read(_HDR.size))
+        self._fh.seek(e.offset + _HDR.size + hlen)
+        return codec.loads(self._fh.read(plen))
+
+    def _append(self, header: Dict[str, Any], payload: bytes) -> IndexEntry:
+        hb = codec.dumpb(header)
+        body = hb + payload
+        rec = _HDR.pack(len(payload), zlib.crc32(body), len(hb)) + body
+        fd = self._lock_log()
+        try:
+            self._scan(locked=True)  # outro processo pode ter escrito
+            os.write(fd, rec)  # "a+b": sempre no fim
+            os.fsync(fd)
+            e = IndexEntry((self._end, len(rec), header["p"], header["v"], header["t"], header["k"], tuple(header.get("a") or ())))
+            self._index(e)
+            self._end += len(rec)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        return e
+
+    # ---- API ----
+
+    def _state(self, project_id: str, upto: Optional[int] = None) -> Tuple[Optional[Dict[str, Any]], Optional[IndexEntry]]:
+        """Estado do projeto reconstruído a partir do último full <= posição `upto` (índice em _by_project)."""
+        pos = self._by_project.get(project_id) or []
+        if upto is not None:
+            pos = pos[:upto + 1]
+        if not pos:
+            return None, None
+        start = len(pos) - 1
+        while start > 0 and self._entries[pos[start]].kind != FULL:
+            start -= 1
+        state = None
+        for i in pos[start:]:
+            e = self._entries[i]
+            payload = self._read(e)
+            state = payload if e.kind == FULL else apply(state, payload)
+        return state, self._entries[pos[-1]]
+
+    def put(self, project_id: str, data: Any, timestamp: Any = None, version: int = 1,
+            metadata: Optional[Dict[str, Any]] = None, agent: Optional[str] = None) -> Dict[str, Any]:
+        """Salva um novo estado do projeto (delta contra o anterior). Devolve a entrada de índice."""
+        ts = _to_ms(timestamp)
+        state = {"data": data, "version": version, "metadata": metadata or {}}
+        with self._lock:
+            self._open(); self._scan()
+            prev = self._latest.get(project_id)
+            if prev is None and self._by_project.get(project_id):
+                prev, _ = self._state(project_id)
+            new = codec.loads(codec.dumpb(state))  # cópia profunda (e normalizada) só do cache; o chamador não a vê
+            full_b = None
+            if prev is None or self._since_full.get(project_id, 0) + 1 >= self.keyframe_every:
+                kind, payload = FULL, None
+            else:
+                ops = diff(prev, new)
+                payload = codec.dumpb(ops)
+                full_b = codec.dumpb(new)
+                kind = DELTA if len(payload) * 2 < len(full_b) else FULL
+            if kind == FULL:
+                payload = full_b or codec.dumpb(new)
+                agents = _agents_of(metadata, new.get("data"))
+            else:
+                agents = _agents_of(metadata, ops)
+            if agent:
+                agents = sorted(set(agents) | {agent})
+            e = self._append({"p": project_id, "v": version, "t": ts, "k": kind, "a": agents}, payload)
+            self._latest[project_id] = new
+            self._maybe_compact(project_id)
+            return e.to_dict()
+
+    def get(self, project_id: str, at: Any = None) -> Optional[Dict[str, Any]]:
+        """Estado atual (ou o vigente em `at`) no formato {projectId, data, timestamp, version, metadata}."""
+        with self._lock:
+            self._open(); self._scan()
+            upto = None
+            if at is not None:
+                at_ms = _to_ms(at)
+                pos = self._by_project.get(project_id) or []
+                upto = max((n for n, i in enumerate(pos) if self._entries[i].ts <= at_ms), default=-1)
+                if upto < 0:
+                    return None
+                state, e = self._state(project_id, upto)
+            else:
+                state = self._latest.get(project_id)
+                e = self._entries[self._by_project[project_id][-1]] if self._by_project.get(project_id) else None
+                if state is None and e is not None:
+                    state, e = self._state(project_id)
+                    self._latest[project_id] = state
+            if state is None or e is None:
+                return None
+            state = codec.loads(codec.dumpb(state))  # cópia: o cache é a base do próximo delta
+            return {"projectId": project_id, "data": state.get("data"), "timestamp": _iso(e.ts),
+                    "version": state.get("version"), "metadata": state.get("metadata") or {}}
+
+    def delete(self, project_id: str) -> bool:
+        with self._lock:
+            self._open(); self._scan()
+            if not self._by_project.get(project_id):
+                return False
+            self._append({"p": project_id, "v": 0, "t": _to_ms(None), "k": TOMB}, b"null")
+            return True
+
+    def projects(self) -> List[str]:
+        with self._lock:
+            self._open(); self._scan()
+            return sorted(self._by_project)
+
+    def query(self, project_id: Optional[str] = None, agent: Optional[str] = None, since: Any = None,
+              until: Any = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Entradas do índice (sem ler payloads), mais recentes primeiro."""
+        with self._lock:
+            self._open(); self._scan()
+            if project_id is not None:
+                cand = set(self._by_project.get(project_id) or ())
+                if agent is not None:
+                    cand &= set(self._by_agent.get(agent) or ())
+            elif agent is not None:
+                live = {i for v in self._by_project.values() for i in v}
+                cand = set(self._by_agent.get(agent) or ()) & live
+            else:
+                cand = {i for v in self._by_project.values() for i in v}
+            lo = _to_ms(since) if since is not None else None
+            hi = _to_ms(until) if until is not None else None
+            out = [self._entries[i] for i in sorted(cand, reverse=True)
+                   if (lo is None or self._entries[i].ts >= lo) and (hi is None or self._entries[i].ts <= hi)]
+            return [e.to_dict() for e in (out[:limit] if limit else out)]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._open(); self._scan()
+            live = [self._entries[i] for v in self._by_project.values() for i in v]
+            return {"bytes": self._end, "dead_bytes": self._dead, "records": len(self._entries),
+                    "projects": len(self._by_project), "full": sum(1 for e in live if e.kind == FULL),
+                    "delta": sum(1 for e in live if e.kind == DELTA)}
+
+    # ---- compactação ----
+
+    def _maybe_compact(self, project_id: str):
+        pos = self._by_project.get(project_id) or []
+        stale, done = len(pos) - self.max_versions, self._counted.get(project_id, 0)
+        if len(pos) > 2 * self.max_versions and stale > done:
+            # só as versões que passaram do limite desde a última conta
+            self._dead += sum(self._entries[i].size for i in pos[done:stale])
+            self._counted[project_id] = stale
+        if self._end >= self.compact_min_bytes and self._dead * 2 >= self._end:
+            self.compact()
+
+    def compact(self) -> Dict[str, int]:
+        """Reescreve o log: só projetos vivos, últimas `max_versions` versões (a primeira vira full)."""
+        with self._lock:
+            fd = self._lock_log()
+            try:
+                self._scan(locked=True)
+                before = self._end
+                tmp = self.path.with_suffix(".log.tmp")
+                with open(tmp, "wb") as out:
+                    for project_id, pos in self._by_project.items():
+                        keep = pos[-self.max_versions:]
+                        first = len(pos) - len(keep)
+                        state, e0 = self._state(project_id, first)
+                        payload = codec.dumpb(state)
+                        hb = codec.dumpb({"p": project_id, "v": e0.version, "t": e0.ts, "k": FULL, "a": list(e0.agents)})
+                        out.write(_HDR.pack(len(payload), zlib.crc32(hb + payload), len(hb)) + hb + payload)
+                        for i in keep[1:]:
+                            e = self._entries[i]
+                            self._fh.seek(e.offset)
+                            out.write(self._fh.read(e.size))  # deltas copiados sem decodificar
+                    out.flush(); os.fsync(out.fileno())
+                os.replace(tmp, self.path)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            self._fh.close(); self._fh = None
+            self._open(); self._scan()
+            return {"before": before, "after": self._end}
+
+    def close(self):
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close(); self._fh = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---- legado (formato TS) ----
+
+    def import_legacy(self, legacy_root: Optional[os.PathLike] = None) -> Dict[str, int]:
+        """
+        Importa snapshots/backups do formato TS (`projects/*.json`, `backups/<projeto>/*.json`)
+        em ordem de timestamp. Idempotente: ignora saves com timestamp <= último já no log.
+        """
+        root = Path(legacy_root).expanduser() if legacy_root else self.root
+        files: Dict[str, List[Path]] = {}
+        for fp in (root / "projects").glob("*.json"):
+            files.setdefault(fp.stem, []).append(fp)
+        backups = root / "backups"
+        if backups.is_dir():
+            for d in backups.iterdir():
+                if d.is_dir():
+                    files.setdefault(d.name, []).extend(d.glob("*.json"))
+        counts = {"imported": 0, "skipped": 0}
+        for project_id in sorted(files):
+            entries = []
+            for fp in files[project_id]:
+                try:
+                    entries.append(load_legacy_entry(fp))
+                except (OSError, ValueError, KeyError) as e:
+                    counts["skipped"] += 1
+            entries.sort(key=lambda x: _to_ms(x["timestamp"]))
+            last = self.query(project_id, limit=1)
+            last_ms = _to_ms(last[0]["timestamp"]) if last else -1
+            seen = set()
+            for ent in entries:
+                ms = _to_ms(ent["timestamp"])
+                if ms <= last_ms or ms in seen:  # snapshot atual repete o último backup
+                    counts["skipped"] += 1
+                    continue
+                seen.add(ms)
+                md = dict(ent.get("metadata") or {})
+                md.pop("compressed", None); md.pop("originalSize", None); md.pop("size", None)
+                self.put(ent.get("projectId") or project_id, ent["data"], ms, ent.get("version") or 1, md)
+                counts["imported"] += 1
+        return counts
+
+    def export_legacy(self, project_id: str, legacy_root: Optional[os.PathLike] = None) -> Optional[Path]:
+        """Grava `projects/<id>.json` no formato do lado TS (data duplamente codificado)."""
+        st = self.get(project_id)
+        if st is None:
+            return None
+        from app.agents._util import atomic_write
+        data_s = codec.dumps(st["data"])
+        md = {**st["metadata"], "size": len(data_s), "compressed": True, "originalSize": len(data_s)}
+        entry = {"id": f"{project_id}_{int(time.time() * 1000)}", "projectId": project_id, "data": data_s,
+                 "timestamp": st["timestamp"], "version": st["version"], "metadata": md}
+        fp = (Path(legacy_root).expanduser() if legacy_root else self.root) / "projects" / f"{project_id}.json"
+        fp.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(fp, codec.dumps(entry, pretty=True))
+        return fp
+
+def load_legacy_entry(fp: Path) -> Dict[str, Any]:
+    """Lê um snapshot/backup do lado TS e desfaz a dupla codificação de `data`."""
+    entry = codec.loads(Path(fp).read_bytes())
+    if (entry.get("metadata") or {}).get("compressed") and isinstance(entry.get("data"), str):
+        entry["data"] = codec.loads(entry["data"])
+    return entry
+
+def iter_records(path: os.PathLike, start: int = 0) -> Iterator[Tuple[Dict[str, Any], bytes, int]]:
+    """(header, payload bruto, offset do fim) de cada registro válido de um log, a partir de `start`."""
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        pos = start
+        while True:
+            head = fh.read(_HDR.size)
+            if len(head) < _HDR.size:
+                return
+            plen, crc, hlen = _HDR.unpack(head)
+            body = fh.read(hlen + plen)
+            if len(body) < hlen + plen or zlib.crc32(body) != crc:
+                return
+            pos += _HDR.size + hlen + plen
+            yield codec.loads(body[:hlen]), body[hlen:], pos
@@ -1,6 +1,6 @@
 # ==== Ação MCP (modelos) ====
-from typing import Optional, Dict, Any
-from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any, List
+from pydantic import BaseModel, ConfigDict, Field
 
 class MCPArgs(BaseModel):
     server: str = Field(..., description="Nome do servidor MCP conforme servers.yaml (ex.: fs-context)")
@@ -22,3 +22,25 @@ try:
         final = "final"
 except Exception:
     pass
+
+# ==== Saídas estruturadas dos agentes (schema enviado ao LLM; ver _util.structured_chat) ====
+
+class TaskOut(BaseModel):
+    model_config = ConfigDict(extra="allow")
+    id: str = Field(..., pattern=r"^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$", description="Id do ticket (vira nome de arquivo)")
+    title: str = Field(..., min_length=1)
+    owner: str = Field(..., description="Agente responsável: dev_builder | qa_tester | packager | dev_ui")
+    desc: str = ""
+    acceptance: List[str] = Field(default_factory=list)
+
+class ArchitectOut(BaseModel):
+    architecture: Dict[str, Any] = Field(..., description="Plano de arquitetura (overview, módulos, ...)")
+    tasks: List[TaskOut] = Field(default_factory=list)
+
+class FileOut(BaseModel):
+    path: str = Field(..., min_length=1, description="Caminho relativo ao base_dir")
+    content: str = ""
+
+class DevBuilderOut(BaseModel):
+    files: List[FileOut] = Field(default_factory=list, max_length=10)
+    notes: str = ""
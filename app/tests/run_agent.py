@@ -1,9 +1,15 @@
 #!/usr/bin/env python3
 import argparse, json
-from app.agents import dispatch_agent
 p = argparse.ArgumentParser()
 p.add_argument("--name", required=True)
 p.add_argument("--task", default="{}")
+p.add_argument("--daemon", action="store_true", help="executa no daemon residente (python -m app.daemon serve)")
 a = p.parse_args()
-res = dispatch_agent(a.name, json.loads(a.task))
+if a.daemon:
+    from app.daemon import DaemonClient
+    with DaemonClient() as c:
+        res = c.dispatch_agent(a.name, json.loads(a.task))
+else:
+    from app.agents import dispatch_agent
+    res = dispatch_agent(a.name, json.loads(a.task))
 print(json.dumps(res, ensure_ascii=False, indent=2))
@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 import argparse, json, sys
 from pathlib import Path
-from app.mcp import get_mcp_client
 
 def main():
     ap = argparse.ArgumentParser()
@@ -9,6 +8,7 @@ def main():
     ap.add_argument("--tool", required=True, help="ex.: readFile, fetch, query, list_files")
     ap.add_argument("--params", default="{}", help='JSON com params, ex.: {"path":"system_prompt.md"}')
     ap.add_argument("--timeout", type=int, default=30)
+    ap.add_argument("--daemon", action="store_true", help="usa o daemon residente (processos MCP já quentes)")
     args = ap.parse_args()
 
     try:
@@ -16,8 +16,13 @@ def main():
     except Exception as e:
         print(f"Params inválidos (JSON): {e}", file=sys.stderr); sys.exit(2)
 
-    client = get_mcp_client()
-    res = client.call(args.server, args.tool, params, timeout_s=args.timeout)
+    if args.daemon:
+        from app.daemon import DaemonClient
+        with DaemonClient() as c:
+            res = c.mcp_action(args.server, args.tool, params, timeout_s=args.timeout)
+    else:
+        from app.mcp import get_mcp_client
+        res = get_mcp_client().call(args.server, args.tool, params, timeout_s=args.timeout)
     print(json.dumps(res, ensure_ascii=False, indent=2))
 
 if __name__ == "__main__":
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Testes da camada de JSON (app/tools/codec.py)
+"""
+
+import json
+from app.tools import codec
+
+def test_roundtrip_and_format():
+    """dumps/loads equivalem à stdlib; pretty igual ao json.dumps(indent=2)"""
+    print(f"=== Testando codec ({codec.BACKEND}) ===")
+    obj = {"título": "ação", "n": [1, 2.5, None, True], "sub": {"a": []}}
+    assert codec.loads(codec.dumps(obj)) == obj
+    assert codec.loads(codec.dumpb(obj)) == obj
+    assert codec.loads(memoryview(codec.dumpb(obj))) == obj
+    assert "ação" in codec.dumps(obj)  # sem \uXXXX
+    assert codec.dumps(obj, pretty=True) == json.dumps(obj, ensure_ascii=False, indent=2)
+    assert codec.dumps({"b": 1, "a": 2}, sort_keys=True) == '{"a":2,"b":1}'
+    print("✅ round-trip e formatação")
+
+def test_fallbacks():
+    """O que o backend rápido não aceita cai para a stdlib"""
+    big = {"n": 2 ** 70, 1: "chave int"}
+    assert json.loads(codec.dumps(big)) == {"n": 2 ** 70, "1": "chave int"}
+    assert codec.loads('{"x": NaN}')["x"] != codec.loads('{"x": NaN}')["x"]
+    try:
+        codec.loads(b"{quebrado")
+        assert False, "deveria falhar"
+    except ValueError:
+        pass
+    print("✅ fallback para stdlib")
+
+def test_decode_response():
+    """Envelope JSON-RPC tipado"""
+    env = codec.decode_response(b'{"jsonrpc":"2.0","id":"a1","result":{"ok":1},"extra":0}')
+    assert env.id == "a1" and env.has_result and env.result == {"ok": 1} and env.error is None
+    env = codec.decode_response(b'{"jsonrpc":"2.0","id":7,"result":null}')
+    assert env.has_result and env.result is None
+    assert env.to_dict() == {"jsonrpc": "2.0", "id": 7, "result": None}
+    env = codec.decode_response(b'{"jsonrpc":"2.0","id":8,"error":{"code":-32601}}')
+    assert not env.has_result and env.error["code"] == -32601
+    assert codec.decode_response(b"Server listening") is None
+    assert codec.decode_response(b"[1,2]") is None
+    print("✅ decode_response")
+
+def main():
+    test_roundtrip_and_format()
+    test_fallbacks()
+    test_decode_response()
+    print("\n🎉 Testes do codec passaram!")
+
+if __name__ == "__main__":
+    main()
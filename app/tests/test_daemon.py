@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Testes do daemon do Aurix (app/daemon): socket Unix, dispatch_agent/mcp_action, ciclo de vida
+"""
+
+import os
+import socket
+import stat
+import tempfile
+import threading
+import time
+from pathlib import Path
+from app.bench.run import fake_servers_yaml
+from app.daemon import DaemonClient, DaemonError, daemon_available
+from app.daemon.server import AurixDaemon
+from app.tools.mcp_tool import MCPClient
+
+def test_daemon_roundtrip():
+    """Processo MCP quente entre requisições; erros viram respostas; vários clientes"""
+    print("=== Testando daemon ===")
+    with tempfile.TemporaryDirectory() as d:
+        sock = Path(d) / "run" / "aurixd.sock"
+        client = MCPClient(fake_servers_yaml(Path(d)), tools_cache=Path(d) / "tools.json")
+        daemon = AurixDaemon(sock, warmup=False, mcp_client=client)
+        t = daemon.start_in_thread()
+        try:
+            assert stat.S_IMODE(os.stat(sock).st_mode) == 0o600
+            assert daemon_available(sock)
+            with DaemonClient(sock, timeout_s=10) as c:
+                assert c.ping()["pid"] == os.getpid()
+                assert c.mcp_action("bench", "echo", {"x": 1}) == {"ok": True, "data": {"echo": {"x": 1}}}
+                pid = client._proc_map["bench"].proc.pid
+                t0 = time.perf_counter()
+                for i in range(50):
+                    assert c.mcp_action("bench", "echo", {"i": i})["data"] == {"echo": {"i": i}}
+                per_call_ms = (time.perf_counter() - t0) / 50 * 1000
+                assert client._proc_map["bench"].proc.pid == pid  # mesmo filho, sem respawn
+                assert c.dispatch_agent("nao_existe") == {"ok": False, "error": "agent 'nao_existe' não encontrado"}
+                try:
+                    c.request("metodo_x")
+                    assert False, "deveria falhar"
+                except DaemonError as e:
+                    assert "método desconhecido" in str(e)
+                try:
+                    c.request("mcp_action", server="bench")  # falta tool
+                    assert False, "deveria falhar"
+                except DaemonError as e:
+                    assert "TypeError" in str(e)
+            print(f"✅ mcp_action via daemon ({per_call_ms:.2f} ms/chamada, processo reaproveitado)")
+
+            errors = []
+            def worker(n):
+                try:
+                    with DaemonClient(sock, timeout_s=10) as c:
+                        for i in range(10):
+                            assert c.mcp_action("bench", "echo", {"n": n, "i": i})["data"]["echo"] == {"n": n, "i": i}
+                except Exception as e:
+                    errors.append(e)
+            ths = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+            for th in ths: th.start()
+            for th in ths: th.join()
+            assert not errors, errors
+            with DaemonClient(sock) as c:
+                st = c.stats()
+                assert st["requests"]["mcp_action"] >= 91 and st["mcp_client"]
+            print("✅ clientes concorrentes")
+
+            with DaemonClient(sock) as c:
+                assert c.shutdown() == {"stopping": True}
+            t.join(5)
+            assert not t.is_alive() and not sock.exists()
+            print("✅ shutdown remove o socket")
+        finally:
+            daemon.stop(); client.close()
+
+def test_stale_socket_and_second_instance():
+    """Socket órfão é substituído; segundo daemon no mesmo socket recusa"""
+    print("\n=== Testando socket órfão ===")
+    with tempfile.TemporaryDirectory() as d:
+        sock = Path(d) / "aurixd.sock"
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.bind(str(sock)); s.close()  # sobra de um daemon morto
+        assert not daemon_available(sock)
+        daemon = AurixDaemon(sock, warmup=False)
+        t = daemon.start_in_thread()
+        try:
+            try:
+                AurixDaemon(sock, warmup=False).bind()
+                assert False, "deveria recusar"
+            except RuntimeError:
+                pass
+            assert daemon_available(sock)
+        finally:
+            daemon.stop(); t.join(5)
+        print("✅ órfão substituído, duplicata recusada")
+
+def main():
+    test_daemon_roundtrip()
+    test_stale_socket_and_second_instance()
+    print("\n🎉 Testes do daemon passaram!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Testes do caminho de startup dos agentes: nada de filesystem no import, dependências pesadas sob demanda
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parents[2]
+HEAVY = ("yaml", "openai", "pydantic", "psutil", "concurrent.futures")
+
+def _files(root: Path):
+    return sorted(str(p.relative_to(root)) for p in root.rglob("*"))
+
+def test_imports_do_no_filesystem_work():
+    """Importar todos os agentes + cliente MCP com HOME/workspace vazios não cria nada"""
+    print("=== Testando imports sem efeitos colaterais ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        home, ws = Path(tmp) / "home", Path(tmp) / "ws"
+        home.mkdir(); ws.mkdir()
+        code = ("import sys, importlib, logging\n"
+                "from app.agents import _REGISTRY\n"
+                "for spec in _REGISTRY.values(): importlib.import_module(spec.split(':')[0])\n"
+                "import app.tools.mcp_tool, app.memory\n"
+                f"print(','.join(m for m in {HEAVY!r} if m in sys.modules))\n"
+                "print(len(logging.getLogger().handlers))\n")
+        env = {**os.environ, "HOME": str(home), "AURIX_WORKSPACE": str(ws), "PYTHONPATH": str(REPO)}
+        env.pop("AURIX_TRACE", None); env.pop("AURIX_TRACE_FILE", None)
+        r = subprocess.run([sys.executable, "-c", code], cwd=str(ws), env=env, capture_output=True, text=True)
+        assert r.returncode == 0, r.stderr
+        heavy, root_handlers = r.stdout.split()
+        assert _files(home) == [] and _files(ws) == [], (_files(home), _files(ws))
+        print("✅ nenhum arquivo/diretório criado no import")
+        assert heavy == "" or set(heavy.split(",")) <= {"concurrent.futures"}, heavy
+        assert root_handlers == "0"  # logging global intocado
+        print("✅ yaml/openai/pydantic/psutil não carregados; logging root intocado")
+
+def test_import_profile_cli():
+    """python -m app.agents --import-profile qa_tester"""
+    print("\n=== Testando --import-profile ===")
+    from app.agents.__main__ import profile_agent
+    res = profile_agent("qa_tester")
+    assert res["total_ms"] > 0 and res["modules"] > 0 and res["third_party"] == [], res.get("third_party")
+    assert any(row["module"] == "app.agents.qa_tester" for row in res["rows"])
+    assert not any(row["module"] in ("app.tools.codec", "app.agents._util") for row in res["rows"])
+    print(f"✅ qa_tester: {res['total_ms']} ms, {res['modules']} módulos")
+
+def main():
+    test_imports_do_no_filesystem_work()
+    test_import_profile_cli()
+    print("\n🎉 Testes de startup passaram!")
+
+if __name__ == "__main__":
+    main()
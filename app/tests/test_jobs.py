@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Testes da fila de jobs durável (app/tools/jobqueue) e do pipeline retomável do Architect
+"""
+
+import os
+import json
+import tempfile
+import threading
+import time
+from pathlib import Path
+from app.tools.jobqueue import JobQueue, run_jobs, job_id
+
+def test_queue_basics():
+    """Dependências, reaproveitamento por hash de entrada, retentativa e órfãos"""
+    print("=== Testando JobQueue ===")
+    with tempfile.TemporaryDirectory() as d:
+        q = JobQueue(Path(d) / "jobs.sqlite")
+        a = q.submit("r", "a", input={"x": 1})
+        b = q.submit("r", "b", input={"y": 2}, deps=[a])
+        assert q.claim("r", "w")["id"] == a
+        assert q.claim("r", "w") is None  # b espera a
+        q.complete(a, {"ok": 1})
+        assert q.claim("r", "w")["id"] == b
+        q.fail(b, "boom")
+        assert q.get(b)["status"] == "pending" and q.get(b)["attempts"] == 1
+        # mesma entrada: mantém saída; entrada nova: volta a pending
+        assert q.submit("r", "a", input={"x": 1}) == a and q.get(a)["status"] == "done"
+        q.submit("r", "a", input={"x": 2})
+        assert q.get(a)["status"] == "pending" and q.get(a)["input"] == {"x": 2}
+        # job "running" de um processo morto volta para a fila
+        job = q.claim("r", "host:1:0")
+        q._db().execute("UPDATE jobs SET worker = ? WHERE id = ?", (f"{os.uname().nodename}:999999999:0", job["id"]))
+        assert q.requeue_orphans("r") == 1 and q.get(job["id"])["status"] == "pending"
+        # outro host: só o lease vencido libera o job
+        job = q.claim("r", "host:1:0")
+        q._db().execute("UPDATE jobs SET worker = 'outro-host:1:0', lease_until = ? WHERE id = ?", (time.time() + 60, job["id"]))
+        assert q.requeue_orphans("r") == 0
+        q._db().execute("UPDATE jobs SET lease_until = 0 WHERE id = ?", (job["id"],))
+        assert q.requeue_orphans("r") == 1
+        q.discard("r", "b")
+        assert q.get(b) is None and q.summary("r")["pending"] == 1
+        q.close()
+        print("✅ dependências, hash de entrada, retentativa e órfãos")
+
+def test_run_jobs_concurrent():
+    """Workers consomem em paralelo; filhos criados por handlers entram na mesma execução"""
+    print("\n=== Testando run_jobs ===")
+    with tempfile.TemporaryDirectory() as d:
+        q = JobQueue(Path(d) / "jobs.sqlite")
+        seen, lock = [], threading.Lock()
+        def root(ctx):
+            ids = [ctx.submit("leaf", str(i), input=i) for i in range(12)]
+            ctx.submit("sum", input=None, deps=ids)
+            return "ok"
+        def leaf(ctx):
+            with lock:
+                seen.append(threading.current_thread().name)
+            return ctx.input * 2
+        def total(ctx):
+            return sum(ctx.dep_output("leaf", str(i)) for i in range(12))
+        q.submit("r", "root")
+        st = run_jobs(q, "r", {"root": root, "leaf": leaf, "sum": total}, workers=4)
+        assert st == {"pending": 0, "running": 0, "done": 14, "failed": 0}, st
+        assert q.output(job_id("r", "sum")) == 132 and len(seen) == 12
+        q.close()
+        print(f"✅ 14 jobs, {len(set(seen))} workers")
+
+def test_lease_heartbeat():
+    """Job mais longo que o lease: o heartbeat renova e uma retomada concorrente não o duplica"""
+    print("\n=== Testando heartbeat do lease ===")
+    with tempfile.TemporaryDirectory() as d:
+        q = JobQueue(Path(d) / "jobs.sqlite", lease_s=0.3)
+        runs, requeued = [], []
+        def slow(ctx):
+            runs.append(1)
+            other = JobQueue(q.path, lease_s=0.3)  # "outro processo" tentando retomar o run
+            for _ in range(4):
+                time.sleep(0.25)
+                requeued.append(other.requeue_orphans("r"))
+                lease = other._db().execute("SELECT lease_until FROM jobs WHERE id = ?", (ctx.job["id"],)).fetchone()[0]
+                assert lease > time.time(), "lease deveria estar renovado"
+            other.close()
+            return "ok"
+        q.submit("r", "slow")
+        st = run_jobs(q, "r", {"slow": slow}, workers=2)
+        assert st["done"] == 1 and runs == [1] and requeued == [0, 0, 0, 0], (st, runs, requeued)
+        q.close()
+        print("✅ lease renovado, sem reexecução")
+
+def test_architect_resume():
+    """Crash no meio dos tickets: a nova execução não chama o LLM de novo nem refaz tickets prontos"""
+    print("\n=== Testando retomada do pipeline do Architect ===")
+    import app.agents.architect as arch
+    import app.agents as agents
+    from app.agents import _util
+    with tempfile.TemporaryDirectory() as home:
+        ctx = Path(home) / "aurix-context" / "agents"
+        ctx.mkdir(parents=True)
+        (ctx / "architect.md").write_text("Você é o architect.", encoding="utf-8")
+        (Path(home) / "aurix" / "docs_aurix").mkdir(parents=True)
+        (Path(home) / "aurix" / "docs_aurix" / "vision.md").write_text("Visão do produto.", encoding="utf-8")
+        tasks = [{"id": f"AURIX-{i:04d}", "title": f"T{i}", "owner": "dev_builder"} for i in range(6)]
+        tasks.append({"id": "AURIX-PKG", "title": "pacote", "owner": "packager"})
+        llm_calls, built, crash = [], [], {"at": "AURIX-0003"}
+        def fake_llm(system, user, max_tokens=None, schema=None, race=None):
+            llm_calls.append(user)
+            return json.dumps({"architecture": {"overview": "x"}, "tasks": tasks})
+        def fake_dispatch(name, task):
+            if name == "dev_builder":
+                tid = Path(task["ticket_path"]).stem
+                if tid == crash["at"]:
+                    raise RuntimeError("processo caiu")
+                built.append(tid)
+            return {"ok": True, "agent": name}
+        old = (os.environ.get("HOME"), os.environ.get("AURIX_JOBS_DB"), _util.hybrid_ai_chat_with_offline, agents.dispatch_agent)
+        os.environ["HOME"] = home
+        os.environ.pop("AURIX_JOBS_DB", None)
+        _util.hybrid_ai_chat_with_offline, agents.dispatch_agent = fake_llm, fake_dispatch
+        try:
+            r1 = arch.run({"scrape": False, "workers": 1})
+            assert not r1["ok"] and r1["jobs"]["failed"] == 1 and len(llm_calls) == 1, r1["jobs"]
+            assert r1["results"]["qa"] is None and len(built) == 5  # 0003 falhou, qa/package bloqueados
+            crash["at"] = None
+            done_before = list(built)
+            r2 = arch.run({"scrape": False, "workers": 3})
+            assert r2["ok"] and len(llm_calls) == 1, r2["jobs"]  # plano reaproveitado
+            assert built[len(done_before):] == ["AURIX-0003"]  # só o ticket que faltava
+            assert r2["results"]["qa"]["ok"] and r2["results"]["packager"]["ok"]
+            assert [x["id"] for x in r2["results"]["dev"]] == [t["id"] for t in tasks[:6]]
+            assert Path(r2["plan"]).exists() and len(r2["tasks"]) == 7
+            q = JobQueue()
+            deps = {r[0] for r in q._db().execute("SELECT dep_id FROM deps WHERE job_id = ?", (job_id("architect", "plan"),))}
+            assert deps == {job_id("architect", "gather"), job_id("architect", "research")}, deps
+            q.close()
+            # run concluído: próxima chamada recomeça (novo plano)
+            arch.run({"scrape": False})
+            assert len(llm_calls) == 2
+        finally:
+            if old[0] is None: os.environ.pop("HOME", None)
+            else: os.environ["HOME"] = old[0]
+            if old[1] is not None: os.environ["AURIX_JOBS_DB"] = old[1]
+            _util.hybrid_ai_chat_with_offline, agents.dispatch_agent = old[2], old[3]
+        print(f"✅ retomada: 1 chamada ao LLM, {len(built)} builds")
+
+def test_research_output_capped():
+    """Páginas enormes: a saída do job guarda até a janela, o arquivo de pesquisa guarda tudo"""
+    print("\n=== Testando corte das páginas do research ===")
+    import app.agents.architect as arch
+    from app.agents._prompt import TRIM_MARK, count_tokens
+    from app.tools import codec
+    big = "palavra " * 20000
+    with tempfile.TemporaryDirectory() as home:
+        old = (os.environ.get("HOME"), os.environ.get("AURIX_NUM_CTX"), arch._fetch_web)
+        os.environ["HOME"], os.environ["AURIX_NUM_CTX"] = home, "2048"
+        arch._fetch_web = lambda urls: [{"url": u, "text": big} for u in urls]
+        try:
+            ctx = type("Ctx", (), {"input": {"urls": ["https://a", "https://b"]}})()
+            out = arch._job_research(ctx)
+            assert all(p["text"].endswith(TRIM_MARK) and count_tokens(p["text"]) <= 2048 for p in out["pages"])
+            assert codec.loads(Path(out["saved"][0]).read_bytes())["text"] == big
+        finally:
+            if old[0] is None: os.environ.pop("HOME", None)
+            else: os.environ["HOME"] = old[0]
+            if old[1] is None: os.environ.pop("AURIX_NUM_CTX", None)
+            else: os.environ["AURIX_NUM_CTX"] = old[1]
+            arch._fetch_web = old[2]
+    print("✅ saída do job limitada à janela")
+
+def main():
+    test_queue_basics()
+    test_run_jobs_concurrent()
+    test_lease_heartbeat()
+    test_architect_resume()
+    test_research_output_capped()
+    print("\n🎉 Testes da fila de jobs passaram!")
+
+if __name__ == "__main__":
+    main()
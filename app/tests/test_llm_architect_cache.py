@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Testes do llm_architect: modo endereçado por conteúdo (cache por hash de spec + XMLs) e run_many
+"""
+
+import os
+import json
+import shutil
+import tempfile
+from pathlib import Path
+from app.agents import llm_architect as la
+
+REPO = Path(__file__).resolve().parents[2]
+
+def _setup(d: Path):
+    shutil.copy(REPO / "context" / "llm_automation_standards.xml", d / "stds.xml")
+    shutil.copy(REPO / "context" / "llm_references.xml", d / "refs.xml")
+    old = (la.STDS, la.REFS, la.DOCS)
+    la.STDS, la.REFS, la.DOCS = d / "stds.xml", d / "refs.xml", d / "backlog"
+    return old
+
+def _mtimes(base: Path):
+    return {p: p.stat().st_mtime_ns for p in base.rglob("*") if p.is_file()}
+
+def test_spec_hash_short_circuit():
+    """Mesmas entradas: nenhum write; refs alteradas: só PLAN.json e REFERENCES.txt"""
+    print("=== Testando cache do llm_architect ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        d = Path(tmp)
+        old = _setup(d)
+        try:
+            spec = {"goal": "RAG de docs", "agents": ["ingestor"], "project_path": str(d / "proj")}
+            r1 = la.run(spec)
+            assert not r1["cached"] and len(r1["written"]) == 4, r1["written"]
+            before = _mtimes(d)
+
+            r2 = la.run(spec)
+            assert r2["cached"] and r2["written"] == [] and r2["artifact_dir"] == r1["artifact_dir"]
+            assert r2["plan_meta"]["id"] == r1["plan_meta"]["id"]
+            assert _mtimes(d) == before
+            print("✅ entradas iguais: plano do cache, zero writes")
+
+            with open(la.REFS, "a", encoding="utf-8") as f:
+                f.write("\n<!-- nova fonte -->\n")
+            os.utime(la.REFS, ns=(1, 1))
+            r3 = la.run(spec)
+            names = sorted(Path(p).name for p in r3["written"])
+            assert not r3["cached"] and names == ["PLAN.json"], names  # sources iguais, só o hash mudou
+            assert r3["plan_meta"]["id"] == r1["plan_meta"]["id"]
+            assert la.run(spec)["cached"]
+
+            la.REFS.write_text("<r><sources><link>https://x</link></sources></r>", encoding="utf-8")
+            names = sorted(Path(p).name for p in la.run(spec)["written"])
+            assert names == ["PLAN.json", "REFERENCES.txt"], names
+            print("✅ entradas alteradas: só artefatos afetados")
+
+            (Path(r1["artifact_dir"]) / "TICKETS.md").unlink()
+            r5 = la.run(spec)
+            assert not r5["cached"] and [Path(p).name for p in r5["written"]] == ["TICKETS.md"]
+            assert not la.run(spec, force=True)["cached"]
+            print("✅ artefato ausente e force regeneram")
+        finally:
+            la.STDS, la.REFS, la.DOCS = old
+
+def test_run_many():
+    """Lote: resultados na ordem, duplicados rodam uma vez, INDEX.json com todos os planos"""
+    print("\n=== Testando run_many ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        d = Path(tmp)
+        old = _setup(d)
+        try:
+            specs = [{"goal": f"cliente {i % 5}", "project_path": str(d / f"p{i % 5}")} for i in range(12)] + ["x"]
+            out = la.run_many(specs, max_workers=4)
+            assert out["count"] == 13 and out["errors"] == 1 and out["status"] == "partial"
+            assert out["generated"] == 5 and out["cached"] == 0, out  # duplicados compartilham a execução
+            assert [r.get("goal") for r in out["results"][:6]] == ["cliente 0", "cliente 1", "cliente 2", "cliente 3", "cliente 4", "cliente 0"]
+            idx = json.loads(Path(out["index"]).read_text(encoding="utf-8"))
+            assert idx["count"] == 5 and all(p["tickets"] == 8 for p in idx["plans"])
+
+            again = la.run_many(specs[:5])
+            assert again["cached"] == 5 and again["generated"] == 0
+            assert json.loads(Path(again["index"]).read_text(encoding="utf-8"))["count"] == 5
+            print("✅ run_many (ordem, dedupe, índice, cache)")
+        finally:
+            la.STDS, la.REFS, la.DOCS = old
+
+def main():
+    test_spec_hash_short_circuit()
+    test_run_many()
+    print("\n🎉 Testes do cache do llm_architect passaram!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Testes do MCPClient contra o servidor MCP falso (app/bench/fake_mcp_server.py)
+"""
+
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from app.bench.run import fake_servers_yaml
+from app.tools.mcp_tool import MCPClient
+
+def _client(d: str, **cfg) -> MCPClient:
+    return MCPClient(fake_servers_yaml(Path(d), **cfg), tools_cache=Path(d) / "tools.json")
+
+def test_call_roundtrip():
+    """Chamada simples com handshake e cache de tools"""
+    print("=== Testando round-trip ===")
+    with tempfile.TemporaryDirectory() as d:
+        client = _client(d)
+        try:
+            res = client.call("bench", "echo", {"x": 1}, timeout_s=10)
+            assert res == {"ok": True, "data": {"echo": {"x": 1}}}
+            assert {"echo", "blob", "sleep"} <= {t["name"] for t in client._tool_cache["bench"]}
+            print("✅ echo ok")
+        finally:
+            client.close()
+
+def test_warmup_and_replicas():
+    """warmup pré-inicia réplicas; chamadas concorrentes usam réplicas distintas"""
+    print("\n=== Testando warmup + réplicas ===")
+    with tempfile.TemporaryDirectory() as d:
+        client = _client(d, replicas=3)
+        try:
+            assert client.warmup() == {"bench": "ok"}
+            pool = client._pools["bench"]
+            assert len(pool) == 3 and all(p.alive() and p.ready.is_set() for p in pool)
+            print("✅ 3 réplicas prontas")
+
+            io_threads = [t.name for t in threading.enumerate() if t.name.startswith("mcp-")]
+            assert io_threads.count("mcp-io") == 1 and not [n for n in io_threads if n.endswith(("-stdout", "-stderr"))]
+            print("✅ uma thread de I/O para todas as réplicas")
+
+            results = []
+            def _sleep():
+                results.append(client.call("bench", "sleep", {"ms": 300}, timeout_s=10))
+            t0 = time.perf_counter()
+            threads = [threading.Thread(target=_sleep) for _ in range(3)]
+            for t in threads: t.start()
+            for t in threads: t.join()
+            elapsed = time.perf_counter() - t0
+            assert all(r["ok"] for r in results)
+            assert elapsed < 0.8, elapsed  # serial seria >= 0.9s
+            print(f"✅ 3 chamadas de 300ms em {elapsed:.2f}s")
+        finally:
+            client.close()
+
+def test_restart_after_crash():
+    """Processo morto é detectado na hora e reiniciado (com handshake) na chamada seguinte"""
+    print("\n=== Testando restart após crash ===")
+    with tempfile.TemporaryDirectory() as d:
+        client = _client(d)
+        try:
+            assert client.call("bench", "echo", {}, timeout_s=10)["ok"]
+            first = client._proc_map["bench"]
+            t0 = time.perf_counter()
+            res = client.call("bench", "crash", {}, timeout_s=10)
+            assert not res["ok"]
+            assert time.perf_counter() - t0 < 5  # não espera o timeout inteiro
+            print("✅ morte detectada sem esperar timeout")
+
+            res = client.call("bench", "echo", {"y": 2}, timeout_s=10)
+            assert res["ok"], res
+            assert client._proc_map["bench"] is not first
+            print("✅ reiniciado na chamada seguinte")
+        finally:
+            client.close()
+
+def test_circuit_breaker():
+    """Timeouts seguidos abrem o circuito; chamadas falham rápido"""
+    print("\n=== Testando circuit breaker ===")
+    with tempfile.TemporaryDirectory() as d:
+        client = _client(d, max_failures=2)
+        try:
+            for _ in range(2):
+                res = client.call("bench", "sleep", {"ms": 1500}, timeout_s=1)
+                assert not res["ok"] and "timeout" in res["error"]
+            t0 = time.perf_counter()
+            res = client.call("bench", "echo", {}, timeout_s=10)
+            assert not res["ok"] and "circuit" in res["error"]
+            assert time.perf_counter() - t0 < 0.1
+            print("✅ circuito aberto, falha imediata")
+
+            time.sleep(client.breaker("bench").retry_in() + 0.6)
+            res = client.call("bench", "echo", {}, timeout_s=10)
+            assert res["ok"], res
+            print("✅ circuito fecha após backoff")
+        finally:
+            client.close()
+
+def test_death_counted_once():
+    """Processo morto antes do envio e restart barrado pelo circuito: uma morte só no breaker"""
+    print("\n=== Testando contagem de mortes ===")
+    from app.tools.mcp_tool import CircuitOpenError, MCPProcessDied
+    with tempfile.TemporaryDirectory() as d:
+        client = _client(d)
+        try:
+            proc = client.ensure_started("bench")
+            def dead(*a, **kw):
+                raise MCPProcessDied("morreu", sent=False)
+            def closed(name):
+                raise CircuitOpenError(f"{name}: processo morto")
+            client._send_and_wait, client.ensure_started = dead, closed
+            res = client._call_once("bench", "echo", {}, 5, proc)
+            assert not res["ok"] and "retryable" not in res and client.breaker("bench").deaths == 1, res
+            print("✅ 1 morte registrada")
+        finally:
+            client.close()
+
+def test_tool_schema_cache_and_validation():
+    """tools/list persistido em disco; argumentos inválidos falham sem round-trip"""
+    print("\n=== Testando cache de schemas + validação ===")
+    with tempfile.TemporaryDirectory() as d:
+        client = _client(d)
+        try:
+            assert client.call("bench", "echo", {}, timeout_s=10)["ok"]
+            assert (Path(d) / "tools.json").exists()
+        finally:
+            client.close()
+
+        # replace falha (destino é um diretório): nenhum .tmp_ fica para trás
+        from app.tools.mcp_tool import ToolSchemaCache
+        (Path(d) / "ro").mkdir()
+        (Path(d) / "ro" / "tools.json").mkdir()
+        ToolSchemaCache(Path(d) / "ro" / "tools.json").put(["x"], None, [])
+        assert os.listdir(Path(d) / "ro") == ["tools.json"]
+
+        client = _client(d)
+        sent = []
+        real = client._list_tools
+        client._list_tools = lambda *a, **kw: sent.append(1) or real(*a, **kw)
+        try:
+            assert client.call("bench", "echo", {}, timeout_s=10)["ok"]
+            assert not sent  # veio do cache em disco
+            print("✅ tools/list evitado no segundo processo")
+
+            t0 = time.perf_counter()
+            res = client.call("bench", "sleep", {"ms": "muito"}, timeout_s=10)
+            assert not res["ok"] and "parâmetros inválidos" in res["error"]
+            assert time.perf_counter() - t0 < 0.05
+            res = client.call("bench", "blob", {}, timeout_s=10)
+            assert not res["ok"] and "'size'" in res["error"]
+            print("✅ validação client-side")
+        finally:
+            client.close()
+
+def test_large_payloads_and_stderr():
+    """Respostas de vários MB chegam inteiras; acima do limite falham rápido; stderr não trava"""
+    print("\n=== Testando enquadramento de payloads grandes ===")
+    from app.tools import metrics
+    with tempfile.TemporaryDirectory() as d:
+        client = _client(d, max_message_bytes=4 * 1024 * 1024, blob=False)
+        try:
+            size = 3 * 1024 * 1024
+            res = client.call("bench", "blob", {"size": size}, timeout_s=10)
+            assert res["ok"] and len(res["data"]["data"]) == size
+            print("✅ 3 MiB recebidos inteiros")
+
+            before = metrics.MCP_OVERSIZE.value(server="bench")
+            t0 = time.perf_counter()
+            res = client.call("bench", "blob", {"size": 5 * 1024 * 1024}, timeout_s=10)
+            assert not res["ok"] and "max_message_bytes" in res["error"]
+            assert time.perf_counter() - t0 < 5
+            assert metrics.MCP_OVERSIZE.value(server="bench") == before + 1
+            assert client.call("bench", "echo", {"z": 3}, timeout_s=10)["ok"]
+            print("✅ mensagem grande demais rejeitada sem esperar timeout")
+
+            res = client.call("bench", "noise", {"lines": 5000}, timeout_s=10)
+            assert res["ok"], res
+            proc = client._proc_map["bench"]
+            deadline = time.time() + 5
+            while (not proc.stderr_tail or proc.stderr_tail[-1] != "ruido 4999") and time.time() < deadline:
+                time.sleep(0.05)
+            assert len(proc.stderr_tail) == proc.stderr_tail.maxlen
+            assert proc.stderr_tail[-1] == "ruido 4999"
+            print("✅ stderr em ring buffer")
+        finally:
+            client.close()
+
+def test_blob_side_channel():
+    """Resultados grandes chegam por arquivo mapeado (negociado no initialize)"""
+    print("\n=== Testando canal lateral de blobs ===")
+    from app.tools import metrics
+    with tempfile.TemporaryDirectory() as d, tempfile.TemporaryDirectory() as blobs:
+        os.environ["AURIX_BLOB_DIR"] = blobs
+        client = _client(d, blob_min_bytes=64 * 1024, max_message_bytes=1024 * 1024)
+        try:
+            before = metrics.MCP_BLOB_BYTES.value(server="bench")
+            res = client.call("bench", "blob", {"size": 8 * 1024 * 1024}, timeout_s=10)
+            assert res["ok"] and len(res["data"]["data"]) == 8 * 1024 * 1024
+            assert metrics.MCP_BLOB_BYTES.value(server="bench") > before
+            print("✅ 8 MiB via mmap (acima do max_message_bytes do stdout)")
+
+            res = client.call("bench", "blob", {"size": 1000, "binary": True}, timeout_s=10)
+            assert res["ok"] and bytes(res["data"]) == b"x" * 1000
+            assert client.call("bench", "blob", {"size": 10}, timeout_s=10)["data"] == {"data": "x" * 10}
+            assert not [f for _, _, fs in os.walk(blobs) for f in fs]  # consumidos e removidos
+            print("✅ binário zero-copy; pequenos seguem inline")
+
+            # resposta atrasada (timeout) com blob: descartada sem deixar o arquivo para trás
+            res = client.call("bench", "blob", {"size": 256 * 1024, "ms": 600}, timeout_s=0.2)
+            assert not res["ok"] and "timeout" in res["error"], res
+            time.sleep(0.8)
+            assert [f for _, _, fs in os.walk(blobs) for f in fs]  # o blob da resposta perdida já existe
+            assert client.call("bench", "echo", {"x": 1}, timeout_s=10)["ok"]
+            assert not [f for _, _, fs in os.walk(blobs) for f in fs]
+            print("✅ blob de resposta atrasada removido")
+
+            # sobras no diretório do processo somem no stop
+            proc = client.ensure_started("bench")
+            open(os.path.join(proc.blob_dir, "aurix-blob-sobra"), "wb").close()
+        finally:
+            client.close()
+            os.environ.pop("AURIX_BLOB_DIR", None)
+        assert not os.listdir(blobs)
+        print("✅ diretório de blobs removido no stop")
+
+def test_single_flight_and_result_cache():
+    """Chamadas idênticas concorrentes viram uma requisição; tools idempotentes ficam em cache"""
+    print("\n=== Testando single-flight + cache de resultados ===")
+    from app.tools import metrics
+    with tempfile.TemporaryDirectory() as d:
+        yaml_path = fake_servers_yaml(Path(d), latency_ms=300, dedupe=True, idempotent=["sleep"], cache_ttl_s=1)
+        client = MCPClient(yaml_path, tools_cache=Path(d) / "tools.json")
+        try:
+            before = metrics.MCP_DEDUPED.value(server="bench", tool="echo")
+            results = []
+            def _echo():
+                results.append(client.call("bench", "echo", {"b": 2, "a": [1]}, timeout_s=10))
+            client.ensure_started("bench")
+            threads = [threading.Thread(target=_echo) for _ in range(8)]
+            for t in threads: t.start()
+            for t in threads: t.join()
+            assert len(results) == 8 and all(r == results[0] and r["ok"] for r in results)
+            assert metrics.MCP_DEDUPED.value(server="bench", tool="echo") - before == 7
+            print("✅ 8 chamadas concorrentes, 1 requisição")
+
+            assert client.call("bench", "sleep", {"ms": 300}, timeout_s=10)["ok"]
+            t0 = time.perf_counter()
+            assert client.call("bench", "sleep", {"ms": 300}, timeout_s=10)["ok"]
+            assert time.perf_counter() - t0 < 0.1
+            print("✅ resultado idempotente servido do cache")
+
+            assert client.call("bench", "echo", {}, timeout_s=10)["ok"]  # tool não idempotente invalida
+            t0 = time.perf_counter()
+            assert client.call("bench", "sleep", {"ms": 300}, timeout_s=10)["ok"]
+            assert time.perf_counter() - t0 >= 0.3
+            print("✅ cache invalidado por tool com efeito colateral")
+        finally:
+            client.close()
+
+def test_call_batch():
+    """call_batch manda um array JSON-RPC; membros rodam em paralelo no servidor; fallback sem batch"""
+    print("\n=== Testando call_batch ===")
+    calls = [("echo", {"i": i}) for i in range(20)] + [{"tool": "sleep", "params": {"ms": "x"}}]
+    with tempfile.TemporaryDirectory() as d:
+        client = _client(d)
+        try:
+            res = client.call_batch("bench", calls, timeout_s=10)
+            assert [r["data"]["echo"]["i"] for r in res[:20]] == list(range(20))
+            assert not res[20]["ok"] and "parâmetros inválidos" in res[20]["error"]
+            assert client._proc_map["bench"].batch
+            print("✅ 20 chamadas em um batch, ordem preservada")
+
+            t0 = time.perf_counter()
+            res = client.call_batch("bench", [("sleep", {"ms": 200})] * 5, timeout_s=10)
+            assert all(r["ok"] for r in res)
+            assert time.perf_counter() - t0 < 0.6
+            print("✅ membros executados em paralelo")
+        finally:
+            client.close()
+
+    with tempfile.TemporaryDirectory() as d:
+        client = _client(d, server_args=["--no-batch"])
+        try:
+            res = client.call_batch("bench", calls[:5], timeout_s=10)
+            assert [r["data"]["echo"]["i"] for r in res] == list(range(5))
+            assert not client._proc_map["bench"].batch
+            print("✅ fallback uma a uma sem aurix/batch")
+        finally:
+            client.close()
+
+def test_policy_retries_and_hedge():
+    """Política por servidor/tool: retry com backoff para idempotentes e hedge em outra réplica"""
+    print("\n=== Testando política: timeouts, retries, hedge ===")
+    from app.tools import metrics
+    with tempfile.TemporaryDirectory() as d:
+        client = _client(d, idempotent=["flaky"], retries=2, retry_backoff_s=0.05, timeout_s=7,
+                         tools={"flaky": {"timeout_s": 5}, "echo": {"retries": 5}})
+        try:
+            assert client.policy("bench", "flaky")["timeout_s"] == 5
+            assert client.policy("bench", "echo")["timeout_s"] == 7
+            assert client.policy("bench")["initialize_timeout_s"] == 10
+            before = metrics.MCP_RETRIES.value(server="bench", tool="flaky")
+            res = client.call("bench", "flaky", {"path": str(Path(d) / "n1"), "fail": 1})
+            assert res["ok"] and res["data"]["attempt"] == 2, res
+            assert metrics.MCP_RETRIES.value(server="bench", tool="flaky") == before + 1
+            print("✅ processo morto na 1ª tentativa, retry ok")
+
+            before = metrics.MCP_RETRIES.value(server="bench", tool="crash")
+            res = client.call("bench", "crash", {})
+            assert not res["ok"] and "retryable" not in res, res
+            assert metrics.MCP_RETRIES.value(server="bench", tool="crash") == before  # não idempotente: sem retry
+            print("✅ tool não idempotente não repete")
+        finally:
+            client.close()
+
+    with tempfile.TemporaryDirectory() as d:
+        client = _client(d, replicas=2, idempotent=["flaky"], hedge=True, hedge_after_s=0.1)
+        try:
+            client.warmup()
+            won = metrics.MCP_HEDGES.value(server="bench", tool="flaky", result="won")
+            t0 = time.perf_counter()
+            res = client.call("bench", "flaky", {"path": str(Path(d) / "n2"), "fail": 1, "ms": 1500}, timeout_s=5)
+            elapsed = time.perf_counter() - t0
+            assert res["ok"] and res["data"]["attempt"] == 2, res
+            assert elapsed < 1.0, elapsed
+            assert metrics.MCP_HEDGES.value(server="bench", tool="flaky", result="won") == won + 1
+            print(f"✅ hedge respondeu em {elapsed:.2f}s (primária dormindo 1.5s)")
+        finally:
+            client.close()
+
+def test_timeout_reaches_server():
+    """timeout_s da política vai para a tool que o declara: o servidor solta a chamada antes do cliente"""
+    print("\n=== Testando timeout repassado ao servidor ===")
+    import sys, yaml
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    class Slow(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/slow":
+                time.sleep(3)
+            self.send_response(200); self.end_headers(); self.wfile.write(b"ok")
+        def log_message(self, *a):
+            pass
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Slow)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{srv.server_address[1]}"
+    with tempfile.TemporaryDirectory() as d:
+        script = str(Path(__file__).resolve().parents[1] / "mcp" / "http_server.py")
+        cfg = {"servers": {"http": {"command": [sys.executable, script], "idempotent": ["get"], "tools": {"get": {"timeout_s": 1.5}}}}}
+        (Path(d) / "servers.yaml").write_text(yaml.safe_dump(cfg), encoding="utf-8")
+        client = MCPClient(Path(d) / "servers.yaml", tools_cache=Path(d) / "tools.json")
+        try:
+            client.warmup()
+            res = client.call("http", "get", {"url": base + "/slow"})
+            assert res["ok"] and "timed out" in str(res["data"].get("error")), res  # o servidor desistiu (1.35s)
+            t0 = time.perf_counter()
+            res = client.call("http", "get", {"url": base + "/fast"})
+            assert res["ok"] and res["data"]["content"] == "ok" and time.perf_counter() - t0 < 1.0, res
+            print("✅ servidor livre para a próxima chamada")
+        finally:
+            client.close()
+            srv.shutdown()
+
+def main():
+    test_call_roundtrip()
+    test_warmup_and_replicas()
+    test_restart_after_crash()
+    test_circuit_breaker()
+    test_death_counted_once()
+    test_tool_schema_cache_and_validation()
+    test_large_payloads_and_stderr()
+    test_blob_side_channel()
+    test_single_flight_and_result_cache()
+    test_call_batch()
+    test_policy_retries_and_hedge()
+    test_timeout_reaches_server()
+    print("\n🎉 Testes do MCPClient passaram!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Testes do store do aurix_memory (app/memory): log append-only, deltas, índice, compactação e legado
+"""
+
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from app.memory import MemoryStore, iter_records
+from app.memory.store import diff, apply
+
+REPO = Path(__file__).resolve().parents[2]
+T = 1757112000000  # epoch ms
+
+def _deleg(i, frm="architect", to="dev_builder"):
+    return {"success": True, "data": {"i": i}, "metadata": {"agent": to, "executionTime": 5, "timestamp": i},
+            "delegation": {"fromAgent": frm, "toAgent": to, "startTime": i, "endTime": i + 5, "retryCount": 0}}
+
+def test_diff_apply():
+    """diff/apply cobrem set, del e append"""
+    print("=== Testando diff/apply ===")
+    old = {"a": 1, "b": {"x": [1, 2]}, "c": "fora"}
+    new = {"a": 2, "b": {"x": [1, 2, 3], "y": None}}
+    ops = diff(old, new)
+    assert ["append", ["b", "x"], [3]] in ops and ["del", ["c"]] in ops
+    assert apply({"a": 1, "b": {"x": [1, 2]}, "c": "fora"}, ops) == new
+    assert apply([1], diff([1], [2, 3])) == [2, 3]
+    print("✅ diff/apply")
+
+def test_roundtrip_and_deltas():
+    """Saves viram deltas O(novos itens); get/get(at) reconstroem o estado"""
+    print("\n=== Testando roundtrip e deltas ===")
+    with tempfile.TemporaryDirectory() as d:
+        store = MemoryStore(d, keyframe_every=8)
+        hist = []
+        sizes = []
+        for i in range(20):
+            hist.append(_deleg(i))
+            before = store.stats()["bytes"]
+            store.put("hist", {"delegations": hist}, T + i)
+            sizes.append(store.stats()["bytes"] - before)
+        st = store.stats()
+        # keyframes nos saves 0/8/16; o 2º também é full (delta não compensa com 1 item)
+        assert st["records"] == 20 and st["full"] == 4 and st["delta"] == 16, st
+        # registros delta não crescem com o histórico
+        assert max(sizes[10:15]) < 2 * min(sizes[1:5]), sizes
+        got = store.get("hist")
+        assert got["data"]["delegations"] == hist and got["timestamp"].endswith("Z")
+        mid = store.get("hist", at=T + 11)
+        assert len(mid["data"]["delegations"]) == 12
+        assert store.get("hist", at=T - 1) is None and store.get("nada") is None
+        store.close()
+        # outro processo (nova instância) vê o mesmo estado só pelo log
+        with MemoryStore(d) as other:
+            assert other.get("hist")["data"]["delegations"] == hist
+        print("✅ deltas e reconstrução")
+
+def test_index_query():
+    """Consultas por projeto/agente/tempo não leem payloads"""
+    print("\n=== Testando índice ===")
+    with tempfile.TemporaryDirectory() as d:
+        with MemoryStore(d) as store:
+            store.put("hist", {"delegations": [_deleg(1)]}, T + 1000)
+            store.put("hist", {"delegations": [_deleg(1), _deleg(2, "manager", "qa_tester")]}, T + 2000)
+            store.put("ui", {"page": "home"}, T + 3000, agent="dev_ui")
+            store._read = None  # qualquer leitura de payload quebraria
+            assert [e["timestamp"][-9:] for e in store.query("hist")] == ["0:02.000Z", "0:01.000Z"]
+            assert [e["projectId"] for e in store.query(agent="qa_tester")] == ["hist"]
+            assert [e["projectId"] for e in store.query(agent="dev_ui")] == ["ui"]
+            assert len(store.query(since=T + 1500, until=T + 2500)) == 1
+            assert len(store.query(limit=2)) == 2
+            del store._read
+            assert store.delete("ui") and store.projects() == ["hist"]
+            assert store.query(agent="dev_ui") == [] and store.get("ui") is None
+        print("✅ índice por projeto/agente/tempo")
+
+def test_torn_tail_and_compaction():
+    """Cauda incompleta é truncada; compactação mantém o estado e encolhe o log"""
+    print("\n=== Testando recuperação e compactação ===")
+    with tempfile.TemporaryDirectory() as d:
+        with MemoryStore(d, max_versions=5) as store:
+            for i in range(30):
+                store.put("a", {"n": i, "blob": "x" * 200}, T + i)
+            store.put("b", {"n": 0}, T + 5000)
+            store.delete("b")
+            path = store.path
+        size = path.stat().st_size
+        with open(path, "ab") as f:
+            f.write(b"\x00\x00\x01\x00lixo")  # escrita interrompida
+        with MemoryStore(d, max_versions=5) as store:
+            assert store.get("a")["data"]["n"] == 29
+            assert path.stat().st_size == size
+            r = store.compact()
+            assert r["after"] < r["before"] / 3, r
+            assert store.projects() == ["a"] and store.get("a")["data"]["n"] == 29
+            assert len(store.query("a")) == 5 and store.get("a", at=T + 26)["data"]["n"] == 26
+        assert len(list(iter_records(path))) == 5
+        print("✅ cauda truncada e compactação")
+
+def test_get_returns_copy():
+    """get -> mutar -> put: o delta sai correto e sobrevive à reabertura"""
+    print("\n=== Testando get/mutar/put ===")
+    with tempfile.TemporaryDirectory() as d:
+        with MemoryStore(d) as store:
+            store.put("p", {"items": [1, 2]}, T)
+            cur = store.get("p")
+            cur["data"]["items"].append(3)
+            assert store.get("p")["data"]["items"] == [1, 2]  # cache intocado
+            store.put("p", cur["data"], T + 1)
+            assert store.get("p")["data"]["items"] == [1, 2, 3]
+        with MemoryStore(d) as store:
+            assert store.get("p")["data"]["items"] == [1, 2, 3]
+        print("✅ get devolve cópia")
+
+def _compact_in_child(root):
+    with MemoryStore(root) as other:
+        other.compact()
+
+def test_put_vs_compact_processes():
+    """Outro processo compacta (troca o arquivo) entre o _open e o flock do put: o registro não se perde"""
+    print("\n=== Testando put x compact entre processos ===")
+    import multiprocessing as mp
+    with tempfile.TemporaryDirectory() as d:
+        with MemoryStore(d, compact_min_bytes=1 << 30) as store:
+            for i in range(5):
+                store.put("p", {"n": i}, T + i)
+            real_open, fired = store._open, []
+            def racing_open():
+                real_open()
+                if not fired:
+                    fired.append(1)
+                    child = mp.get_context("fork").Process(target=_compact_in_child, args=(d,))
+                    child.start(); child.join()
+                    assert child.exitcode == 0
+            store._open = racing_open
+            store.put("p", {"n": 5}, T + 5)
+            assert fired
+        with MemoryStore(d) as store:
+            assert store.get("p")["data"]["n"] == 5 and len(store.query("p")) == 6
+        print("✅ put depois de compact concorrente persiste")
+
+def test_dead_bytes_counted_once():
+    """Versões que passaram do limite entram uma vez só em dead_bytes"""
+    print("\n=== Testando contagem de bytes mortos ===")
+    with tempfile.TemporaryDirectory() as d:
+        with MemoryStore(d, max_versions=2, keyframe_every=1, compact_min_bytes=1 << 30) as store:
+            for i in range(20):
+                store.put("p", {"n": i, "blob": "x" * 100}, T + i)
+            st = store.stats()
+            assert 0 < st["dead_bytes"] < st["bytes"], st
+            ends = [end for _, _, end in iter_records(store.path)]
+            assert st["dead_bytes"] == ends[17], (st, ends)  # exatamente as 18 versões mais antigas
+            store.delete("p")
+            assert store.stats()["dead_bytes"] <= store.stats()["bytes"]
+        print("✅ bytes mortos sem dupla contagem")
+
+def test_import_legacy():
+    """Importa aurix_memory do lado TS (data duplamente codificado), idempotente"""
+    print("\n=== Testando importação do formato legado ===")
+    src = REPO / "aurix_memory"
+    if not (src / "projects").is_dir():
+        print("⏭️  aurix_memory ausente")
+        return
+    with tempfile.TemporaryDirectory() as d:
+        root = Path(d) / "aurix_memory"
+        shutil.copytree(src, root)
+        with MemoryStore(root) as store:
+            first = store.import_legacy()
+            assert first["imported"] > 0
+            assert store.import_legacy()["imported"] == 0
+            hist = store.get("agent_delegation_history")
+            assert isinstance(hist["data"], dict) and "delegations" in hist["data"]
+            assert store.query("agent_delegation_history", agent="architect")
+            fp = store.export_legacy("agent_delegation_history", Path(d) / "out")
+            assert fp and os.path.getsize(fp) > 0
+        print(f"✅ legado importado ({first['imported']} saves)")
+
+def main():
+    test_diff_apply()
+    test_roundtrip_and_deltas()
+    test_index_query()
+    test_torn_tail_and_compaction()
+    test_get_returns_copy()
+    test_put_vs_compact_processes()
+    test_dead_bytes_counted_once()
+    test_import_legacy()
+    print("\n🎉 Testes do memory store passaram!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Testes do analytics de delegações (app/memory/analytics.py)
+"""
+
+import shutil
+import sqlite3
+import tempfile
+from pathlib import Path
+from app.tools import codec
+from app.memory import MemoryStore
+from app.memory.analytics import DelegationAnalytics
+
+REPO = Path(__file__).resolve().parents[2]
+T = 1757112000000  # epoch ms
+
+def _deleg(i, frm, to, dur, retries=0, ok=True):
+    return {"success": ok, "data": {}, "metadata": {"agent": to, "executionTime": dur},
+            "delegation": {"fromAgent": frm, "toAgent": to, "startTime": T + i * 1000,
+                           "endTime": T + i * 1000 + dur, "retryCount": retries}}
+
+def test_incremental_log_ingest():
+    """Só registros novos do log são lidos; percentis, retries e handoffs por janela"""
+    print("=== Testando ingestão incremental do log ===")
+    with tempfile.TemporaryDirectory() as d:
+        hist = []
+        with MemoryStore(d) as store, DelegationAnalytics(d) as an:
+            for i in range(10):
+                hist.append(_deleg(i, "manager", "architect", 10 * (i + 1), retries=int(i % 5 == 0)))
+                store.put("hist", {"delegations": hist}, T + i * 1000)
+            r = an.ingest()
+            assert r["log_records"] == 10 and r["delegations"] == 10, r
+            assert an.ingest()["log_records"] == 0
+
+            hist.append(_deleg(3600, "architect", "qa_tester", 7, ok=False))
+            store.put("hist", {"delegations": hist}, T + 3600 * 1000)
+            r = an.ingest()
+            assert r["log_records"] == 1 and r["delegations"] == 1 and r["total"] == 11, r
+
+            st = an.agent_stats()
+            assert st["architect"]["count"] == 10 and st["architect"]["p50_ms"] == 55.0
+            assert st["architect"]["p95_ms"] == 95.5 and st["architect"]["retry_rate"] == 0.2
+            assert st["qa_tester"]["success_rate"] == 0.0
+            assert an.agent_stats(since=T + 3000 * 1000)["qa_tester"]["count"] == 1
+            assert "architect" not in an.agent_stats(since=T + 3000 * 1000)
+
+            hand = an.handoffs(bucket_s=3600)
+            assert [(h["from"], h["to"], h["count"]) for h in hand] == [("manager", "architect", 10), ("architect", "qa_tester", 1)]
+            assert hand[1]["bucket"] > hand[0]["bucket"]
+
+            # compactação troca o arquivo: relê do zero, sem duplicar
+            store.compact()
+            r = an.ingest()
+            assert r["log_records"] > 0 and r["delegations"] == 0 and r["total"] == 11, r
+        print("✅ ingestão incremental e consultas")
+
+def test_incomplete_dedupe():
+    """Delegação sem fim/origem vista em dois snapshots entra uma vez só"""
+    print("\n=== Testando deduplicação com campos ausentes ===")
+    with tempfile.TemporaryDirectory() as d:
+        root = Path(d)
+        item = {"success": None, "delegation": {"toAgent": "qa_tester", "startTime": T}}
+        (root / "backups" / "p").mkdir(parents=True)
+        (root / "projects").mkdir()
+        (root / "projects" / "p.json").write_bytes(codec.dumpb({"projectId": "p", "data": {"delegations": [item]}}))
+        (root / "backups" / "p" / "1.json").write_bytes(codec.dumpb({"projectId": "p", "data": {"delegations": [item]}}))
+        with DelegationAnalytics(root) as an:
+            r = an.ingest()
+            assert r["files"] == 2 and r["delegations"] == 1 and r["total"] == 1, r
+            assert an.agent_stats()["qa_tester"]["count"] == 1
+        # banco da versão anterior (UNIQUE sem COALESCE, com duplicatas) é refeito ao abrir
+        db = sqlite3.connect(str(root / "log" / "delegations.sqlite"))
+        db.execute("PRAGMA user_version = 0")
+        db.close()
+        with DelegationAnalytics(root) as an:
+            assert an.ingest()["total"] == 1
+        print("✅ 2 snapshots, 1 linha")
+
+def test_legacy_files():
+    """Snapshots/backups do lado TS: lidos uma vez, delegações repetidas deduplicadas"""
+    print("\n=== Testando ingestão dos arquivos legados ===")
+    src = REPO / "aurix_memory"
+    if not (src / "projects").is_dir():
+        print("⏭️  aurix_memory ausente")
+        return
+    with tempfile.TemporaryDirectory() as d:
+        root = Path(d) / "aurix_memory"
+        shutil.copytree(src, root)
+        with DelegationAnalytics(root) as an:
+            r = an.ingest()
+            assert r["files"] > 0 and r["delegations"] > 0
+            assert an.ingest() == {"files": 0, "log_records": 0, "delegations": 0, "total": r["total"]}
+            assert an.handoffs() and all(v["count"] > 0 for v in an.agent_stats().values())
+            # log com os mesmos saves não duplica linhas
+            with MemoryStore(root) as store:
+                store.import_legacy()
+            assert an.ingest()["total"] == r["total"]
+        print(f"✅ {r['files']} arquivos, {r['total']} delegações")
+
+def main():
+    test_incremental_log_ingest()
+    test_incomplete_dedupe()
+    test_legacy_files()
+    print("\n🎉 Testes do analytics de delegações passaram!")
+
+if __name__ == "__main__":
+    main()
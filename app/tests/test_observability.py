@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Testes de observabilidade (tracing e métricas)
+"""
+
+import json
+import tempfile
+from pathlib import Path
+import urllib.request
+from app.tools import tracing
+from app.tools.metrics import Registry, write_textfile, serve
+
+def test_tracing_spans():
+    """Spans aninhados exportados em JSONL com ligação pai/filho"""
+    print("=== Testando tracing ===")
+    with tempfile.TemporaryDirectory() as d:
+        out = Path(d) / "traces.jsonl"
+        tracing.configure(out)
+        try:
+            from app.agents import dispatch_agent
+            res = dispatch_agent("qa_tester", {"paths": [d], "correlation_id": "run-42"})
+            assert res["ok"]
+        finally:
+            tracing.configure(enabled=False)
+
+        spans = [json.loads(l) for l in out.read_text(encoding="utf-8").splitlines()]
+        by_name = {s["name"]: s for s in spans}
+        root = by_name["dispatch_agent"]
+        child = by_name["subprocess.py_compile"]
+        assert root["parentSpanId"] is None
+        assert child["parentSpanId"] == root["spanId"]
+        assert child["traceId"] == root["traceId"]
+        assert child["attributes"]["correlation_id"] == "run-42"
+        assert root["attributes"]["agent"] == "qa_tester"
+        assert root["endTimeUnixNano"] >= root["startTimeUnixNano"]
+        print(f"✅ {len(spans)} spans exportados, pai/filho ok")
+
+def test_tracing_disabled():
+    """Sem configuração o span é no-op"""
+    tracing.configure(enabled=False)
+    with tracing.span("nada") as sp:
+        sp.set(x=1)
+    assert tracing.current_span() is None
+    print("✅ tracing desligado é no-op")
+
+def test_metrics_registry():
+    """Contadores, histogramas e gauges no formato texto do Prometheus"""
+    print("\n=== Testando métricas ===")
+    reg = Registry()
+    calls = reg.counter("t_calls_total", "chamadas", ("server", "tool"))
+    lat = reg.histogram("t_call_seconds", "latência", ("server",), buckets=(0.1, 1.0))
+    depth = reg.gauge("t_queue_depth", "fila", ("server",))
+    calls.inc(server="http", tool="fetch")
+    calls.inc(2, server="http", tool="fetch")
+    for v in (0.05, 0.5, 0.5, 5.0):
+        lat.observe(v, server="http")
+    depth.add_callback(lambda: [({"server": "http"}, 7)])
+
+    text = reg.render()
+    assert 't_calls_total{server="http",tool="fetch"} 3' in text
+    assert 't_call_seconds_bucket{server="http",le="0.1"} 1' in text
+    assert 't_call_seconds_bucket{server="http",le="+Inf"} 4' in text
+    assert 't_call_seconds_count{server="http"} 4' in text
+    assert 't_queue_depth{server="http"} 7' in text
+    assert 0.1 <= lat.quantile(0.5, server="http") <= 1.0
+    print("✅ render ok")
+
+    with tempfile.TemporaryDirectory() as d:
+        fp = write_textfile(Path(d) / "aurix.prom", reg)
+        assert fp.read_text(encoding="utf-8") == text
+    print("✅ write_textfile ok")
+
+    srv = serve(0, registry=reg)
+    try:
+        port = srv.server_address[1]
+        body = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5).read().decode()
+        assert "t_calls_total" in body
+    finally:
+        srv.shutdown()
+    print("✅ endpoint /metrics ok")
+
+def main():
+    test_tracing_spans()
+    test_tracing_disabled()
+    test_metrics_registry()
+    print("\n🎉 Testes de observabilidade passaram!")
+
+if __name__ == "__main__":
+    main()
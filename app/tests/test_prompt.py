@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Testes do montador de prompts com orçamento de tokens (app/agents/_prompt)
+"""
+
+import os
+from app.agents import _prompt as P
+from app.agents import _util
+
+DOC = "Documentação do produto — seção de arquitetura. def handler(x): return x + 1\n" * 400
+
+def test_count_and_truncate():
+    """Contagem em cache, lote e corte respeitando o limite"""
+    print("=== Testando contagem e corte ===")
+    n = P.count_tokens(DOC)
+    assert n > len(DOC) // 8 and P.count_tokens(DOC) == n and P.count_tokens("") == 0
+    assert P.count_tokens_many([DOC, "abc", DOC]) == [n, P.count_tokens("abc"), n]
+    cut = P.truncate_tokens(DOC, 300)
+    assert cut.endswith(P.TRIM_MARK) and P.count_tokens(cut) <= 300 and DOC.startswith(cut[:-len(P.TRIM_MARK)])
+    assert P.truncate_tokens("curto", 300) == "curto"
+    print(f"✅ {n} tokens ({P.tokenizer_name()}), corte em 300")
+
+def test_tokenizer_offline():
+    """Sem o BPE no cache do tiktoken não há download: cai na estimativa por regex"""
+    print("\n=== Testando tokenizer sem cache ===")
+    import hashlib, tempfile
+    old = (os.environ.get("TIKTOKEN_CACHE_DIR"), P._enc, P._enc_loaded)
+    with tempfile.TemporaryDirectory() as d:
+        os.environ["TIKTOKEN_CACHE_DIR"] = d
+        try:
+            P._enc_loaded = False
+            assert not P._bpe_cached() and P.tokenizer_name() == "regex"
+            open(os.path.join(d, hashlib.sha1(P._BPE_URL.encode()).hexdigest()), "w").close()
+            assert P._bpe_cached()
+        finally:
+            if old[0] is None: os.environ.pop("TIKTOKEN_CACHE_DIR", None)
+            else: os.environ["TIKTOKEN_CACHE_DIR"] = old[0]
+            P._enc, P._enc_loaded = old[1], old[2]
+    print("✅ regex sem BPE local")
+
+def test_budget_priority():
+    """Docs primeiro até o teto, páginas divididas por igual, saída com o que sobra"""
+    print("\n=== Testando orçamento ===")
+    pages = [("https://a", "pequena"), ("https://b", DOC), ("https://c", DOC)]
+    p = P.build_prompt("Você é o architect.", [P.Section("DOCS", DOC * 4, 1, max_tokens=2000),
+                                               P.Section("WEB_SNAPSHOTS", items=pages, priority=2)],
+                       output=(512, 2048), context=4096)
+    assert p.prompt_tokens + p.max_tokens <= 4096 and p.max_tokens >= 512, (p.prompt_tokens, p.max_tokens)
+    assert p.trimmed["DOCS"][1] <= 2000 and "WEB_SNAPSHOTS" in p.trimmed
+    assert p.user.startswith("DOCS:\n") and "### https://a\npequena" in p.user  # item pequeno fica inteiro
+    assert p.user.count(P.TRIM_MARK) == 3
+    small = P.build_prompt("sys", [P.Section("DOCS", "curto")], output=(256, 2048), context=8192)
+    assert small.trimmed == {} and small.max_tokens == 2048 and small.user == "DOCS:\ncurto"
+    try:
+        P.build_prompt("x " * 5000, [], context=1024)
+        raise AssertionError("system maior que a janela deveria falhar")
+    except ValueError:
+        pass
+    print(f"✅ prompt {p.prompt_tokens} + saída {p.max_tokens} <= 4096")
+
+def test_context_window_default():
+    """Sem AURIX_NUM_CTX: OLLAMA_CONTEXT_LENGTH do ambiente ou o padrão do Ollama, nunca mais que isso"""
+    print("\n=== Testando janela padrão ===")
+    old = {k: os.environ.pop(k, None) for k in ("AURIX_NUM_CTX", "OLLAMA_CONTEXT_LENGTH")}
+    try:
+        assert P.context_window() == P.DEFAULT_NUM_CTX == 4096
+        os.environ["OLLAMA_CONTEXT_LENGTH"] = "16384"
+        assert P.context_window() == 16384
+        os.environ["AURIX_NUM_CTX"] = "8192"
+        assert P.context_window() == 8192
+    finally:
+        for k, v in old.items():
+            if v is None: os.environ.pop(k, None)
+            else: os.environ[k] = v
+    print("✅ janela do servidor")
+
+def test_nitro_fits_window():
+    """ollama_nitro_chat limita max_tokens à janela e corta prompt que estouraria"""
+    print("\n=== Testando max_tokens do NITRO ===")
+    seen = {}
+    def fake(base, model, max_tokens, system, user, schema=None):
+        seen.update(max_tokens=max_tokens, user=user)
+        return "{}", "ok"
+    old = (_util._ollama_nitro_request, _util._get_optimal_model_config, os.environ.get("AURIX_NUM_CTX"))
+    _util._ollama_nitro_request = fake
+    _util._get_optimal_model_config = lambda: ("llama3.1:8b", 2048)
+    os.environ["AURIX_NUM_CTX"] = "4096"
+    try:
+        _util.ollama_nitro_chat("sys", "oi", max_tokens=900)
+        assert seen["max_tokens"] == 900
+        _util.ollama_nitro_chat("sys", DOC[:len(DOC) // 4])
+        assert 256 < seen["max_tokens"] < 2048 and seen["user"] == DOC[:len(DOC) // 4]
+        _util.ollama_nitro_chat("sys", DOC * 3)
+        assert seen["max_tokens"] == 256 and seen["user"].endswith(P.TRIM_MARK)
+        assert P.count_tokens(seen["user"]) + P.count_tokens("sys") + 2 * P.MESSAGE_OVERHEAD + 256 <= 4096
+    finally:
+        _util._ollama_nitro_request, _util._get_optimal_model_config = old[0], old[1]
+        if old[2] is None: os.environ.pop("AURIX_NUM_CTX", None)
+        else: os.environ["AURIX_NUM_CTX"] = old[2]
+    print("✅ saída ajustada à janela")
+
+def main():
+    test_count_and_truncate()
+    test_tokenizer_offline()
+    test_budget_priority()
+    test_context_window_default()
+    test_nitro_fits_window()
+    print("\n🎉 Testes do orçamento de prompt passaram!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Testes do modo corrida do sistema híbrido (app/agents/_router)
+"""
+
+import time
+import tempfile
+import threading
+from pathlib import Path
+from app.agents import _router as R
+from app.agents import _util
+
+def _backends(spec):
+    """spec: nome -> (atraso_s, texto); registra quem de fato chamou o modelo"""
+    called = []
+    def make(name, delay, text):
+        def fn(system, user, max_tokens, schema, cancel):
+            called.append(name)
+            time.sleep(delay)
+            if isinstance(text, Exception):
+                raise text
+            return text
+        return fn
+    return {n: make(n, d, t) for n, (d, t) in spec.items()}, called
+
+def _race(spec, router, **kw):
+    old = R.BACKENDS
+    R.BACKENDS, called = _backends(spec)
+    try:
+        t0 = time.perf_counter()
+        out = R.race_chat("sys", "user", backends=tuple(spec), router=router, **kw)
+        return out, time.perf_counter() - t0, called
+    finally:
+        R.BACKENDS = old
+
+VALID = '{"architecture": {"overview": "x"}, "tasks": [], "notes": "ok", "files": []}'
+
+def test_first_valid_wins():
+    """Rápido e válido ganha sem esperar o lento; inválido rápido perde para o válido lento"""
+    print("=== Testando corrida ===")
+    with tempfile.TemporaryDirectory() as d:
+        router = R.RouterStats(Path(d) / "router.json")
+        out, dt, _ = _race({"cursor": (0.5, VALID), "ollama": (0.02, VALID)}, router)
+        assert out == VALID and dt < 0.3, dt
+        out, dt, _ = _race({"cursor": (0.01, "INSTRUÇÕES PARA CURSOR AI: ..."), "ollama": (0.1, VALID)}, router)
+        assert out == VALID and dt >= 0.1
+        out, _, _ = _race({"cursor": (0.01, RuntimeError("sem rede")), "ollama": (0.01, "TEMPLATE OFFLINE - x")}, router)
+        assert out.startswith("TEMPLATE OFFLINE")  # nenhuma válida: devolve a do Ollama
+        snap = router.snapshot()
+        assert snap["ollama"]["wins"] == 2 and snap["cursor"]["errors"] == 1, snap
+        assert R.RouterStats(router.path).snapshot()["ollama"]["races"] == 3  # persistido
+    print("✅ primeira válida vence")
+
+def test_weights_feed_routing():
+    """Backend que nunca ganha passa a largar atrasado (hedge) e não roda se o líder responder antes"""
+    print("\n=== Testando pesos do roteamento ===")
+    with tempfile.TemporaryDirectory() as d:
+        router = R.RouterStats(Path(d) / "router.json")
+        assert router.plan(["cursor", "ollama"]) == [("cursor", 0.0), ("ollama", 0.0)]
+        for _ in range(R.MIN_RACES + 2):
+            router.record("ollama", 0.05, True)
+            router.record("cursor", 0.01, False)
+            router.finish(["cursor", "ollama"], "ollama")
+        plan = router.plan(["cursor", "ollama"])
+        assert plan[0] == ("ollama", 0.0) and plan[1][0] == "cursor" and abs(plan[1][1] - 0.05) < 1e-9, plan
+        time.sleep(0.05)
+        out, _, called = _race({"cursor": (0.0, VALID), "ollama": (0.01, VALID)}, router)
+        time.sleep(0.1)
+        assert out == VALID and called == ["ollama"], called  # cursor nem largou
+        # líder lento: o atrasado larga depois da latência típica e pode ganhar
+        out, dt, called = _race({"cursor": (0.0, VALID), "ollama": (0.5, VALID)}, router)
+        assert called == ["ollama", "cursor"] and dt < 0.3, (called, dt)
+    print("✅ pesos aplicados")
+
+def test_concurrent_races_and_late_stats():
+    """Perdedores lentos de várias corridas não atrasam a largada das outras; a latência deles é persistida"""
+    print("\n=== Testando corridas concorrentes ===")
+    with tempfile.TemporaryDirectory() as d:
+        router = R.RouterStats(Path(d) / "router.json")
+        old = R.BACKENDS
+        R.BACKENDS, _ = _backends({"cursor": (0.6, VALID), "ollama": (0.02, VALID)})
+        try:
+            times = []
+            def one():
+                t0 = time.perf_counter()
+                assert R.race_chat("sys", "user", backends=("cursor", "ollama"), router=router) == VALID
+                times.append(time.perf_counter() - t0)
+            threads = [threading.Thread(target=one) for _ in range(12)]
+            for t in threads: t.start()
+            for t in threads: t.join()
+            assert len(times) == 12 and max(times) < 0.4, times
+            time.sleep(0.8)  # perdedores terminam em background
+        finally:
+            R.BACKENDS = old
+        saved = R.RouterStats(router.path).snapshot()
+        assert saved["cursor"]["valid"] == 12 and saved["cursor"]["ewma_s"] >= 0.5, saved
+    print(f"✅ 12 corridas em {max(times):.2f}s, latência dos perdedores gravada")
+
+def test_hybrid_race_flag():
+    """hybrid_ai_chat_with_offline(race=True) delega para race_chat"""
+    print("\n=== Testando flag race ===")
+    seen = {}
+    old = R.race_chat
+    R.race_chat = lambda system, user, max_tokens=None, schema=None: seen.setdefault("args", (system, user, max_tokens)) and "ok"
+    try:
+        assert _util.hybrid_ai_chat_with_offline("s", "u", max_tokens=300, race=True) == "ok"
+        assert seen["args"] == ("s", "u", 300)
+    finally:
+        R.race_chat = old
+    print("✅ race=True usa a corrida")
+
+def main():
+    test_first_valid_wins()
+    test_weights_feed_routing()
+    test_concurrent_races_and_late_stats()
+    test_hybrid_race_flag()
+    print("\n🎉 Testes do modo corrida passaram!")
+
+if __name__ == "__main__":
+    main()
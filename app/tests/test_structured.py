@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Testes da saída estruturada (_util.structured_chat): schema no Ollama, validação pydantic e reparo
+"""
+
+import json
+from app.agents import _util
+from app.models import ArchitectOut, DevBuilderOut
+from app.tools.metrics import LLM_STRUCTURED
+
+VALID = {"architecture": {"overview": "x"}, "tasks": [{"id": "AURIX-0001", "title": "T", "owner": "dev_builder"}]}
+
+def _with_llm(replies, fn):
+    calls = []
+    def fake(system, user, max_tokens=None, schema=None, race=None):
+        calls.append({"system": system, "user": user, "schema": schema})
+        return replies[min(len(calls), len(replies)) - 1]
+    old = _util.hybrid_ai_chat_with_offline
+    _util.hybrid_ai_chat_with_offline = fake
+    try:
+        return fn(), calls
+    finally:
+        _util.hybrid_ai_chat_with_offline = old
+
+def test_parse_json():
+    """JSON puro, em bloco de código e com texto em volta"""
+    print("=== Testando _parse_json ===")
+    assert _util._parse_json('{"a": 1}') == {"a": 1}
+    assert _util._parse_json('```json\n{"a": 1}\n```') == {"a": 1}
+    assert _util._parse_json('Claro! Aqui está:\n{"a": {"b": 2}}\nAbraços') == {"a": {"b": 2}}
+    try:
+        _util._parse_json("sem json")
+        raise AssertionError("deveria falhar")
+    except ValueError:
+        pass
+    print("✅ _parse_json")
+
+def test_valid_first_try():
+    """Resposta válida: uma chamada, schema no system e no format"""
+    print("\n=== Testando saída válida ===")
+    before = LLM_STRUCTURED.value(schema="ArchitectOut", outcome="ok")
+    obj, calls = _with_llm([json.dumps(VALID)], lambda: _util.structured_chat("Você é o architect.", "DOCS:\n...", ArchitectOut))
+    assert obj.tasks[0].id == "AURIX-0001" and len(calls) == 1
+    assert calls[0]["schema"]["title"] == "ArchitectOut" and _util.SCHEMA_MARK in calls[0]["system"]
+    assert _util.schema_prompt(calls[0]["system"], ArchitectOut) == calls[0]["system"]  # idempotente
+    assert LLM_STRUCTURED.value(schema="ArchitectOut", outcome="ok") == before + 1
+    print("✅ 1 chamada, schema enviado")
+
+def test_repair_loop():
+    """Inválida -> pedido curto de correção com os erros -> válida; esgotado -> ValueError"""
+    print("\n=== Testando reparo ===")
+    bad = json.dumps({"architecture": {}, "tasks": [{"id": "../etc", "owner": "dev_builder"}]})
+    obj, calls = _with_llm([bad, json.dumps(VALID)],
+                           lambda: _util.structured_chat("sys", "DOCS:\n" + "x" * 5000, ArchitectOut))
+    assert obj.tasks[0].id == "AURIX-0001" and len(calls) == 2
+    assert "tasks.0.id" in calls[1]["user"] and "tasks.0.title" in calls[1]["user"]
+    assert "x" * 100 not in calls[1]["user"]  # não reenvia os docs
+    try:
+        _with_llm(["nada de json"], lambda: _util.structured_chat("sys", "u", DevBuilderOut, repairs=1))
+        raise AssertionError("deveria falhar")
+    except ValueError as e:
+        assert "DevBuilderOut" in str(e)
+    too_many = json.dumps({"files": [{"path": f"f{i}.py"} for i in range(11)]})
+    _, calls = _with_llm([too_many, '{"files": [], "notes": "ok"}'], lambda: _util.structured_chat("sys", "u", DevBuilderOut))
+    assert len(calls) == 2
+    # template offline: nenhum pedido de reparo pelo mesmo caminho
+    before = LLM_STRUCTURED.value(schema="DevBuilderOut", outcome="offline")
+    def offline():
+        try:
+            _util.structured_chat("sys", "u", DevBuilderOut)
+        except ValueError as e:
+            return str(e)
+    err, calls = _with_llm([_util._offline_template_fallback("sys", "u")], offline)
+    assert "offline" in err and len(calls) == 1, (err, len(calls))
+    assert LLM_STRUCTURED.value(schema="DevBuilderOut", outcome="offline") == before + 1
+    print("✅ reparo limitado")
+
+def test_dev_builder_notes_per_ticket():
+    """Cada ticket grava as próprias notas (tickets em paralelo não se sobrescrevem)"""
+    print("\n=== Testando notas por ticket do dev_builder ===")
+    import os, tempfile
+    from pathlib import Path
+    from app.agents import dev_builder
+    with tempfile.TemporaryDirectory() as d:
+        base = Path(d)
+        old_sys = dev_builder._sys
+        dev_builder._sys = lambda: "Você é o dev_builder."
+        try:
+            for tid in ("AURIX-0001", "AURIX-0002"):
+                ticket = base / f"{tid}.json"
+                ticket.write_text(json.dumps({"id": tid}), encoding="utf-8")
+                reply = json.dumps({"files": [{"path": f"src/{tid}.py", "content": "X = 1\n"}], "notes": f"notas {tid}"})
+                _with_llm([reply], lambda: dev_builder.run({"ticket_path": str(ticket), "base_dir": d}))
+        finally:
+            dev_builder._sys = old_sys
+        logs = base / "data" / "logs"
+        assert sorted(os.listdir(logs)) == ["dev_builder.AURIX-0001.notes.txt", "dev_builder.AURIX-0002.notes.txt"]
+        assert (logs / "dev_builder.AURIX-0002.notes.txt").read_text(encoding="utf-8") == "notas AURIX-0002"
+    print("✅ notas por ticket")
+
+def test_ollama_format():
+    """O schema chega ao Ollama como response_format json_schema"""
+    print("\n=== Testando format no Ollama ===")
+    from app.bench import fake_ollama
+    srv = fake_ollama.start()
+    try:
+        schema = DevBuilderOut.model_json_schema()
+        out, outcome = _util._ollama_nitro_request(srv.base_url, "llama3.1:8b", 256, "sys", "u", schema)
+        assert outcome == "ok" and DevBuilderOut.model_validate(_util._parse_json(out))
+        rf = srv.stats["last_request"]["response_format"]
+        assert rf["type"] == "json_schema" and rf["json_schema"]["schema"]["title"] == "DevBuilderOut"
+        _util._ollama_nitro_request(srv.base_url, "llama3.1:8b", 256, "sys", "u")
+        assert "response_format" not in srv.stats["last_request"]
+    finally:
+        srv.shutdown()
+    print("✅ response_format json_schema")
+
+def main():
+    test_parse_json()
+    test_valid_first_try()
+    test_repair_loop()
+    test_dev_builder_notes_per_ticket()
+    test_ollama_format()
+    print("\n🎉 Testes de saída estruturada passaram!")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Testes de I/O dos utilitários (escrita em lote, write_if_changed + índice de digests)
+"""
+
+import os
+import tempfile
+from pathlib import Path
+from app.agents import _util
+from app.agents._util import write_batch, write_if_changed, DigestIndex
+
+def test_write_batch():
+    """Escreve vários arquivos e ignora os inalterados"""
+    print("=== Testando write_batch ===")
+    with tempfile.TemporaryDirectory() as d:
+        root = Path(d)
+        files = {root / "a.txt": "A", root / "sub" / "b.txt": "B"}
+        changed = write_batch(files)
+        assert sorted(p.name for p in changed) == ["a.txt", "b.txt"]
+        assert (root / "sub" / "b.txt").read_text(encoding="utf-8") == "B"
+        print("✅ write_batch (novos arquivos)")
+
+        changed = write_batch({root / "a.txt": "A", root / "sub" / "b.txt": "B2"})
+        assert [p.name for p in changed] == ["b.txt"]
+        print("✅ write_batch (apenas alterados)")
+
+        assert not [f for f in os.listdir(root) if f.startswith((".tmp_", ".bak_"))]
+        print("✅ write_batch (sem temporários)")
+
+def test_write_batch_concurrent():
+    """Threads gravando o mesmo arquivo não colidem nos backups"""
+    print("\n=== Testando write_batch concorrente ===")
+    import threading
+    with tempfile.TemporaryDirectory() as d:
+        target = Path(d) / "shared.txt"
+        target.write_text("0", encoding="utf-8")
+        errors = []
+        def worker(n):
+            for i in range(150):
+                try:
+                    write_batch({target: f"{n}-{i}"}, max_workers=1)
+                except Exception as e:
+                    errors.append(e)
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        assert not errors, errors[:3]
+        assert not [f for f in os.listdir(d) if f.startswith((".tmp_", ".bak_"))]
+        print("✅ 600 escritas concorrentes sem erro")
+    # locks em faixas: muitos caminhos não fazem a tabela crescer
+    locks = _util._path_locks([Path(f"/x/{i}") for i in range(1000)])
+    assert len(locks) == len(set(map(id, locks))) <= _util._PATH_STRIPES
+
+def test_write_batch_rollback():
+    """Falha no meio do commit restaura o conjunto inteiro"""
+    print("\n=== Testando rollback do write_batch ===")
+    with tempfile.TemporaryDirectory() as d:
+        root = Path(d)
+        write_batch({root / "a.txt": "old-a", root / "b.txt": "old-b"})
+
+        real_replace = os.replace
+        calls = {"n": 0}
+        def flaky_replace(src, dst):
+            # 1º rename ok, 2º falha; o rollback usa os.replace normalmente
+            calls["n"] += 1
+            if calls["n"] == 2:
+                raise OSError("disco cheio")
+            return real_replace(src, dst)
+
+        _util.os.replace = flaky_replace
+        try:
+            write_batch({root / "a.txt": "new-a", root / "b.txt": "new-b", root / "c.txt": "new-c"})
+            raise AssertionError("esperava OSError")
+        except OSError:
+            pass
+        finally:
+            _util.os.replace = real_replace
+
+        assert (root / "a.txt").read_text(encoding="utf-8") == "old-a"
+        assert (root / "b.txt").read_text(encoding="utf-8") == "old-b"
+        assert not (root / "c.txt").exists()
+        assert sorted(os.listdir(root)) == ["a.txt", "b.txt"]
+        print("✅ rollback restaurou o estado anterior")
+
+def test_write_batch_no_hardlinks():
+    """FS sem hardlink (EPERM): backup por cópia, commit e rollback seguem funcionando"""
+    print("\n=== Testando write_batch sem hardlinks ===")
+    import errno
+    with tempfile.TemporaryDirectory() as d:
+        root = Path(d)
+        write_batch({root / "a.txt": "old-a", root / "b.txt": "old-b"})
+        real_link, real_replace = os.link, os.replace
+        def no_link(src, dst):
+            raise OSError(errno.EPERM, "Operation not permitted")
+        calls = {"n": 0}
+        def flaky_replace(src, dst):
+            calls["n"] += 1
+            if calls["n"] == 2:
+                raise OSError("disco cheio")
+            return real_replace(src, dst)
+        _util.os.link = no_link
+        try:
+            write_batch({root / "a.txt": "new-a"})
+            assert (root / "a.txt").read_text(encoding="utf-8") == "new-a"
+            _util.os.replace = flaky_replace
+            try:
+                write_batch({root / "a.txt": "x", root / "b.txt": "y"})
+                raise AssertionError("esperava OSError")
+            except OSError:
+                pass
+        finally:
+            _util.os.link, _util.os.replace = real_link, real_replace
+        assert (root / "a.txt").read_text(encoding="utf-8") == "new-a"
+        assert (root / "b.txt").read_text(encoding="utf-8") == "old-b"
+        assert sorted(os.listdir(root)) == ["a.txt", "b.txt"]
+        print("✅ backup por cópia")
+
+def test_digest_index():
+    """Arquivo inalterado é resolvido por stat + índice, sem leitura"""
+    print("\n=== Testando DigestIndex ===")
+    with tempfile.TemporaryDirectory() as d:
+        root = Path(d)
+        fp = root / "plan.json"
+        idx = DigestIndex(root / ".digests.json")
+        assert write_if_changed(fp, "{}", index=idx) is True
+        idx.flush()
+        print("✅ primeira escrita registrada no índice")
+
+        idx = DigestIndex(root / ".digests.json")  # recarrega do disco
+        real_file = _util._sha256_file
+        _util._sha256_file = lambda p: (_ for _ in ()).throw(AssertionError("não deveria ler"))
+        try:
+            assert write_if_changed(fp, "{}", index=idx) is False
+        finally:
+            _util._sha256_file = real_file
+        print("✅ inalterado sem leitura do arquivo")
+
+        # edição externa (tamanho/mtime diferentes) força leitura
+        fp.write_text("{\"x\": 1}", encoding="utf-8")
+        assert write_if_changed(fp, "{\"x\": 1}", index=idx) is False
+        assert write_if_changed(fp, "{}", index=idx) is True
+        assert fp.read_text(encoding="utf-8") == "{}"
+        print("✅ edição externa detectada")
+
+def main():
+    test_write_batch()
+    test_write_batch_concurrent()
+    test_write_batch_rollback()
+    test_write_batch_no_hardlinks()
+    test_digest_index()
+    print("\n🎉 Testes de I/O passaram!")
+
+if __name__ == "__main__":
+    main()
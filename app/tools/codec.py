@@ -0,0 +1,125 @@
+"""
+Camada de JSON do Aurix: `orjson` > `msgspec` > stdlib, escolhido uma vez na importação.
+
+  dumps(obj, pretty=False) -> str      dumpb(obj) -> bytes (sem decode/encode extra)
+  loads(str | bytes | bytearray | memoryview)
+  decode_response(line) -> Envelope    envelope JSON-RPC tipado (id/result/error)
+
+Saída sempre UTF-8 sem escapes (equivale a `ensure_ascii=False`). `pretty=True` só para
+artefatos lidos por humanos (planos, tickets); o resto sai compacto. Objetos que o backend
+rápido não aceita (ints > 64 bits, chaves não-str, ...) caem para a stdlib.
+`AURIX_JSON=json` força a stdlib (comparação/depuração).
+"""
+import json, os
+from typing import Any, Callable, NamedTuple, Optional
+
+_stdlib_compact = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+def _std_dumps(obj: Any, pretty: bool = False, sort_keys: bool = False, default: Optional[Callable] = None) -> str:
+    if not pretty and not sort_keys and default is None:
+        return _stdlib_compact.encode(obj)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if pretty else None,
+                      separators=None if pretty else (",", ":"), sort_keys=sort_keys, default=default)
+
+def _std_loads(data: Any) -> Any:
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+BACKEND = "json"
+_fast_dumpb: Optional[Callable[..., bytes]] = None
+_fast_loads: Optional[Callable[[Any], Any]] = None
+_msgspec = None
+
+if os.environ.get("AURIX_JSON", "").lower() not in ("json", "stdlib"):
+    try:
+        import orjson
+        BACKEND = "orjson"
+        def _fast_dumpb(obj, pretty=False, sort_keys=False, default=None):
+            opt = (orjson.OPT_INDENT_2 if pretty else 0) | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+            return orjson.dumps(obj, default=default, option=opt)
+        _fast_loads = orjson.loads
+    except ImportError:
+        try:
+            import msgspec as _msgspec
+            BACKEND = "msgspec"
+            _enc = _msgspec.json.Encoder()
+            _enc_sorted = _msgspec.json.Encoder(order="sorted")
+            def _fast_dumpb(obj, pretty=False, sort_keys=False, default=None):
+                if default is not None:
+                    raw = _msgspec.json.Encoder(enc_hook=default, order="sorted" if sort_keys else None).encode(obj)
+                else:
+                    raw = (_enc_sorted if sort_keys else _enc).encode(obj)
+                return _msgspec.json.format(raw, indent=2) if pretty else raw
+            _fast_loads = _msgspec.json.decode
+        except ImportError:
+            pass
+
+_FALLBACK_ERRORS: tuple = (TypeError, ValueError, OverflowError)
+if _msgspec is not None:
+    _FALLBACK_ERRORS += (_msgspec.MsgspecError,)
+
+def dumpb(obj: Any, pretty: bool = False, sort_keys: bool = False, default: Optional[Callable] = None) -> bytes:
+    if _fast_dumpb is not None:
+        try:
+            return _fast_dumpb(obj, pretty, sort_keys, default)
+        except _FALLBACK_ERRORS:
+            pass
+    return _std_dumps(obj, pretty, sort_keys, default).encode("utf-8")
+
+def dumps(obj: Any, pretty: bool = False, sort_keys: bool = False, default: Optional[Callable] = None) -> str:
+    if _fast_dumpb is not None:
+        try:
+            return _fast_dumpb(obj, pretty, sort_keys, default).decode("utf-8")
+        except _FALLBACK_ERRORS:
+            pass
+    return _std_dumps(obj, pretty, sort_keys, default)
+
+def loads(data: Any) -> Any:
+    if _fast_loads is not None:
+        try:
+            return _fast_loads(data)
+        except _FALLBACK_ERRORS:
+            pass  # JSON inválido (ou NaN/Infinity, que a stdlib aceita) -> stdlib decide
+    return _std_loads(data)
+
+# ==== JSON-RPC ====
+
+class Envelope(NamedTuple):
+    id: Any
+    result: Any
+    error: Any
+    has_result: bool
+
+    def to_dict(self) -> dict:
+        d = {"jsonrpc": "2.0", "id": self.id}
+        if self.has_result: d["result"] = self.result
+        if self.error is not None: d["error"] = self.error
+        return d
+
+if _msgspec is not None:
+    class _RawEnvelope(_msgspec.Struct):
+        id: Any = None
+        result: Any = _msgspec.UNSET
+        error: Any = None
+    _env_decoder = _msgspec.json.Decoder(_RawEnvelope)
+
+def decode_response(line: Any) -> Optional[Envelope]:
+    """
+    Decodifica uma linha de resposta JSON-RPC; None se não for um objeto JSON.
+    Com `msgspec` decodifica direto para struct (sem dict intermediário, campos extras ignorados).
+    """
+    if _msgspec is not None and BACKEND == "msgspec":
+        try:
+            e = _env_decoder.decode(line)
+            has = e.result is not _msgspec.UNSET
+            return Envelope(e.id, e.result if has else None, e.error, has)
+        except (_msgspec.DecodeError, _msgspec.ValidationError):
+            return None
+    try:
+        obj = loads(line)
+    except ValueError:
+        return None
+    if not isinstance(obj, dict):
+        return None
+    return Envelope(obj.get("id"), obj.get("result"), obj.get("error"), "result" in obj)
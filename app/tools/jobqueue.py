@@ -0,0 +1,288 @@
+"""
+Fila de jobs durável (SQLite) para pipelines longos de agentes.
+
+Cada etapa é um job com id determinístico `<run_id>:<stage>:<key>`, entrada, saída e status
+(pending -> running -> done | failed). Reexecutar um run com o mesmo `run_id` retoma de onde parou:
+jobs `done` cuja entrada não mudou (mesmo hash) não rodam de novo e a saída gravada é reaproveitada;
+jobs `running` de um processo que morreu voltam para `pending`.
+
+  q = JobQueue()                                     # ~/aurix/data/jobs.sqlite (AURIX_JOBS_DB)
+  q.submit("run1", "gather", input={...})
+  q.submit("run1", "plan", input={...}, deps=["run1:gather:"])
+  run_jobs(q, "run1", {"gather": fn, "plan": fn}, workers=4)
+
+Handlers recebem um `JobContext` (entrada, saídas das dependências, `submit` para criar
+jobs filhos) e devolvem a saída (JSON). Exceção = falha; o job é retentado até `max_attempts`.
+"""
+import os, time, socket, sqlite3, threading, hashlib, traceback
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from app.tools import codec
+
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+  id TEXT PRIMARY KEY, run_id TEXT NOT NULL, stage TEXT NOT NULL, key TEXT NOT NULL,
+  input TEXT, input_hash TEXT, output TEXT, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0,
+  max_attempts INTEGER NOT NULL DEFAULT 3, error TEXT, worker TEXT, lease_until REAL,
+  seq INTEGER, created REAL, updated REAL
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_run ON jobs (run_id, status);
+CREATE TABLE IF NOT EXISTS deps (job_id TEXT NOT NULL, dep_id TEXT NOT NULL, PRIMARY KEY (job_id, dep_id));
+"""
+
+def default_db() -> Path:
+    return Path(os.environ.get("AURIX_JOBS_DB") or Path.home() / "aurix" / "data" / "jobs.sqlite").expanduser()
+
+def job_id(run_id: str, stage: str, key: str = "") -> str:
+    return f"{run_id}:{stage}:{key}"
+
+def _hash(obj: Any) -> str:
+    return hashlib.sha256(codec.dumpb(obj, sort_keys=True)).hexdigest()[:16]
+
+def _local(worker: Optional[str]) -> bool:
+    return (worker or "").split(":", 1)[0] == socket.gethostname()
+
+def _pid_alive(worker: Optional[str]) -> bool:
+    """worker = host:pid:thread; de outro host não dá para saber -> considera vivo (espera o lease)."""
+    try:
+        host, pid, _ = (worker or "").split(":", 2)
+        if host != socket.gethostname():
+            return True
+        os.kill(int(pid), 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except (ValueError, PermissionError):
+        return True
+
+class JobQueue:
+    def __init__(self, path: Optional[os.PathLike] = None, lease_s: float = 600.0):
+        self.path = Path(path).expanduser() if path else default_db()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lease_s = lease_s
+        self._local = threading.local()
+        with self._db() as db:
+            db.executescript(_SCHEMA)
+
+    def _db(self) -> sqlite3.Connection:
+        # uma conexão por thread; isolation_level=None -> transações explícitas
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def close(self):
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            db.close(); self._local.db = None
+
+    # ---- escrita ----
+
+    def submit(self, run_id: str, stage: str, key: str = "", input: Any = None, deps: Iterable[str] = (),
+               max_attempts: int = 3, rerun: bool = False) -> str:
+        """
+        Registra um job (idempotente). Já existente e `done` com a mesma entrada: mantém a saída.
+        Entrada diferente, `rerun=True` ou `failed`: volta para `pending`.
+        """
+        jid = job_id(run_id, stage, key)
+        h = _hash(input)
+        now = time.time()
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT status, input_hash FROM jobs WHERE id = ?", (jid,)).fetchone()
+            if row is None:
+                seq = db.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM jobs WHERE run_id = ?", (run_id,)).fetchone()[0]
+                db.execute("INSERT INTO jobs (id, run_id, stage, key, input, input_hash, status, max_attempts, seq, created, updated)"
+                           " VALUES (?,?,?,?,?,?,?,?,?,?,?)",
+                           (jid, run_id, stage, key, codec.dumps(input), h, PENDING, max_attempts, seq, now, now))
+            elif row[1] != h or rerun or row[0] == FAILED:
+                if row[0] != RUNNING:
+                    db.execute("UPDATE jobs SET input = ?, input_hash = ?, status = ?, attempts = 0, error = NULL,"
+                               " max_attempts = ?, updated = ? WHERE id = ?",
+                               (codec.dumps(input), h, PENDING, max_attempts, now, jid))
+            db.execute("DELETE FROM deps WHERE job_id = ?", (jid,))
+            db.executemany("INSERT OR IGNORE INTO deps VALUES (?, ?)", [(jid, d) for d in deps])
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return jid
+
+    def requeue_orphans(self, run_id: Optional[str] = None) -> int:
+        """
+        `running` órfãos -> `pending`. Worker deste host: só se o processo morreu (um job longo
+        de processo vivo nunca é duplicado); de outro host: quando o lease vence (sem heartbeat).
+        """
+        db = self._db()
+        rows = db.execute("SELECT id, worker, lease_until FROM jobs WHERE status = ?" + (" AND run_id = ?" if run_id else ""),
+                          (RUNNING, run_id) if run_id else (RUNNING,)).fetchall()
+        now = time.time()
+        dead = [jid for jid, worker, lease in rows
+                if (not _pid_alive(worker) if _local(worker) else (lease or 0) < now)]
+        if dead:
+            db.executemany("UPDATE jobs SET status = ?, worker = NULL, lease_until = NULL, updated = ? WHERE id = ? AND status = ?",
+                           [(PENDING, now, jid, RUNNING) for jid in dead])
+        return len(dead)
+
+    def claim(self, run_id: str, worker: str) -> Optional[Dict[str, Any]]:
+        """Pega o próximo job pendente cujas dependências estão todas `done` (atômico entre processos)."""
+        db = self._db()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                "SELECT id FROM jobs j WHERE run_id = ? AND status = ? AND NOT EXISTS ("
+                "  SELECT 1 FROM deps d LEFT JOIN jobs p ON p.id = d.dep_id"
+                "  WHERE d.job_id = j.id AND (p.status IS NULL OR p.status != ?))"
+                " ORDER BY seq LIMIT 1", (run_id, PENDING, DONE)).fetchone()
+            if row is None:
+                db.execute("COMMIT")
+                return None
+            db.execute("UPDATE jobs SET status = ?, worker = ?, lease_until = ?, attempts = attempts + 1, updated = ? WHERE id = ?",
+                       (RUNNING, worker, now + self.lease_s, now, row[0]))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return self.get(row[0])
+
+    def renew(self, jid: str, worker: str) -> bool:
+        """Heartbeat: estende o lease enquanto o handler roda (False se o job não é mais deste worker)."""
+        return self._db().execute("UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status = ?",
+                                  (time.time() + self.lease_s, jid, worker, RUNNING)).rowcount == 1
+
+    def complete(self, jid: str, output: Any):
+        self._db().execute("UPDATE jobs SET status = ?, output = ?, error = NULL, worker = NULL, lease_until = NULL, updated = ? WHERE id = ?",
+                           (DONE, codec.dumps(output, default=str), time.time(), jid))
+
+    def fail(self, jid: str, error: str):
+        """Volta para `pending` enquanto houver tentativas; senão `failed`."""
+        self._db().execute("UPDATE jobs SET status = CASE WHEN attempts < max_attempts THEN ? ELSE ? END,"
+                           " error = ?, worker = NULL, lease_until = NULL, updated = ? WHERE id = ?",
+                           (PENDING, FAILED, error[-4000:], time.time(), jid))
+
+    def retry_failed(self, run_id: str) -> int:
+        """Jobs `failed` do run voltam para `pending` com tentativas zeradas (retomada manual)."""
+        return self._db().execute("UPDATE jobs SET status = ?, attempts = 0, updated = ? WHERE run_id = ? AND status = ?",
+                                  (PENDING, time.time(), run_id, FAILED)).rowcount
+
+    def discard(self, run_id: str, stage: str, keep: Iterable[str] = ()) -> int:
+        """Remove os jobs da etapa cujo `key` não está em `keep` (ex.: tickets que sumiram de um plano novo)."""
+        db = self._db()
+        keep = set(keep)
+        gone = [jid for jid, key in db.execute("SELECT id, key FROM jobs WHERE run_id = ? AND stage = ?", (run_id, stage))
+                if key not in keep]
+        for jid in gone:
+            db.execute("DELETE FROM deps WHERE job_id = ? OR dep_id = ?", (jid, jid))
+            db.execute("DELETE FROM jobs WHERE id = ?", (jid,))
+        return len(gone)
+
+    def reset(self, run_id: str) -> int:
+        """Apaga o run inteiro (próxima execução começa do zero)."""
+        db = self._db()
+        db.execute("DELETE FROM deps WHERE job_id IN (SELECT id FROM jobs WHERE run_id = ?)", (run_id,))
+        return db.execute("DELETE FROM jobs WHERE run_id = ?", (run_id,)).rowcount
+
+    # ---- leitura ----
+
+    def get(self, jid: str) -> Optional[Dict[str, Any]]:
+        row = self._db().execute("SELECT id, run_id, stage, key, input, output, status, attempts, error FROM jobs WHERE id = ?",
+                                 (jid,)).fetchone()
+        if row is None:
+            return None
+        return {"id": row[0], "run_id": row[1], "stage": row[2], "key": row[3],
+                "input": codec.loads(row[4]) if row[4] else None, "output": codec.loads(row[5]) if row[5] else None,
+                "status": row[6], "attempts": row[7], "error": row[8]}
+
+    def output(self, jid: str) -> Any:
+        job = self.get(jid)
+        return job["output"] if job else None
+
+    def jobs(self, run_id: str, stage: Optional[str] = None) -> List[Dict[str, Any]]:
+        sql = "SELECT id FROM jobs WHERE run_id = ?" + (" AND stage = ?" if stage else "") + " ORDER BY seq"
+        return [self.get(r[0]) for r in self._db().execute(sql, (run_id, stage) if stage else (run_id,))]
+
+    def summary(self, run_id: str) -> Dict[str, int]:
+        out = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for status, n in self._db().execute("SELECT status, COUNT(*) FROM jobs WHERE run_id = ? GROUP BY status", (run_id,)):
+            out[status] = n
+        return out
+
+class JobContext:
+    """O que um handler enxerga: a entrada do job, saídas das dependências e `submit` no mesmo run."""
+    def __init__(self, queue: JobQueue, job: Dict[str, Any]):
+        self.queue, self.job = queue, job
+        self.run_id, self.input = job["run_id"], job["input"]
+
+    def dep_output(self, stage: str, key: str = "") -> Any:
+        return self.queue.output(job_id(self.run_id, stage, key))
+
+    def submit(self, stage: str, key: str = "", input: Any = None, deps: Iterable[str] = (), **kw) -> str:
+        return self.queue.submit(self.run_id, stage, key, input, deps, **kw)
+
+def run_jobs(queue: JobQueue, run_id: str, handlers: Dict[str, Callable[[JobContext], Any]],
+             workers: int = 4, idle_s: float = 0.05) -> Dict[str, int]:
+    """
+    Executa o run até não restar job executável: `workers` threads disputam a fila
+    (outros processos podem consumir o mesmo run). Devolve o resumo de status.
+    """
+    queue.requeue_orphans(run_id)
+    host_pid = f"{socket.gethostname()}:{os.getpid()}"
+    busy = [0]
+    lock = threading.Lock()
+    held: Dict[str, str] = {}       # job -> worker, para o heartbeat
+    stop = threading.Event()
+
+    def _heartbeat():
+        try:
+            while not stop.wait(queue.lease_s / 3):
+                with lock:
+                    jobs = list(held.items())
+                for jid, name in jobs:
+                    queue.renew(jid, name)
+        finally:
+            queue.close()
+
+    def _worker(n: int):
+        try:
+            _loop(f"{host_pid}:{n}")
+        finally:
+            queue.close()  # conexão desta thread
+
+    def _loop(name: str):
+        while True:
+            with lock:
+                job = queue.claim(run_id, name)
+                if job is not None:
+                    busy[0] += 1
+                    held[job["id"]] = name
+                elif busy[0] == 0:
+                    return  # nada executável e ninguém rodando: só restam falhas/dependências quebradas
+            if job is None:
+                time.sleep(idle_s)  # outro worker pode liberar dependências
+                continue
+            try:
+                handler = handlers.get(job["stage"])
+                if handler is None:
+                    raise LookupError(f"sem handler para a etapa '{job['stage']}'")
+                queue.complete(job["id"], handler(JobContext(queue, job)))
+            except Exception as e:
+                queue.fail(job["id"], f"{type(e).__name__}: {e}\n{traceback.format_exc(limit=5)}")
+            finally:
+                with lock:
+                    busy[0] -= 1
+                    held.pop(job["id"], None)
+
+    beat = threading.Thread(target=_heartbeat, name="jobs-heartbeat", daemon=True)
+    beat.start()
+    threads = [threading.Thread(target=_worker, args=(n,), name=f"jobs-{n}", daemon=True) for n in range(max(1, workers))]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    stop.set(); beat.join()
+    return queue.summary(run_id)
@@ -1,15 +1,51 @@
-import os, sys, json, time, uuid, threading, queue, subprocess, atexit, shlex, pathlib, logging
+import os, sys, json, time, uuid, random, threading, queue, selectors, subprocess, atexit, shlex, pathlib, logging, itertools, hashlib, tempfile, collections
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Optional, List
-import yaml
+import weakref
+from app.tools.tracing import span
+from app.tools import metrics, codec
+from app.tools.schema import compile_schema
 
 LOG_DIR = pathlib.Path.home() / "aurix" / "data" / "logs"
-LOG_DIR.mkdir(parents=True, exist_ok=True)
 LOG_FILE = LOG_DIR / "mcp.log"
+TOOLS_CACHE_FILE = pathlib.Path.home() / "aurix" / "data" / "cache" / "mcp_tools.json"
+TOOLS_CACHE_REFRESH_S = 3600  # idade a partir da qual o cache é revalidado em background
+BATCH_CAPABILITY = "aurix/batch"  # servidor aceita batch JSON-RPC (array) numa linha
 
-logging.basicConfig(
-    filename=str(LOG_FILE), level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s"
-)
+# Política por servidor (chaves no topo do servidor em servers.yaml) com override por tool
+# em `tools: {<tool>: {...}}`. Timeouts em segundos; retries/hedge só valem para tools `idempotent`.
+POLICY_DEFAULTS: Dict[str, Any] = {
+    "timeout_s": 30,             # tools/call (por tentativa)
+    "initialize_timeout_s": 10,  # handshake (conexão)
+    "list_timeout_s": 10,        # tools/list
+    "retries": 0,                # novas tentativas após timeout/morte do processo
+    "retry_backoff_s": 0.2,      # base do backoff exponencial (com jitter 0.5x-1.5x)
+    "retry_max_backoff_s": 2.0,
+    "hedge": False,              # cópia em outra réplica após hedge_after_s ou o quantil observado
+    "hedge_after_s": None,
+    "hedge_quantile": 0.95,
+    "hedge_min_samples": 20,     # amostras da tool antes de confiar no quantil
+}
+
+log = logging.getLogger("aurix.mcp")
+_log_ready = False
+
+def _setup_logging():
+    """Arquivo de log do cliente MCP; instalado pelo primeiro MCPClient (nada no import, root intocado)."""
+    global _log_ready
+    if _log_ready:
+        return
+    _log_ready = True
+    if log.handlers:
+        return  # já configurado por quem embute o cliente
+    try:
+        LOG_DIR.mkdir(parents=True, exist_ok=True)
+        handler = logging.FileHandler(str(LOG_FILE), encoding="utf-8")
+    except OSError:
+        return
+    handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
+    log.addHandler(handler)
+    log.setLevel(logging.INFO)
 
 def _expand(v: str) -> str:
     # expande ~, $HOME, $USER
@@ -18,16 +54,297 @@ def _expand(v: str) -> str:
 def _now_ms() -> int:
     return int(time.time() * 1000)
 
+class CircuitOpenError(RuntimeError):
+    """Servidor marcado como doente: chamadas falham imediatamente até o fim do backoff."""
+
+class MCPProcessDied(RuntimeError):
+    """O processo do servidor morreu durante (ou antes de) uma requisição."""
+    def __init__(self, msg: str, sent: bool = True):
+        super().__init__(msg)
+        self.sent = sent  # False: a requisição nem chegou ao servidor (retry é seguro)
+
+# processos vivos; um único hook de atexit encerra todos
+_LIVE: "weakref.WeakSet[MCPServerProcess]" = weakref.WeakSet()
+
+def _stop_all():
+    for p in list(_LIVE):
+        try: p.stop()
+        except Exception: pass
+
+atexit.register(_stop_all)
+
+class _Breaker:
+    """
+    Circuit breaker + backoff de restart por servidor.
+    - `threshold` falhas seguidas (timeouts) abrem o circuito por base*2^n s (máx. max_s)
+    - morte do processo agenda o próximo restart com o mesmo backoff exponencial
+    - qualquer resposta válida fecha o circuito e zera o backoff
+    """
+    def __init__(self, name: str, threshold: int = 3, base_s: float = 0.5, max_s: float = 30.0):
+        self.name = name
+        self.threshold = threshold
+        self.base_s = base_s
+        self.max_s = max_s
+        self.failures = 0
+        self.trips = 0
+        self.open_until = 0.0
+        self.deaths = 0
+        self.restart_at = 0.0
+        self._lock = threading.Lock()
+
+    def _delay(self, n: int) -> float:
+        return min(self.max_s, self.base_s * (2 ** max(0, n - 1))) if n > 0 else 0.0
+
+    def allow(self) -> bool:
+        return time.monotonic() >= self.open_until
+
+    def can_restart(self) -> bool:
+        return time.monotonic() >= self.restart_at
+
+    def retry_in(self) -> float:
+        return max(0.0, max(self.open_until, self.restart_at) - time.monotonic())
+
+    def success(self):
+        with self._lock:
+            self.failures = 0; self.trips = 0; self.open_until = 0.0
+            self.deaths = 0; self.restart_at = 0.0
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.trips += 1
+                delay = self._delay(self.trips)
+                self.open_until = time.monotonic() + delay
+                self.failures = self.threshold - 1  # meio-aberto: próxima falha reabre
+                metrics.MCP_BREAKER_TRIPS.inc(server=self.name)
+                log.warning(f"[{self.name}] circuit breaker aberto por {delay:.1f}s")
+
+    def died(self):
+        with self._lock:
+            # 1ª morte reinicia na hora; as seguintes esperam 0.5s, 1s, 2s ... max_s
+            delay = self._delay(self.deaths)
+            self.deaths += 1
+            self.restart_at = time.monotonic() + delay
+
+class _SingleFlight:
+    """
+    Chamadas idênticas concorrentes compartilham uma única execução: a primeira (líder) executa,
+    as demais esperam o resultado dela. Exceção do líder é repassada a todos.
+    """
+    class _Flight:
+        __slots__ = ("done", "result", "error")
+        def __init__(self):
+            self.done = threading.Event()
+            self.result: Any = None
+            self.error: Optional[BaseException] = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Any, "_SingleFlight._Flight"] = {}
+
+    def do(self, key: Any, fn, timeout_s: float):
+        """-> (resultado, compartilhado?). Quem espera além de `timeout_s` recebe TimeoutError."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = self._Flight()
+        if leader:
+            try:
+                flight.result = fn()
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                with self._lock:
+                    self._flights.pop(key, None)
+                flight.done.set()
+            return flight.result, False
+        if not flight.done.wait(timeout_s):
+            raise TimeoutError("timeout aguardando chamada idêntica em voo")
+        if flight.error is not None:
+            raise flight.error
+        return flight.result, True
+
+class _TTLCache:
+    """Cache LRU com expiração por entrada (resultados de tools idempotentes)."""
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._data: "collections.OrderedDict[Any, tuple]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[0] < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return item[1]
+
+    def put(self, key: Any, value: Any, ttl_s: float):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl_s, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def invalidate(self, server: str):
+        """Remove os resultados de um servidor (chave = (server, tool, params))."""
+        with self._lock:
+            for k in [k for k in self._data if k[0] == server]:
+                del self._data[k]
+
+class _Oversize:
+    """Marcador posto na fila quando uma mensagem excede max_message_bytes."""
+    def __init__(self, size: int):
+        self.size = size
+
+class _IOLoop:
+    """
+    Uma única thread de I/O (selectors: epoll/kqueue) para stdout/stderr de todos os filhos MCP.
+    Mensagens completas vão direto para a caixa de entrada do processo, que acorda quem espera
+    pela resposta (Condition por processo): sem thread por stream, sem fila intermediária e
+    sem polling. Registro/remoção de fds rodam na própria thread (via pipe de wakeup).
+    """
+    READ_CHUNK = 256 * 1024
+
+    def __init__(self):
+        self._sel = selectors.DefaultSelector()
+        self._calls: "collections.deque" = collections.deque()
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self._sel.register(self._wake_r, selectors.EVENT_READ, None)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def call_soon(self, fn):
+        self._calls.append(fn)
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="mcp-io", daemon=True)
+                self._thread.start()
+        try:
+            os.write(self._wake_w, b"\0")
+        except BlockingIOError:
+            pass  # já há wakeup pendente
+
+    def add(self, proc: "MCPServerProcess", popen: subprocess.Popen):
+        for stream, kind in ((popen.stdout, "out"), (popen.stderr, "err")):
+            os.set_blocking(stream.fileno(), False)
+        def _register():
+            self._sel.register(popen.stdout, selectors.EVENT_READ, (proc, "out", popen))
+            self._sel.register(popen.stderr, selectors.EVENT_READ, (proc, "err", popen))
+        self.call_soon(_register)
+
+    def pause(self, stream):
+        """Só na thread de I/O: para de ler o stdout (pipe cheio -> backpressure no filho)."""
+        try: self._sel.unregister(stream)
+        except (KeyError, ValueError): pass
+
+    def resume(self, proc: "MCPServerProcess", popen: subprocess.Popen):
+        def _register():
+            if popen.stdout.closed:
+                return
+            try: self._sel.register(popen.stdout, selectors.EVENT_READ, (proc, "out", popen))
+            except (KeyError, ValueError): pass
+        self.call_soon(_register)
+
+    def remove(self, popen: subprocess.Popen):
+        """Desregistra e fecha os pipes de leitura na thread de I/O (fd nunca é reusado registrado)."""
+        def _close():
+            for stream in (popen.stdout, popen.stderr):
+                try: self._sel.unregister(stream)
+                except (KeyError, ValueError): pass
+                try: stream.close()
+                except Exception: pass
+        self.call_soon(_close)
+
+    def _run(self):
+        while True:
+            for key, _ in self._sel.select():
+                if key.data is None:
+                    try:
+                        while os.read(self._wake_r, 4096): pass
+                    except BlockingIOError:
+                        pass
+                    while self._calls:
+                        try: self._calls.popleft()()
+                        except Exception as e: log.warning(f"[mcp-io] {e}")
+                    continue
+                proc, kind, popen = key.data
+                try:
+                    chunk = os.read(key.fd, self.READ_CHUNK)
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    chunk = b""
+                if not chunk:
+                    self.pause(key.fileobj)
+                    proc._on_eof(kind, popen)
+                elif kind == "out":
+                    if proc._on_stdout(chunk, popen):
+                        self.pause(key.fileobj)
+                else:
+                    proc._on_stderr(chunk)
+
+_IO: Optional[_IOLoop] = None
+_IO_LOCK = threading.Lock()
+
+def _io() -> _IOLoop:
+    """Loop de I/O criado no primeiro processo iniciado (selector + pipe só quando necessários)."""
+    global _IO
+    if _IO is None:
+        with _IO_LOCK:
+            if _IO is None:
+                _IO = _IOLoop()
+    return _IO
+
 class MCPServerProcess:
-    def __init__(self, name: str, cmd: List[str], cwd: Optional[str] = None):
+    """
+    Processo filho MCP (stdio, uma mensagem JSON por linha).
+    - stdout lido em bytes pela thread de I/O compartilhada (_IOLoop), enquadrado por '\\n',
+      com limite de tamanho por mensagem. Com a caixa de entrada cheia a leitura pausa
+      (backpressure via pipe), então nenhuma resposta é descartada.
+    - quem espera resposta é acordado na hora (mensagem, EOF ou prazo), sem polling.
+    - stderr vai para um ring buffer (últimas linhas) com log limitado por taxa.
+    """
+    STDERR_LOG_PER_S = 20
+
+    def __init__(self, name: str, cmd: List[str], cwd: Optional[str] = None,
+                 max_message_bytes: int = 64 * 1024 * 1024, queue_size: int = 1024, stderr_lines: int = 500):
         self.name = name
         self.cmd = cmd
         self.cwd = _expand(cwd) if cwd else None
         self.proc: Optional[subprocess.Popen] = None
-        self.out_q: "queue.Queue[str]" = queue.Queue(maxsize=10000)
-        self.err_q: "queue.Queue[str]" = queue.Queue(maxsize=10000)
+        self.max_message_bytes = max_message_bytes
+        self.queue_size = queue_size
+        self.stderr_tail: "collections.deque[str]" = collections.deque(maxlen=stderr_lines)
+        self.stderr_suppressed = 0
         self._lock = threading.Lock()
-        self._reader_threads: List[threading.Thread] = []
+        self._cond = threading.Condition()
+        self._inbox: "collections.deque[Any]" = collections.deque()
+        self.eof = False          # stdout do processo atual fechou (morreu)
+        self._paused = False
+        self._buf = bytearray()
+        self._skipping = 0        # > 0: descartando o restante de uma mensagem grande demais
+        self._err_buf = b""
+        self._err_window = (0.0, 0)
+        self.io_lock = threading.Lock()   # uma requisição em voo por processo
+        self.blob_dir: Optional[str] = None  # canal de blobs negociado no initialize (app/mcp/blob_channel.py)
+        self.batch = False                   # servidor anunciou BATCH_CAPABILITY
+        self.ready = threading.Event()    # handshake concluído
+
+    def alive(self) -> bool:
+        # stdout fechado = processo inútil, mesmo que ainda não tenha sido colhido pelo SO
+        return self.proc is not None and not self.eof and self.proc.poll() is None
+
+    def pending(self) -> int:
+        return len(self._inbox)
 
     def start(self):
         with self._lock:
@@ -36,44 +353,107 @@ class MCPServerProcess:
             # Fallback: se "uvx" não existe, troca por "mcp-server-git"
             if self.cmd and self.cmd[0] == "uvx" and not shutil.which("uvx"):
                 self.cmd = ["mcp-server-git"] + self.cmd[2:]
-            logging.info(f"[{self.name}] start: {self.cmd} cwd={self.cwd}")
+            log.info(f"[{self.name}] start: {self.cmd} cwd={self.cwd}")
+            if self.proc is not None:
+                _io().remove(self.proc)
+            self._drop_blobs()  # restart: o handshake cria um diretório novo
+            with self._cond:
+                self._inbox.clear()
+                self.eof = False; self._paused = False
+                self._buf = bytearray(); self._skipping = 0; self._err_buf = b""
             self.proc = subprocess.Popen(
                 self.cmd,
                 stdin=subprocess.PIPE,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 cwd=self.cwd,
-                text=True,
-                bufsize=1
             )
-            self._start_readers()
-            atexit.register(self.stop)
+            _io().add(self, self.proc)
+            _LIVE.add(self)
 
-    def _start_readers(self):
-        def _pump(stream, q: "queue.Queue[str]", tag: str):
-            while True:
-                if stream is None:
-                    break
-                line = stream.readline()
-                if not line:
-                    break
-                try:
-                    q.put_nowait(line)
-                except queue.Full:
-                    # drop overflow
-                    pass
-                if tag == "stderr":
-                    logging.debug(f"[{self.name}] STDERR: {line.strip()}")
+    # ---- callbacks da thread de I/O ----
 
-        t1 = threading.Thread(target=_pump, args=(self.proc.stdout, self.out_q, "stdout"), daemon=True)
-        t2 = threading.Thread(target=_pump, args=(self.proc.stderr, self.err_q, "stderr"), daemon=True)
-        t1.start(); t2.start()
-        self._reader_threads = [t1, t2]
+    def _on_stdout(self, chunk: bytes, popen: subprocess.Popen) -> bool:
+        """Enquadra o bloco em mensagens; True = caixa cheia, pausar a leitura."""
+        if popen is not self.proc:
+            return False
+        out: List[Any] = []
+        start = 0
+        while True:
+            nl = chunk.find(b"\n", start)
+            if nl < 0:
+                piece = chunk[start:]
+                if self._skipping:
+                    self._skipping += len(piece)
+                else:
+                    self._buf += piece
+                    if len(self._buf) > self.max_message_bytes:
+                        self._skipping = len(self._buf); self._buf = bytearray()
+                break
+            piece = chunk[start:nl]
+            start = nl + 1
+            if self._skipping:
+                size = self._skipping + len(piece); self._skipping = 0
+                out.append(self._overflow(size))
+                continue
+            if self._buf:
+                self._buf += piece; line = bytes(self._buf); self._buf = bytearray()
+            else:
+                line = piece
+            if len(line) > self.max_message_bytes:
+                out.append(self._overflow(len(line)))
+            elif line.strip():
+                out.append(line)
+        if not out:
+            return False
+        with self._cond:
+            self._inbox.extend(out)
+            self._cond.notify_all()
+            if len(self._inbox) >= self.queue_size:
+                self._paused = True
+        return self._paused
+
+    def _on_eof(self, kind: str, popen: subprocess.Popen):
+        if popen is not self.proc or kind != "out":
+            return
+        with self._cond:
+            if self._buf.strip():
+                self._inbox.append(bytes(self._buf))
+            self._buf = bytearray()
+            self.eof = True
+            self._cond.notify_all()
+
+    def _overflow(self, size: int) -> _Oversize:
+        metrics.MCP_OVERSIZE.inc(server=self.name)
+        log.error(f"[{self.name}] mensagem de {size} bytes excede max_message_bytes={self.max_message_bytes}")
+        return _Oversize(size)
+
+    def _on_stderr(self, chunk: bytes):
+        data = self._err_buf + chunk
+        *lines, self._err_buf = data.split(b"\n")
+        window_start, logged = self._err_window
+        for raw in lines:
+            line = raw.decode("utf-8", "replace").rstrip()
+            if len(self.stderr_tail) == self.stderr_tail.maxlen:
+                metrics.MCP_DROPPED.inc(server=self.name, stream="stderr")
+            self.stderr_tail.append(line)
+            now = time.monotonic()
+            if now - window_start >= 1.0:
+                if self.stderr_suppressed:
+                    log.info(f"[{self.name}] STDERR: {self.stderr_suppressed} linha(s) suprimida(s)")
+                    self.stderr_suppressed = 0
+                window_start, logged = now, 0
+            if logged < self.STDERR_LOG_PER_S:
+                logged += 1
+                log.debug(f"[{self.name}] STDERR: {line}")
+            else:
+                self.stderr_suppressed += 1
+        self._err_window = (window_start, logged)
 
     def stop(self):
         with self._lock:
             if self.proc and self.proc.poll() is None:
-                logging.info(f"[{self.name}] stop")
+                log.info(f"[{self.name}] stop")
                 try:
                     self.proc.terminate()
                     try:
@@ -82,107 +462,491 @@ class MCPServerProcess:
                         self.proc.kill()
                 except Exception:
                     pass
+            if self.proc is not None:
+                try: self.proc.stdin.close()
+                except Exception: pass
+                _io().remove(self.proc)
             self.proc = None
+            self._drop_blobs()
+            with self._cond:
+                self.eof = True
+                self._cond.notify_all()
+
+    def _drop_blobs(self):
+        """Blobs que ninguém consumiu (resposta perdida num timeout/crash) morrem com o processo."""
+        if self.blob_dir:
+            from app.mcp import blob_channel
+            blob_channel.remove_dir(self.blob_dir)
+            self.blob_dir = None
 
-    def send_line(self, line: str):
+    def send_line(self, line: str | bytes):
         if not self.proc or self.proc.poll() is not None:
-            raise RuntimeError(f"{self.name}: processo não iniciado")
+            raise MCPProcessDied(f"{self.name}: processo não iniciado", sent=False)
         assert self.proc.stdin is not None
-        self.proc.stdin.write(line + "\n")
-        self.proc.stdin.flush()
-
-    def read_line(self, timeout_s: float) -> Optional[str]:
+        data = line if isinstance(line, bytes) else line.encode("utf-8")
         try:
-            return self.out_q.get(timeout=timeout_s)
-        except queue.Empty:
-            return None
+            self.proc.stdin.write(data + b"\n")
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError, ValueError) as e:
+            raise MCPProcessDied(f"{self.name}: pipe fechado ({e})", sent=False)
+
+    def read_line(self, timeout_s: float) -> Optional[Any]:
+        """
+        Próxima mensagem (bytes) ou marcador _Oversize. Bloqueia até chegar mensagem, o stdout
+        fechar (`eof`) ou o prazo acabar; None nos dois últimos casos.
+        """
+        with self._cond:
+            if not self._inbox and not self.eof:
+                self._cond.wait(timeout_s)
+            if not self._inbox:
+                return None
+            item = self._inbox.popleft()
+            resume = self._paused and len(self._inbox) <= self.queue_size // 2
+            if resume:
+                self._paused = False
+        if resume and self.proc is not None:
+            _io().resume(self, self.proc)
+        return item
 
 import shutil
 
+class ToolSchemaCache:
+    """
+    Cache em disco de tools/list + serverInfo, chaveado pelo comando do servidor.
+    Uma entrada só vale se o serverInfo (nome/versão) do initialize atual bater com o salvo.
+    """
+    def __init__(self, path: pathlib.Path):
+        self.path = pathlib.Path(path).expanduser()
+        self._lock = threading.Lock()
+        self._data: Optional[Dict[str, Any]] = None
+
+    @staticmethod
+    def key(cmd: List[str]) -> str:
+        return hashlib.sha256(json.dumps(cmd).encode("utf-8")).hexdigest()[:16]
+
+    def _load(self) -> Dict[str, Any]:
+        if self._data is None:
+            try:
+                self._data = codec.loads(self.path.read_bytes())
+            except Exception:
+                self._data = {}
+        return self._data
+
+    def get(self, cmd: List[str], server_info: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._load().get(self.key(cmd))
+        if not entry or not isinstance(entry.get("tools"), list):
+            return None
+        if server_info and entry.get("serverInfo") != server_info:
+            return None  # versão mudou -> invalida
+        if not server_info and time.time() - entry.get("saved_at", 0) > TOOLS_CACHE_REFRESH_S:
+            return None  # sem versão para comparar: só confia em entrada recente
+        return entry
+
+    def put(self, cmd: List[str], server_info: Optional[Dict[str, Any]], tools: List[Dict[str, Any]]):
+        with self._lock:
+            data = self._load()
+            data[self.key(cmd)] = {"command": cmd, "serverInfo": server_info, "tools": tools, "saved_at": time.time()}
+            payload = codec.dumps(data)
+        tmp = None
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix=".tmp_", dir=str(self.path.parent))
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            if tmp is not None:
+                try: os.unlink(tmp)  # falhou no write/replace: não deixa o .tmp_ no diretório
+                except OSError: pass
+            log.warning(f"[cache] não foi possível salvar {self.path}: {e}")
+
 class MCPClient:
-    def __init__(self, servers_yaml_path: pathlib.Path):
+    def __init__(self, servers_yaml_path: pathlib.Path, tools_cache: Optional[pathlib.Path] = None):
+        _setup_logging()
         self.path = servers_yaml_path
         self.path = pathlib.Path(_expand(str(self.path)))
         self.servers_cfg = self._load_yaml()
-        self._proc_map: Dict[str, MCPServerProcess] = {}
-        self._proc_lock = threading.Lock()
+        self._proc_map: Dict[str, MCPServerProcess] = {}        # name -> réplica primária
+        self._pools: Dict[str, List[MCPServerProcess]] = {}     # name -> réplicas
+        self._server_locks: Dict[str, threading.Lock] = {}
+        self._rr = itertools.count()
+        self._breakers: Dict[str, _Breaker] = {}
+        self._supervisor: Optional[threading.Thread] = None
+        self._supervisor_stop = threading.Event()
+        self._proc_lock = threading.Lock()  # protege apenas os dicts acima (nunca durante spawn/handshake)
         self._tool_cache: Dict[str, List[Dict[str, Any]]] = {}  # name -> tools
+        self._tool_index: Dict[str, Dict[str, Dict[str, Any]]] = {}  # name -> {tool: spec}
+        self._server_info: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._disk_cache = ToolSchemaCache(tools_cache or os.environ.get("AURIX_MCP_TOOLS_CACHE") or TOOLS_CACHE_FILE)
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
+        self._flights = _SingleFlight()
+        self._results = _TTLCache()
+        ref = weakref.ref(self)
+        metrics.MCP_QUEUE_DEPTH.add_callback(lambda: MCPClient._queue_depths(ref))
+        metrics.start_exporters_from_env()
+
+    @staticmethod
+    def _queue_depths(ref):
+        client = ref()
+        if client is None:
+            return []
+        out = []
+        for name, pool in list(client._pools.items()):
+            out.append(({"server": name, "stream": "stdout"}, sum(p.pending() for p in pool)))
+            out.append(({"server": name, "stream": "stderr"}, sum(len(p.stderr_tail) for p in pool)))
+        return out
 
     def _load_yaml(self) -> Dict[str, Any]:
         if not self.path.exists():
             raise FileNotFoundError(f"servers.yaml não encontrado: {self.path}")
+        import yaml
         data = yaml.safe_load(self.path.read_text(encoding="utf-8")) or {}
         servers = data.get("servers", {})
         # expandir env nos args
         for name, cfg in servers.items():
             cmd = cfg.get("command", [])
             servers[name]["command"] = [ _expand(str(x)) for x in cmd ]
-            logging.info(f"[YAML] {name}: {servers[name]['command']}")
+            log.info(f"[YAML] {name}: {servers[name]['command']}")
         return servers
 
+    def _server_lock(self, name: str) -> threading.Lock:
+        with self._proc_lock:
+            lk = self._server_locks.get(name)
+            if lk is None:
+                lk = self._server_locks[name] = threading.Lock()
+            return lk
+
+    def policy(self, server: str, tool: Optional[str] = None) -> Dict[str, Any]:
+        """Timeouts/retries/hedge efetivos: defaults < servidor < `tools.<tool>`."""
+        cfg = self.servers_cfg.get(server) or {}
+        pol = {k: cfg.get(k, v) for k, v in POLICY_DEFAULTS.items()}
+        if tool:
+            override = (cfg.get("tools") or {}).get(tool)
+            if isinstance(override, dict):
+                pol.update({k: v for k, v in override.items() if k in POLICY_DEFAULTS})
+        return pol
+
+    def breaker(self, name: str) -> _Breaker:
+        with self._proc_lock:
+            b = self._breakers.get(name)
+            if b is None:
+                cfg = self.servers_cfg.get(name) or {}
+                b = self._breakers[name] = _Breaker(name, threshold=int(cfg.get("max_failures", 3)),
+                                                    max_s=float(cfg.get("backoff_max_s", 30.0)))
+            return b
+
+    def _replicas(self, name: str) -> int:
+        cfg = self.servers_cfg.get(name) or {}
+        try:
+            return max(1, int(cfg.get("replicas", 1)))
+        except (TypeError, ValueError):
+            return 1
+
+    def _spawn(self, name: str) -> List[MCPServerProcess]:
+        """
+        Garante `replicas` processos vivos e com handshake feito para o servidor.
+        Usa lock por servidor: o cold start de um servidor não bloqueia os demais.
+        """
+        pool = self._pools.get(name)
+        if pool and all(p.alive() and p.ready.is_set() for p in pool):
+            return pool
+        cfg = self.servers_cfg.get(name)
+        if not cfg:
+            raise KeyError(f"server '{name}' não definido em {self.path}")
+        with self._server_lock(name):
+            pool = list(self._pools.get(name) or [])
+            alive = [p for p in pool if p.alive()]
+            if len(alive) < len(pool):
+                b = self.breaker(name)
+                if not b.can_restart():
+                    if alive:
+                        return alive
+                    raise CircuitOpenError(f"{name}: processo morto; restart em {b.retry_in():.1f}s")
+                for p in pool:
+                    if not p.alive():
+                        p.stop()  # colhe o processo e apaga os blobs que ele deixou
+                        metrics.MCP_RESTARTS.inc(server=name)
+            new: List[MCPServerProcess] = []
+            while len(alive) + len(new) < self._replicas(name):
+                proc = MCPServerProcess(name, cfg["command"], cwd=cfg.get("cwd"),
+                                        max_message_bytes=int(cfg.get("max_message_bytes", 64 * 1024 * 1024)))
+                proc.start()
+                metrics.MCP_STARTS.inc(server=name)
+                new.append(proc)
+            # handshakes das réplicas novas em paralelo
+            if len(new) == 1:
+                self._handshake(new[0])
+            elif new:
+                with ThreadPoolExecutor(max_workers=len(new)) as ex:
+                    list(ex.map(self._handshake, new))
+            pool = alive + new
+            with self._proc_lock:
+                self._pools[name] = pool
+                self._proc_map[name] = pool[0]
+            return pool
+
+    def _pick(self, name: str) -> MCPServerProcess:
+        """Réplica livre (round-robin a partir do próximo índice); se todas ocupadas, round-robin puro."""
+        pool = self._spawn(name)
+        if len(pool) == 1:
+            return pool[0]
+        start = next(self._rr)
+        for i in range(len(pool)):
+            p = pool[(start + i) % len(pool)]
+            if not p.io_lock.locked():
+                return p
+        return pool[start % len(pool)]
+
     def ensure_started(self, name: str) -> MCPServerProcess:
+        return self._pick(name)
+
+    def close(self):
+        """Encerra todas as réplicas de todos os servidores."""
+        self._supervisor_stop.set()
         with self._proc_lock:
-            if name in self._proc_map and self._proc_map[name].proc and self._proc_map[name].proc.poll() is None:
-                return self._proc_map[name]
-            cfg = self.servers_cfg.get(name)
-            if not cfg:
-                raise KeyError(f"server '{name}' não definido em {self.path}")
-            proc = MCPServerProcess(name, cfg["command"])
-            proc.start()
-            self._proc_map[name] = proc
-            self._initialize(name)  # handshake
-            return proc
+            pools = list(self._pools.values())
+            self._pools.clear(); self._proc_map.clear()
+        for pool in pools:
+            for p in pool:
+                p.stop()
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
+            self._hedge_pool = None
+
+    def start_supervisor(self, interval_s: float = 15.0, ping_timeout_s: float = 5.0):
+        """
+        Thread de supervisão: a cada `interval_s` faz ping (liveness) nas réplicas ociosas,
+        mata as que não respondem dentro de `ping_timeout_s` e reinicia servidores mortos
+        respeitando o backoff (replay do handshake em _spawn).
+        """
+        if self._supervisor and self._supervisor.is_alive():
+            return
+        self._supervisor_stop.clear()
+        def _loop():
+            while not self._supervisor_stop.wait(interval_s):
+                for name, pool in list(self._pools.items()):
+                    for p in list(pool):
+                        if not p.alive():
+                            continue
+                        if not p.io_lock.acquire(blocking=False):
+                            continue  # ocupado = vivo o bastante
+                        p.io_lock.release()
+                        try:
+                            self._send_and_wait(p, self._jsonrpc("ping", {}), timeout_s=ping_timeout_s)
+                        except Exception as e:
+                            log.error(f"[{name}] liveness falhou ({e}); matando processo")
+                            self.breaker(name).died()
+                            p.stop()
+                    if any(not p.alive() for p in pool) and self.breaker(name).can_restart():
+                        try:
+                            self._spawn(name)
+                        except Exception as e:
+                            log.warning(f"[{name}] restart falhou: {e}")
+        self._supervisor = threading.Thread(target=_loop, name="mcp-supervisor", daemon=True)
+        self._supervisor.start()
+
+    def warmup(self, names: Optional[List[str]] = None, wait: bool = True) -> Dict[str, str]:
+        """
+        Pré-inicia servidores (default: todos do servers.yaml sem `warmup: false`) em paralelo.
+        wait=False dispara em background e retorna imediatamente.
+        """
+        if names is None:
+            names = [n for n, c in self.servers_cfg.items() if c.get("warmup", True)]
+        def _one(n: str) -> str:
+            try:
+                self._spawn(n); return "ok"
+            except Exception as e:
+                log.warning(f"[{n}] warmup falhou: {e}")
+                return f"erro: {e}"
+        if not names:
+            return {}
+        if not wait:
+            for n in names:
+                threading.Thread(target=_one, args=(n,), name=f"mcp-warmup-{n}", daemon=True).start()
+            return {n: "started" for n in names}
+        with ThreadPoolExecutor(max_workers=len(names)) as ex:
+            return dict(zip(names, ex.map(_one, names)))
 
     def _jsonrpc(self, method: str, params: Dict[str, Any]) -> Dict[str, Any]:
         return {"jsonrpc":"2.0","id":str(uuid.uuid4()),"method":method,"params":params}
 
     def _send_and_wait(self, proc: MCPServerProcess, req: Dict[str, Any], timeout_s: int) -> Dict[str, Any]:
-        deadline = time.time() + timeout_s
-        proc.send_line(json.dumps(req))
-        wanted = req["id"]
-        buf = []
-        while time.time() < deadline:
-            line = proc.read_line(timeout_s=min(0.2, max(0.01, deadline - time.time())))
-            if not line:
-                continue
-            buf.append(line)
-            line = line.strip()
-            if not line.startswith("{"):
-                continue
-            try:
-                obj = json.loads(line)
-            except Exception:
-                continue
-            if obj.get("id") == wanted or ("result" in obj or "error" in obj):
-                return obj
-        raise TimeoutError(f"{proc.name}: timeout aguardando resposta de {req.get('method')}")
+        with proc.io_lock:
+            deadline = time.monotonic() + timeout_s
+            proc.send_line(codec.dumpb(req))
+            wanted = req["id"]
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                line = proc.read_line(remaining)
+                if line is None:
+                    if proc.eof or not proc.alive():
+                        raise MCPProcessDied(f"{proc.name}: processo morreu aguardando {req.get('method')}")
+                    continue
+                if isinstance(line, _Oversize):
+                    # com io_lock só há uma requisição em voo: a mensagem perdida é a nossa
+                    raise RuntimeError(f"{proc.name}: resposta de {line.size} bytes excede max_message_bytes")
+                line = line.strip()
+                if not line.startswith(b"{"):
+                    continue
+                env = codec.decode_response(line)
+                if env is None:
+                    continue
+                if env.id == wanted or (env.id is None and (env.has_result or env.error is not None)):
+                    obj = env.to_dict()
+                    if proc.blob_dir and env.has_result:
+                        self._resolve_blob(proc, obj)
+                    return obj
+                # resposta atrasada de requisição anterior (timeout) -> descarta (e o blob dela)
+                if proc.blob_dir and env.has_result:
+                    self._discard_blob(proc, env.result)
+            raise TimeoutError(f"{proc.name}: timeout aguardando resposta de {req.get('method')}")
 
-    def _initialize(self, name: str):
-        proc = self._proc_map[name]
-        logging.info(f"[{name}] initialize")
+    def _send_batch_and_wait(self, proc: MCPServerProcess, reqs: List[Dict[str, Any]], timeout_s: int) -> Dict[str, Dict[str, Any]]:
+        """Envia um batch (array JSON-RPC) numa linha e devolve {id: resposta}."""
+        with proc.io_lock:
+            deadline = time.monotonic() + timeout_s
+            proc.send_line(codec.dumpb(reqs))
+            wanted = {r["id"] for r in reqs}
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                line = proc.read_line(remaining)
+                if line is None:
+                    if proc.eof or not proc.alive():
+                        raise MCPProcessDied(f"{proc.name}: processo morreu aguardando batch")
+                    continue
+                if isinstance(line, _Oversize):
+                    raise RuntimeError(f"{proc.name}: resposta de {line.size} bytes excede max_message_bytes")
+                line = line.strip()
+                if line.startswith(b"{"):
+                    env = codec.decode_response(line)
+                    if env is not None and env.id is None and env.error is not None:
+                        raise RuntimeError(f"{proc.name}: batch rejeitado: {env.error}")
+                    if env is not None and proc.blob_dir and env.has_result:
+                        self._discard_blob(proc, env.result)
+                    continue  # resposta atrasada de requisição anterior
+                if not line.startswith(b"["):
+                    continue
+                try:
+                    items = codec.loads(line)
+                except ValueError:
+                    continue
+                out: Dict[str, Dict[str, Any]] = {}
+                for obj in items:
+                    if isinstance(obj, dict) and obj.get("id") in wanted:
+                        if proc.blob_dir and "result" in obj:
+                            self._resolve_blob(proc, obj)
+                        out[obj["id"]] = obj
+                    elif isinstance(obj, dict) and proc.blob_dir and "result" in obj:
+                        self._discard_blob(proc, obj["result"])
+                if out:
+                    return out
+            raise TimeoutError(f"{proc.name}: timeout aguardando batch de {len(reqs)} chamada(s)")
+
+    @staticmethod
+    def _resolve_blob(proc: MCPServerProcess, obj: Dict[str, Any]):
+        from app.mcp import blob_channel  # import tardio: app.mcp importa este módulo
+        if blob_channel.is_handle(obj["result"]):
+            handle = obj["result"][blob_channel.CAPABILITY]
+            obj["result"] = blob_channel.load(handle, proc.blob_dir)
+            metrics.MCP_BLOB_BYTES.inc(handle.get("size") or 0, server=proc.name)
+
+    @staticmethod
+    def _discard_blob(proc: MCPServerProcess, result: Any):
+        from app.mcp import blob_channel
+        if blob_channel.discard(result, proc.blob_dir):
+            log.debug(f"[{proc.name}] blob de resposta atrasada removido")
+
+    def _handshake(self, proc: MCPServerProcess):
+        name = proc.name
+        cfg = self.servers_cfg.get(name) or {}
+        log.info(f"[{name}] initialize")
+        caps: Dict[str, Any] = {}
+        offer = None
+        if cfg.get("blob", True):
+            from app.mcp import blob_channel
+            # diretório por processo: o que ficar para trás sai junto no stop/restart
+            proc.blob_dir = blob_channel.client_dir()
+            offer = blob_channel.client_capability(int(cfg.get("blob_min_bytes", blob_channel.DEFAULT_MIN_BYTES)), proc.blob_dir)
+            caps["experimental"] = {blob_channel.CAPABILITY: offer}
         init = self._jsonrpc("initialize", {
             "protocolVersion": "2024-11-05",
-            "capabilities": {},
+            "capabilities": caps,
             "clientInfo": {
                 "name": "aurix-mcp-client",
                 "version": "1.0.0"
             }
         })
+        info = None
         try:
-            self._send_and_wait(proc, init, timeout_s=10)
+            resp = self._send_and_wait(proc, init, timeout_s=float(self.policy(name)["initialize_timeout_s"]))
+            result = resp.get("result")
+            info = result.get("serverInfo") if isinstance(result, dict) else None
+            if offer is not None:
+                from app.mcp import blob_channel
+                if not blob_channel.negotiated(result):
+                    proc._drop_blobs()
+            experimental = ((result or {}).get("capabilities") or {}).get("experimental") or {}
+            proc.batch = isinstance(experimental, dict) and BATCH_CAPABILITY in experimental
         except Exception as e:
-            logging.warning(f"[{name}] initialize falhou: {e}")
-        # listar ferramentas
+            log.warning(f"[{name}] initialize falhou: {e}")
+        self._server_info[name] = info
+        # listar ferramentas (uma vez por servidor; réplicas compartilham o cache)
+        if not self._tool_cache.get(name):
+            cmd = self.servers_cfg[name]["command"]
+            entry = self._disk_cache.get(cmd, info)
+            metrics.CACHE_LOOKUPS.inc(cache="mcp_tools_disk", result="hit" if entry else "miss")
+            if entry:
+                self._set_tools(name, entry["tools"])
+                if time.time() - entry.get("saved_at", 0) > TOOLS_CACHE_REFRESH_S:
+                    threading.Thread(target=self._refresh_tools, args=(name, proc), daemon=True,
+                                     name=f"mcp-tools-refresh-{name}").start()
+            else:
+                self._refresh_tools(name, proc)
+        proc.ready.set()
+
+    def _set_tools(self, name: str, tools: List[Dict[str, Any]]):
+        self._tool_cache[name] = tools
+        self._tool_index[name] = {t["name"]: t for t in tools if isinstance(t, dict) and t.get("name")}
+
+    def _refresh_tools(self, name: str, proc: Optional[MCPServerProcess] = None):
+        """tools/list no servidor; atualiza memória e cache em disco."""
         try:
-            tools = self._list_tools(name)
-            self._tool_cache[name] = tools
+            tools = self._list_tools(name, proc)
         except Exception as e:
-            logging.error(f"[{name}] tools/list falhou: {e}")
+            log.error(f"[{name}] tools/list falhou: {e}")
+            return
+        self._set_tools(name, tools)
+        self._disk_cache.put(self.servers_cfg[name]["command"], self._server_info.get(name), tools)
+
+    def _with_timeout(self, server: str, tool: str, params: Dict[str, Any], timeout_s: float) -> Dict[str, Any]:
+        """
+        Tool que declara `timeout_s` no inputSchema recebe o timeout da política (com folga), para o
+        servidor desistir antes do cliente: senão ele segue ocupado com uma chamada já abandonada e
+        a próxima fica na fila atrás dela.
+        """
+        spec = (self._tool_index.get(server) or {}).get(tool) or {}
+        props = (spec.get("inputSchema") or {}).get("properties") if isinstance(spec.get("inputSchema"), dict) else None
+        if not isinstance(props, dict) or "timeout_s" not in props or "timeout_s" in params:
+            return params
+        return {**params, "timeout_s": round(timeout_s * 0.9, 3)}
 
-    def _list_tools(self, name: str) -> List[Dict[str, Any]]:
-        proc = self._proc_map[name]
+    def validate_args(self, server: str, tool: str, params: Dict[str, Any]) -> List[str]:
+        """Erros de validação de `params` contra o inputSchema da tool (lista vazia = ok)."""
+        spec = (self._tool_index.get(server) or {}).get(tool)
+        schema = spec.get("inputSchema") if spec else None
+        if not isinstance(schema, dict):
+            return []
+        return compile_schema(schema)(params)
+
+    def _list_tools(self, name: str, proc: Optional[MCPServerProcess] = None) -> List[Dict[str, Any]]:
+        proc = proc or self._pick(name)
         req = self._jsonrpc("tools/list", {})
-        resp = self._send_and_wait(proc, req, timeout_s=10)
+        resp = self._send_and_wait(proc, req, timeout_s=float(self.policy(name)["list_timeout_s"]))
         if "result" in resp and isinstance(resp["result"], dict):
             tools = resp["result"].get("tools") or resp["result"].get("data") or []
             if isinstance(tools, list):
@@ -192,37 +956,277 @@ class MCPClient:
             return resp["result"]
         raise RuntimeError(f"{name}: resposta inesperada de tools/list -> {resp}")
 
-    def call(self, server: str, tool: str, params: Dict[str, Any], timeout_s: int = 30) -> Dict[str, Any]:
-        proc = self.ensure_started(server)
+    def call(self, server: str, tool: str, params: Dict[str, Any], timeout_s: Optional[float] = None,
+             dedupe: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        Executa `tool` no servidor. `dedupe` (default: opção `dedupe` do servidor, ou tool listada
+        em `idempotent`) faz chamadas idênticas concorrentes compartilharem uma única requisição;
+        tools `idempotent` ainda têm o resultado ok guardado por `cache_ttl_s`.
+        `timeout_s` (por tentativa) default vem da política do servidor/tool (ver `policy()`).
+        """
+        if timeout_s is None:
+            timeout_s = float(self.policy(server, tool)["timeout_s"])
+        with span("mcp.call", server=server, tool=tool, timeout_s=timeout_s) as sp:
+            t0 = time.perf_counter()
+            try:
+                res = self._call_shared(server, tool, params, timeout_s, dedupe, sp)
+            except Exception:
+                metrics.MCP_CALLS.inc(server=server, tool=tool, outcome="error")
+                raise
+            metrics.MCP_LATENCY.observe(time.perf_counter() - t0, server=server, tool=tool)
+            if res.get("ok"):
+                outcome = "ok"
+            else:
+                outcome = "timeout" if "timeout" in str(res.get("error", "")).lower() else "error"
+            metrics.MCP_CALLS.inc(server=server, tool=tool, outcome=outcome)
+            sp.set(ok=res.get("ok"), outcome=outcome)
+            return res
+
+    def call_batch(self, server: str, calls: List[Any], timeout_s: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Várias tools do mesmo servidor numa única mensagem JSON-RPC (array).
+        `calls`: [(tool, params), ...] ou [{"tool": ..., "params": ...}, ...]; resultados na mesma
+        ordem e no formato de `call()`. Servidores sem `aurix/batch` no initialize recebem as chamadas
+        uma a uma (em paralelo entre réplicas). Batch não passa pelo single-flight/cache.
+        """
+        items = [(c["tool"], c.get("params") or {}) if isinstance(c, dict) else (c[0], c[1]) for c in calls]
+        if not items:
+            return []
+        if timeout_s is None:
+            timeout_s = float(self.policy(server)["timeout_s"])
+        with span("mcp.call_batch", server=server, size=len(items)) as sp:
+            breaker = self.breaker(server)
+            if not breaker.allow():
+                err = f"{server}: circuit breaker aberto (retry em {breaker.retry_in():.1f}s)"
+                return [{"ok": False, "error": err} for _ in items]
+            try:
+                proc = self._pick(server)
+            except CircuitOpenError as e:
+                return [{"ok": False, "error": str(e)} for _ in items]
+            if not proc.batch:
+                sp.set(batched=False)
+                workers = min(len(items), len(self._pools.get(server) or ()) or 1)
+                if workers == 1:
+                    return [self.call(server, t, p, timeout_s) for t, p in items]
+                with ThreadPoolExecutor(max_workers=workers) as ex:
+                    return list(ex.map(lambda tp: self.call(server, tp[0], tp[1], timeout_s), items))
+
+            results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+            reqs: List[Dict[str, Any]] = []
+            index: Dict[str, int] = {}
+            validate = (self.servers_cfg.get(server) or {}).get("validate", True)
+            for i, (tool, params) in enumerate(items):
+                errs = self.validate_args(server, tool, params) if validate else []
+                if errs:
+                    results[i] = {"ok": False, "error": f"parâmetros inválidos para {server}::{tool}: " + "; ".join(errs[:5])}
+                    continue
+                req = self._jsonrpc("tools/call", {"name": tool, "arguments": params})
+                index[req["id"]] = i
+                reqs.append(req)
+
+            resps: Dict[str, Dict[str, Any]] = {}
+            failure = "sem resposta no batch"
+            t0 = time.perf_counter()
+            if reqs:
+                try:
+                    resps = self._send_batch_and_wait(proc, reqs, timeout_s)
+                    breaker.success()
+                except TimeoutError as e:
+                    breaker.failure(); failure = str(e)
+                except MCPProcessDied as e:
+                    breaker.died(); failure = str(e)
+                except Exception as e:
+                    log.warning(f"[{server}] batch falhou: {e}"); failure = str(e)
+            elapsed = time.perf_counter() - t0
+            log.info(f"[{server}] batch {len(reqs)} chamada(s) ({elapsed * 1000:.0f}ms)")
+            for rid, i in index.items():
+                resp = resps.get(rid)
+                if resp is None:
+                    results[i] = {"ok": False, "error": failure}
+                elif "result" in resp:
+                    results[i] = {"ok": True, "data": resp["result"]}
+                else:
+                    results[i] = {"ok": False, "error": resp.get("error") or resp}
+            for (tool, _), res in zip(items, results):
+                if res.get("ok"):
+                    outcome = "ok"
+                else:
+                    outcome = "timeout" if "timeout" in str(res.get("error", "")).lower() else "error"
+                metrics.MCP_CALLS.inc(server=server, tool=tool, outcome=outcome)
+                metrics.MCP_LATENCY.observe(elapsed, server=server, tool=tool)
+            sp.set(batched=True, ok=sum(1 for r in results if r.get("ok")))
+            return results  # type: ignore[return-value]
+
+    def _call_shared(self, server: str, tool: str, params: Dict[str, Any], timeout_s: float,
+                     dedupe: Optional[bool], sp) -> Dict[str, Any]:
+        cfg = self.servers_cfg.get(server) or {}
+        idempotent = tool in (cfg.get("idempotent") or ())
+        if not idempotent:
+            self._results.invalidate(server)  # tool com efeito colateral: resultados guardados podem ter mudado
+        if dedupe is None:
+            dedupe = bool(cfg.get("dedupe")) or idempotent
+        if not dedupe:
+            return self._call(server, tool, params, timeout_s)
+        try:
+            key = (server, tool, codec.dumps(params, sort_keys=True))
+        except (TypeError, ValueError):
+            return self._call(server, tool, params, timeout_s)
+        if idempotent:
+            hit = self._results.get(key)
+            metrics.CACHE_LOOKUPS.inc(cache="mcp_results", result="hit" if hit is not None else "miss")
+            if hit is not None:
+                sp.set(cache="hit")
+                return dict(hit)
+        try:
+            pol = self.policy(server, tool)
+            retries = int(pol["retries"]) if idempotent else 0
+            wait_s = timeout_s * (retries + 1) + retries * float(pol["retry_max_backoff_s"]) * 1.5
+            res, shared = self._flights.do(key, lambda: self._call(server, tool, params, timeout_s), wait_s)
+        except TimeoutError as e:
+            return {"ok": False, "error": f"{server}: {e}"}
+        if shared:
+            metrics.MCP_DEDUPED.inc(server=server, tool=tool)
+            sp.set(shared=True)
+        elif idempotent and res.get("ok"):
+            self._results.put(key, res, float(cfg.get("cache_ttl_s", 5)))
+        return dict(res)  # cópia rasa: `data` é compartilhado entre quem esperou a mesma chamada
+
+    def _call(self, server: str, tool: str, params: Dict[str, Any], timeout_s: float) -> Dict[str, Any]:
+        breaker = self.breaker(server)
+        if not breaker.allow():
+            return {"ok": False, "error": f"{server}: circuit breaker aberto (retry em {breaker.retry_in():.1f}s)"}
+        try:
+            proc = self.ensure_started(server)
+        except CircuitOpenError as e:
+            return {"ok": False, "error": str(e)}
         # revalida cache de tools
         tools = self._tool_cache.get(server) or []
+        metrics.CACHE_LOOKUPS.inc(cache="mcp_tools", result="hit" if tools else "miss")
         if not tools:
             try:
-                tools = self._list_tools(server)
-                self._tool_cache[server] = tools
+                self._set_tools(server, self._list_tools(server))
             except Exception as e:
-                logging.warning(f"[{server}] list tools erro: {e}")
-        tool_names = { t.get("name") for t in tools if isinstance(t, dict) }
-        if tool not in tool_names:
-            logging.info(f"[{server}] tool '{tool}' não no cache; tentando assim mesmo")
+                log.warning(f"[{server}] list tools erro: {e}")
+        if tool not in (self._tool_index.get(server) or {}):
+            log.info(f"[{server}] tool '{tool}' não no cache; tentando assim mesmo")
+        elif self.servers_cfg.get(server, {}).get("validate", True):
+            errs = self.validate_args(server, tool, params)
+            if errs:
+                return {"ok": False, "error": f"parâmetros inválidos para {server}::{tool}: " + "; ".join(errs[:5])}
+        params = self._with_timeout(server, tool, params, timeout_s)
 
-        # tentativa 1: tools/call
+        # política do servidor/tool: retries com backoff (só idempotentes) e hedge
+        pol = self.policy(server, tool)
+        idempotent = tool in ((self.servers_cfg.get(server) or {}).get("idempotent") or ())
+        retries = int(pol["retries"]) if idempotent else 0
+        hedge_after = self._hedge_delay(server, tool, pol) if idempotent else None
+        res: Dict[str, Any] = {}
+        for attempt in range(retries + 1):
+            if attempt:
+                if not breaker.allow():
+                    break
+                backoff = min(float(pol["retry_max_backoff_s"]), float(pol["retry_backoff_s"]) * 2 ** (attempt - 1))
+                time.sleep(backoff * random.uniform(0.5, 1.5))  # jitter: réplicas/clientes não sincronizam
+                metrics.MCP_RETRIES.inc(server=server, tool=tool)
+            if hedge_after is not None:
+                res = self._call_hedged(server, tool, params, timeout_s, hedge_after)
+            else:
+                res = self._call_once(server, tool, params, timeout_s, proc)
+                proc = None  # retry escolhe a réplica de novo
+            if res.get("ok") or not res.get("retryable"):
+                break
+        res.pop("retryable", None)  # sinal interno entre _call_once e o loop de retry
+        return res
+
+    def _hedge_delay(self, server: str, tool: str, pol: Dict[str, Any]) -> Optional[float]:
+        """Atraso até a cópia do hedge: `hedge_after_s` fixo ou o quantil (p95) observado da tool."""
+        if not pol["hedge"]:
+            return None
+        if pol.get("hedge_after_s"):
+            return float(pol["hedge_after_s"])
+        if metrics.MCP_LATENCY.count(server=server, tool=tool) < int(pol["hedge_min_samples"]):
+            return None
+        q = metrics.MCP_LATENCY.quantile(float(pol["hedge_quantile"]), server=server, tool=tool)
+        return max(0.01, q) if q else None
+
+    def _call_hedged(self, server: str, tool: str, params: Dict[str, Any], timeout_s: float, after_s: float) -> Dict[str, Any]:
+        """
+        Envia na réplica escolhida; se não responder em `after_s`, manda uma cópia para outra réplica
+        livre e fica com a primeira resposta ok. Sem réplica livre, é uma chamada comum.
+        """
+        pool = self._spawn(server)
+        if len(pool) < 2:
+            return self._call_once(server, tool, params, timeout_s)
+        primary = self._pick(server)
+        done: "queue.Queue[tuple]" = queue.Queue()
+        ex = self._hedge_executor()
+        ex.submit(lambda: done.put(("primary", self._call_once(server, tool, params, timeout_s, primary))))
+        try:
+            return done.get(timeout=after_s)[1]
+        except queue.Empty:
+            pass
+        backup = next((p for p in pool if p is not primary and p.alive() and not p.io_lock.locked()), None)
+        if backup is None:
+            return done.get()[1]  # _call_once sempre retorna (tem timeout próprio)
+        metrics.MCP_HEDGES.inc(server=server, tool=tool, result="sent")
+        ex.submit(lambda: done.put(("hedge", self._call_once(server, tool, params, timeout_s, backup))))
+        who, res = done.get()
+        if not res.get("ok"):
+            who, res = done.get()  # a outra tentativa ainda pode dar certo
+        if who == "hedge" and res.get("ok"):
+            metrics.MCP_HEDGES.inc(server=server, tool=tool, result="won")
+        return res
+
+    def _hedge_executor(self) -> ThreadPoolExecutor:
+        with self._proc_lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="mcp-hedge")
+            return self._hedge_pool
+
+    def _call_once(self, server: str, tool: str, params: Dict[str, Any], timeout_s: float,
+                   proc: Optional[MCPServerProcess] = None) -> Dict[str, Any]:
+        """Uma tentativa de tools/call; falhas transitórias (timeout, processo morto) vêm com retryable=True (só para call)."""
+        breaker = self.breaker(server)
+        try:
+            proc = proc if proc is not None and proc.alive() else self.ensure_started(server)
+        except CircuitOpenError as e:
+            return {"ok": False, "error": str(e)}
+        # tentativa 1: tools/call (se o processo já estava morto antes do envio, reinicia e repete uma vez)
         req = self._jsonrpc("tools/call", {"name": tool, "arguments": params})
         start = _now_ms()
         try:
-            resp = self._send_and_wait(proc, req, timeout_s)
-            elapsed = _now_ms() - start
-            logging.info(f"[{server}] call {tool} ({elapsed}ms)")
-            if "result" in resp:
-                return {"ok": True, "data": resp["result"]}
-            return {"ok": False, "error": resp.get("error") or resp}
+            try:
+                resp = self._send_and_wait(proc, req, timeout_s)
+            except MCPProcessDied as e:
+                if e.sent:
+                    raise
+                log.warning(f"[{server}] {e}; reiniciando")
+                breaker.died()
+                proc = self.ensure_started(server)
+                resp = self._send_and_wait(proc, req, timeout_s)
         except TimeoutError as te:
-            logging.error(f"[{server}] timeout tools/call: {te}")
-            return {"ok": False, "error": str(te)}
+            breaker.failure()
+            log.error(f"[{server}] timeout tools/call: {te}")
+            return {"ok": False, "error": str(te), "retryable": True}
+        except MCPProcessDied as e:
+            breaker.died()
+            return {"ok": False, "error": str(e), "retryable": True}
+        except CircuitOpenError as e:
+            return {"ok": False, "error": str(e)}  # a morte que abriu o circuito já foi contada acima
         except Exception as e:
-            logging.warning(f"[{server}] tools/call falhou, tentando call_tool: {e}")
+            log.warning(f"[{server}] tools/call falhou: {e}")
+            return {"ok": False, "error": str(e)}
+        breaker.success()
+        elapsed = _now_ms() - start
+        log.info(f"[{server}] call {tool} ({elapsed}ms)")
+        if "result" in resp:
+            return {"ok": True, "data": resp["result"]}
+        err = resp.get("error") or resp
+        if not (isinstance(err, dict) and err.get("code") == -32601):
+            return {"ok": False, "error": err}
 
-        # fallback: call_tool
+        # fallback: call_tool (servidores antigos sem tools/call)
+        log.warning(f"[{server}] tools/call não suportado, tentando call_tool")
         req2 = self._jsonrpc("call_tool", {"name": tool, "arguments": params})
         try:
             resp2 = self._send_and_wait(proc, req2, timeout_s)
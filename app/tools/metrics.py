@@ -0,0 +1,259 @@
+"""
+Métricas em processo no formato texto do Prometheus.
+
+Registro global (`REGISTRY`) com contadores, histogramas de latência e gauges
+(fixos ou calculados por callback na hora da coleta). Exportação:
+
+  write_textfile("/tmp/aurix.prom")   -> arquivo (node_exporter textfile / inspeção)
+  serve(9464)                         -> http://127.0.0.1:9464/metrics
+
+Via ambiente (ligado por `start_exporters_from_env()`, chamado pelo cliente MCP):
+  AURIX_METRICS_FILE=/caminho.prom   grava periodicamente e no exit
+  AURIX_METRICS_PORT=9464            sobe o endpoint HTTP local
+"""
+import os, math, time, atexit, threading, pathlib, tempfile
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LabelKey = Tuple[str, ...]
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra: parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _fmt_value(v: float) -> str:
+    if v == math.inf: return "+Inf"
+    if float(v).is_integer(): return str(int(v))
+    return repr(float(v))
+
+class _Metric:
+    kind = "untyped"
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, object]) -> LabelKey:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+    def __init__(self, *a, **kw):
+        super().__init__(*a, **kw)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        k = self._key(labels)
+        with self._lock:
+            self._values[k] = self._values.get(k, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}" for k, v in items]
+
+class Gauge(_Metric):
+    kind = "gauge"
+    def __init__(self, *a, callback: Optional[Callable[[], Iterable[Tuple[Dict[str, object], float]]]] = None, **kw):
+        super().__init__(*a, **kw)
+        self._values: Dict[LabelKey, float] = {}
+        self._callbacks: List[Callable] = [callback] if callback else []
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def add_callback(self, fn: Callable[[], Iterable[Tuple[Dict[str, object], float]]]):
+        """fn() -> [(labels, valor), ...] avaliado a cada coleta."""
+        with self._lock:
+            self._callbacks.append(fn)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+            callbacks = list(self._callbacks)
+        for fn in callbacks:
+            try:
+                for labels, v in fn():
+                    values[self._key(labels)] = v
+            except Exception:
+                continue
+        return self._header() + [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}" for k, v in sorted(values.items())]
+
+class Histogram(_Metric):
+    kind = "histogram"
+    def __init__(self, *a, buckets: Sequence[float] = DEFAULT_BUCKETS, **kw):
+        super().__init__(*a, **kw)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: Dict[LabelKey, List[float]] = {}  # contagens por bucket + [sum, count]
+
+    def observe(self, value: float, **labels):
+        k = self._key(labels)
+        with self._lock:
+            s = self._series.get(k)
+            if s is None:
+                s = self._series[k] = [0.0] * (len(self.buckets) + 2)
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    s[i] += 1; break
+            s[-2] += value; s[-1] += 1
+
+    def time(self, **labels):
+        hist = self
+        class _Timer:
+            def __enter__(self):
+                self.t0 = time.perf_counter(); return self
+            def __exit__(self, *exc):
+                hist.observe(time.perf_counter() - self.t0, **labels)
+        return _Timer()
+
+    def count(self, **labels) -> int:
+        s = self._series.get(self._key(labels))
+        return int(s[-1]) if s else 0
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """Estimativa por interpolação linear nos buckets (como histogram_quantile)."""
+        s = self._series.get(self._key(labels))
+        if not s or not s[-1]:
+            return None
+        rank, acc, lower = q * s[-1], 0.0, 0.0
+        for i, b in enumerate(self.buckets):
+            if acc + s[i] >= rank:
+                if b == math.inf: return lower
+                return lower + (b - lower) * ((rank - acc) / s[i] if s[i] else 0)
+            acc += s[i]; lower = b
+        return lower
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        out = self._header()
+        for k, s in items:
+            acc = 0.0
+            for i, b in enumerate(self.buckets):
+                acc += s[i]
+                le = 'le="%s"' % _fmt_value(b)
+                out.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, k, le)} {_fmt_value(acc)}")
+            out.append(f"{self.name}_sum{_fmt_labels(self.labelnames, k)} {_fmt_value(s[-2])}")
+            out.append(f"{self.name}_count{_fmt_labels(self.labelnames, k)} {_fmt_value(s[-1])}")
+        return out
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, help: str, labelnames: Sequence[str], **kw):
+        with self._lock:
+            m = self._metrics.get(name)
+            if m is None:
+                m = self._metrics[name] = cls(name, help, labelnames, **kw)
+            elif not isinstance(m, cls):
+                raise ValueError(f"métrica '{name}' já registrada como {m.kind}")
+            return m
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get(Gauge, name, help, labelnames)
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = [self._metrics[k] for k in sorted(self._metrics)]
+        lines: List[str] = []
+        for m in metrics:
+            lines += m.collect()
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+def write_textfile(path: os.PathLike, registry: Registry = REGISTRY) -> pathlib.Path:
+    path = pathlib.Path(path).expanduser()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".tmp_", dir=str(path.parent))
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(registry.render())
+    os.replace(tmp, path)
+    return path
+
+def serve(port: int = 9464, host: str = "127.0.0.1", registry: Registry = REGISTRY):
+    """Sobe /metrics em thread daemon; retorna o servidor (use .shutdown() para parar)."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404); return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        def log_message(self, *a):
+            pass
+
+    srv = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=srv.serve_forever, name="aurix-metrics", daemon=True).start()
+    return srv
+
+_env_started = False
+
+def start_exporters_from_env(interval_s: float = 15.0):
+    global _env_started
+    if _env_started:
+        return
+    _env_started = True
+    path = os.environ.get("AURIX_METRICS_FILE")
+    if path:
+        def _loop():
+            while True:
+                time.sleep(interval_s)
+                try: write_textfile(path)
+                except Exception: pass
+        threading.Thread(target=_loop, name="aurix-metrics-file", daemon=True).start()
+        atexit.register(lambda: write_textfile(path))
+    port = os.environ.get("AURIX_METRICS_PORT")
+    if port:
+        try:
+            serve(int(port))
+        except Exception:
+            pass
+
+# ==== Métricas do Aurix (nomes estáveis) ====
+
+MCP_CALLS = REGISTRY.counter("aurix_mcp_calls_total", "Chamadas MCP por servidor/tool/resultado", ("server", "tool", "outcome"))
+MCP_LATENCY = REGISTRY.histogram("aurix_mcp_call_seconds", "Latência de chamadas MCP", ("server", "tool"))
+MCP_QUEUE_DEPTH = REGISTRY.gauge("aurix_mcp_queue_depth", "Mensagens pendentes (stdout) / linhas no ring buffer (stderr) dos servidores MCP", ("server", "stream"))
+MCP_DROPPED = REGISTRY.counter("aurix_mcp_dropped_lines_total", "Linhas descartadas (stderr: ring buffer cheio)", ("server", "stream"))
+MCP_OVERSIZE = REGISTRY.counter("aurix_mcp_oversize_messages_total", "Mensagens acima de max_message_bytes", ("server",))
+MCP_BLOB_BYTES = REGISTRY.counter("aurix_mcp_blob_bytes_total", "Bytes recebidos pelo canal lateral de blobs (mmap)", ("server",))
+MCP_DEDUPED = REGISTRY.counter("aurix_mcp_deduplicated_calls_total", "Chamadas atendidas por uma requisição idêntica já em voo", ("server", "tool"))
+MCP_RETRIES = REGISTRY.counter("aurix_mcp_retries_total", "Novas tentativas de chamadas MCP (tools idempotentes)", ("server", "tool"))
+MCP_HEDGES = REGISTRY.counter("aurix_mcp_hedged_requests_total", "Cópias de hedge enviadas (sent) e que responderam primeiro (won)", ("server", "tool", "result"))
+MCP_STARTS = REGISTRY.counter("aurix_mcp_process_starts_total", "Processos MCP iniciados", ("server",))
+MCP_RESTARTS = REGISTRY.counter("aurix_mcp_process_restarts_total", "Processos MCP reiniciados após morte", ("server",))
+MCP_BREAKER_TRIPS = REGISTRY.counter("aurix_mcp_breaker_trips_total", "Aberturas do circuit breaker por servidor", ("server",))
+CACHE_LOOKUPS = REGISTRY.counter("aurix_cache_lookups_total", "Consultas a caches (hit/miss)", ("cache", "result"))
+DAEMON_REQUESTS = REGISTRY.counter("aurix_daemon_requests_total", "Requisições ao daemon por método/resultado", ("method", "outcome"))
+DAEMON_LATENCY = REGISTRY.histogram("aurix_daemon_request_seconds", "Latência de requisições ao daemon", ("method",))
+LLM_REQUESTS = REGISTRY.counter("aurix_llm_requests_total", "Requisições LLM por backend/modelo/resultado", ("backend", "model", "outcome"))
+LLM_LATENCY = REGISTRY.histogram("aurix_llm_request_seconds", "Latência de requisições LLM", ("backend", "model"))
+LLM_STRUCTURED = REGISTRY.counter("aurix_llm_structured_total", "Saídas estruturadas por schema: ok | repaired | failed | offline", ("schema", "outcome"))
+LLM_RACES = REGISTRY.counter("aurix_llm_race_results_total", "Modo corrida: resultado por backend (won | lost | invalid | error)", ("backend", "result"))
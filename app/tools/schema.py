@@ -0,0 +1,134 @@
+"""
+Validação de argumentos contra o `inputSchema` (JSON Schema) das tools MCP.
+
+`compile_schema(schema)` devolve um validador `fn(value) -> list[str]` (lista de erros,
+vazia = válido), compilado uma vez e cacheado pelo conteúdo do schema.
+Usa `fastjsonschema`/`jsonschema` quando instalados; sem eles, um compilador
+embutido cobre o subconjunto usado pelas tools (type, required, properties,
+additionalProperties, items, enum, const, limites numéricos e de tamanho).
+"""
+import json
+from functools import lru_cache
+from typing import Any, Callable, Dict, List
+
+Validator = Callable[[Any], List[str]]
+
+_TYPES = {
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "string": lambda v: isinstance(v, str),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "null": lambda v: v is None,
+}
+
+def _compile(schema: Any, path: str = "$") -> Validator:
+    if not isinstance(schema, dict) or not schema:
+        return lambda v: []
+    checks: List[Callable[[Any, List[str]], None]] = []
+
+    t = schema.get("type")
+    if t is not None:
+        types = t if isinstance(t, list) else [t]
+        preds = [_TYPES[x] for x in types if x in _TYPES]
+        if preds:
+            def _type(v, errs, preds=preds, types=types):
+                if not any(p(v) for p in preds):
+                    errs.append(f"{path}: esperado {'|'.join(types)}, recebido {type(v).__name__}")
+            checks.append(_type)
+
+    if "enum" in schema:
+        allowed = schema["enum"]
+        checks.append(lambda v, errs: v in allowed or errs.append(f"{path}: valor fora de {allowed}"))
+    if "const" in schema:
+        const = schema["const"]
+        checks.append(lambda v, errs: v == const or errs.append(f"{path}: esperado {const!r}"))
+
+    for key, op, msg in (("minimum", lambda v, b: v >= b, "< minimum"), ("maximum", lambda v, b: v <= b, "> maximum"),
+                         ("exclusiveMinimum", lambda v, b: v > b, "<= exclusiveMinimum"),
+                         ("exclusiveMaximum", lambda v, b: v < b, ">= exclusiveMaximum")):
+        if isinstance(schema.get(key), (int, float)):
+            bound = schema[key]
+            def _num(v, errs, bound=bound, op=op, msg=msg):
+                if _TYPES["number"](v) and not op(v, bound):
+                    errs.append(f"{path}: {v} {msg} {bound}")
+            checks.append(_num)
+
+    for key, op, kind in (("minLength", lambda n, b: n >= b, str), ("maxLength", lambda n, b: n <= b, str),
+                          ("minItems", lambda n, b: n >= b, list), ("maxItems", lambda n, b: n <= b, list)):
+        if isinstance(schema.get(key), int):
+            bound = schema[key]
+            def _len(v, errs, bound=bound, op=op, kind=kind, key=key):
+                if isinstance(v, kind) and not op(len(v), bound):
+                    errs.append(f"{path}: tamanho {len(v)} viola {key}={bound}")
+            checks.append(_len)
+
+    required = schema.get("required") or []
+    props = schema.get("properties") or {}
+    addl = schema.get("additionalProperties", True)
+    if required or props or addl is not True:
+        prop_validators = {k: _compile(s, f"{path}.{k}") for k, s in props.items()}
+        addl_validator = _compile(addl, f"{path}.*") if isinstance(addl, dict) else None
+        def _obj(v, errs):
+            if not isinstance(v, dict):
+                return
+            for k in required:
+                if k not in v:
+                    errs.append(f"{path}: campo obrigatório '{k}' ausente")
+            for k, item in v.items():
+                pv = prop_validators.get(k)
+                if pv is not None:
+                    errs.extend(pv(item))
+                elif addl is False:
+                    errs.append(f"{path}: campo '{k}' não permitido")
+                elif addl_validator is not None:
+                    errs.extend(addl_validator(item))
+        checks.append(_obj)
+
+    if isinstance(schema.get("items"), dict):
+        item_validator = _compile(schema["items"], f"{path}[]")
+        def _arr(v, errs):
+            if isinstance(v, list):
+                for item in v:
+                    errs.extend(item_validator(item))
+        checks.append(_arr)
+
+    def validate(v) -> List[str]:
+        errs: List[str] = []
+        for c in checks:
+            c(v, errs)
+        return errs
+    return validate
+
+def _compile_external(schema: Dict[str, Any]) -> Validator | None:
+    try:
+        import fastjsonschema
+        fn = fastjsonschema.compile(schema)
+        def validate(v) -> List[str]:
+            try:
+                fn(v); return []
+            except fastjsonschema.JsonSchemaException as e:
+                return [str(e)]
+        return validate
+    except ImportError:
+        pass
+    except Exception:
+        return None
+    try:
+        import jsonschema
+        cls = jsonschema.validators.validator_for(schema)
+        inst = cls(schema)
+        return lambda v: [e.message for e in inst.iter_errors(v)]
+    except ImportError:
+        return None
+    except Exception:
+        return None
+
+@lru_cache(maxsize=1024)
+def _compile_cached(schema_json: str) -> Validator:
+    schema = json.loads(schema_json)
+    return _compile_external(schema) or _compile(schema)
+
+def compile_schema(schema: Dict[str, Any]) -> Validator:
+    return _compile_cached(json.dumps(schema, sort_keys=True))
@@ -0,0 +1,170 @@
+"""
+Tracing leve para o Aurix.
+
+Spans no modelo do OpenTelemetry (traceId/spanId/parentSpanId, tempos em ns,
+atributos e status) exportados como uma linha JSON por span em arquivo local,
+sem collector. Desligado por padrão; ativar com:
+
+  AURIX_TRACE=1                      -> ~/aurix/data/logs/traces.jsonl
+  AURIX_TRACE_FILE=/tmp/traces.jsonl -> arquivo explícito
+
+Uso:
+  with span("dispatch_agent", agent="architect") as sp:
+      ...
+      sp.set(ok=True)
+
+  @traced("llm.ollama")
+  def ollama_chat(...): ...
+
+Threads novas não herdam o span atual; use `wrap(fn)` ao submeter trabalho
+para um executor quando quiser manter a ligação pai/filho.
+"""
+import os, time, threading, functools, contextvars, pathlib
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+DEFAULT_FILE = pathlib.Path.home() / "aurix" / "data" / "logs" / "traces.jsonl"
+
+_current: "contextvars.ContextVar[Optional[Span]]" = contextvars.ContextVar("aurix_span", default=None)
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "attributes",
+                 "start_ns", "end_ns", "status", "error")
+
+    def __init__(self, name: str, parent: "Optional[Span]", attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = {k: v for k, v in attributes.items() if v is not None}
+        if parent and "correlation_id" not in self.attributes:
+            cid = parent.attributes.get("correlation_id")
+            if cid: self.attributes["correlation_id"] = cid
+        self.attributes.setdefault("correlation_id", self.trace_id)
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.status = "OK"
+        self.error: Optional[str] = None
+
+    def set(self, **attrs):
+        for k, v in attrs.items():
+            if v is not None: self.attributes[k] = v
+        return self
+
+    def record_error(self, exc: BaseException):
+        self.status = "ERROR"
+        self.error = f"{type(exc).__name__}: {exc}"
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns or time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "kind": "INTERNAL",
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "durationMs": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "status": {"code": self.status},
+            "resource": {"service.name": "aurix", "process.pid": os.getpid()},
+        }
+        if self.error: d["status"]["message"] = self.error
+        return d
+
+class _NoopSpan:
+    trace_id = span_id = parent_id = None
+    attributes: Dict[str, Any] = {}
+    def set(self, **attrs): return self
+    def record_error(self, exc): pass
+
+_NOOP = _NoopSpan()
+
+class _Exporter:
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._fh = None
+
+    def export(self, sp: Span):
+        from app.tools import codec  # só com tracing ligado
+        line = codec.dumps(sp.to_dict(), default=str) + "\n"
+        with self._lock:
+            if self._fh is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._fh = open(self.path, "a", encoding="utf-8")
+            self._fh.write(line)
+            self._fh.flush()
+
+_exporter: Optional[_Exporter] = None
+_configured = False
+_cfg_lock = threading.Lock()
+
+def configure(path: Optional[os.PathLike] = None, enabled: bool = True):
+    """Liga/desliga o tracing em runtime (sobrepõe as variáveis de ambiente)."""
+    global _exporter, _configured
+    with _cfg_lock:
+        _exporter = _Exporter(pathlib.Path(path or DEFAULT_FILE).expanduser()) if enabled else None
+        _configured = True
+
+def _get_exporter() -> Optional[_Exporter]:
+    if not _configured:
+        env_file = os.environ.get("AURIX_TRACE_FILE")
+        env_on = os.environ.get("AURIX_TRACE", "").lower() in ("1", "true", "yes", "on")
+        configure(env_file, enabled=bool(env_file) or env_on)
+    return _exporter
+
+def enabled() -> bool:
+    return _get_exporter() is not None
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+def current_trace_id() -> Optional[str]:
+    sp = _current.get()
+    return sp.trace_id if sp else None
+
+@contextmanager
+def span(name: str, **attributes):
+    exporter = _get_exporter()
+    if exporter is None:
+        yield _NOOP
+        return
+    sp = Span(name, _current.get(), attributes)
+    token = _current.set(sp)
+    try:
+        yield sp
+    except BaseException as e:
+        sp.record_error(e)
+        raise
+    finally:
+        _current.reset(token)
+        sp.end_ns = time.time_ns()
+        try:
+            exporter.export(sp)
+        except Exception:
+            pass  # tracing nunca derruba o pipeline
+
+def traced(name: Optional[str] = None, **attributes) -> Callable:
+    """Decorator: envolve a função em um span."""
+    def deco(fn):
+        span_name = name or f"{fn.__module__}.{fn.__qualname__}"
+        @functools.wraps(fn)
+        def inner(*a, **kw):
+            with span(span_name, **attributes):
+                return fn(*a, **kw)
+        return inner
+    return deco
+
+def wrap(fn: Callable) -> Callable:
+    """Propaga o contexto (span atual) para execução em outra thread."""
+    ctx = contextvars.copy_context()
+    @functools.wraps(fn)
+    def inner(*a, **kw):
+        return ctx.copy().run(fn, *a, **kw)
+    return inner